@@ -6,29 +6,78 @@ This script handles install/update/delete operations for the ChatWithYourDocumen
 using the new multi-user plugin lifecycle management architecture.
 """
 
+from __future__ import annotations
+
 import json
 import logging
 import datetime
+import errno
+import functools
 import os
-import shutil
+import re
+import threading
+import types
+import weakref
+import sys
 import asyncio
+import collections.abc
+import contextlib
+import io
 from pathlib import Path
-from typing import Dict, Any, Optional
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
-import structlog
+from typing import TYPE_CHECKING, Dict, Any, Callable, Iterator, List, Optional, Tuple
 
-logger = structlog.get_logger()
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor
+    from sqlalchemy import Table
+    from sqlalchemy.ext.asyncio import AsyncSession
 
-# Import the new base lifecycle manager
 try:
-    # Try to import from the BrainDrive system first (when running in production)
-    from app.plugins.base_lifecycle_manager import BaseLifecycleManager
-    logger.info("Using new architecture: BaseLifecycleManager imported from app.plugins")
-except ImportError:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Public API; the two classes are built on first access (see __getattr__ below)
+__all__ = [
+    'BaseLifecycleManager', 'ChatWithYourDocumentsLifecycleManager',
+    'install_plugin', 'install_plugin_for_users', 'delete_plugin', 'uninstall_plugin_for_users',
+    'purge_plugin', 'get_plugin_status', 'update_plugin', 'rollout_plugin_update',
+    'get_lifecycle_manager', 'register_lifecycle_manager', 'invalidate_lifecycle_managers',
+    'PluginRolloutScheduler', 'SchemaCapabilities', 'get_schema_capabilities', 'invalidate_schema_capabilities',
+    'RecordInsert', 'get_record_insert', 'PluginMetadataSnapshot', 'invalidate_metadata_snapshots',
+    'ActiveUserIndex', 'invalidate_health_snapshots',
+]
+
+# Plugin discovery imports this module for every plugin, so importing it does no I/O and
+# no logging, and leaves SQLAlchemy, structlog and the file-work modules (tarfile, gzip,
+# hashlib, mmap, shutil, brotli, the thread pool) unloaded: they are imported inside the
+# functions that use them, and the base class, table definitions and manager class are
+# built on first use (see __getattr__ below).
+class _LazyLogger:
+    """Stand-in for the structlog logger that imports structlog on the first log call"""
+    
+    def __getattr__(self, name):
+        global logger
+        import structlog
+        logger = structlog.get_logger()
+        return getattr(logger, name)
+
+
+logger = _LazyLogger()
+
+
+@functools.lru_cache(maxsize=None)
+def _resolve_base_class() -> type:
+    """Import the new base lifecycle manager, falling back to a minimal implementation"""
+    try:
+        # Try to import from the BrainDrive system first (when running in production)
+        from app.plugins.base_lifecycle_manager import BaseLifecycleManager
+        logger.debug("Using new architecture: BaseLifecycleManager imported from app.plugins")
+        return BaseLifecycleManager
+    except ImportError:
+        pass
+    
     try:
         # Try local import for development
-        import sys
         current_dir = os.path.dirname(os.path.abspath(__file__))
         backend_path = os.path.join(current_dir, "..", "..", "backend", "app", "plugins")
         backend_path = os.path.abspath(backend_path)
@@ -37,63 +86,1262 @@ except ImportError:
             if backend_path not in sys.path:
                 sys.path.insert(0, backend_path)
             from base_lifecycle_manager import BaseLifecycleManager
-            logger.info(f"Using new architecture: BaseLifecycleManager imported from local backend: {backend_path}")
-        else:
-            # For remote installation, the base class might not be available
-            # In this case, we'll create a minimal implementation
-            logger.warning(f"BaseLifecycleManager not found at {backend_path}, using minimal implementation")
-            from abc import ABC, abstractmethod
-            from datetime import datetime
-            from pathlib import Path
-            from typing import Set
-            
-            class BaseLifecycleManager(ABC):
-                """Minimal base class for remote installations"""
-                def __init__(self, plugin_slug: str, version: str, shared_storage_path: Path):
-                    self.plugin_slug = plugin_slug
-                    self.version = version
-                    self.shared_path = shared_storage_path
-                    self.active_users: Set[str] = set()
-                    self.instance_id = f"{plugin_slug}_{version}"
-                    self.created_at = datetime.now()
-                    self.last_used = datetime.now()
-                
-                async def install_for_user(self, user_id: str, db, shared_plugin_path: Path):
-                    if user_id in self.active_users:
-                        return {'success': False, 'error': 'Plugin already installed for user'}
-                    result = await self._perform_user_installation(user_id, db, shared_plugin_path)
-                    if result['success']:
-                        self.active_users.add(user_id)
-                        self.last_used = datetime.now()
-                    return result
-                
-                async def uninstall_for_user(self, user_id: str, db):
-                    if user_id not in self.active_users:
-                        return {'success': False, 'error': 'Plugin not installed for user'}
-                    result = await self._perform_user_uninstallation(user_id, db)
-                    if result['success']:
-                        self.active_users.discard(user_id)
-                        self.last_used = datetime.now()
-                    return result
-                
-                @abstractmethod
-                async def get_plugin_metadata(self): pass
-                @abstractmethod
-                async def get_module_metadata(self): pass
-                @abstractmethod
-                async def _perform_user_installation(self, user_id, db, shared_plugin_path): pass
-                @abstractmethod
-                async def _perform_user_uninstallation(self, user_id, db): pass
-            
-            logger.info("Using minimal BaseLifecycleManager implementation for remote installation")
-            
+            logger.debug(f"Using new architecture: BaseLifecycleManager imported from local backend: {backend_path}")
+            return BaseLifecycleManager
     except ImportError as e:
         logger.error(f"Failed to import BaseLifecycleManager: {e}")
         raise ImportError("ChatWithYourDocuments plugin requires the new architecture BaseLifecycleManager")
+    
+    # For remote installation, the base class might not be available
+    # In this case, we'll create a minimal implementation
+    logger.warning(f"BaseLifecycleManager not found at {backend_path}, using minimal implementation")
+    from abc import ABC, abstractmethod
+    from typing import Set
+    
+    class BaseLifecycleManager(ABC):
+        """Minimal base class for remote installations"""
+        def __init__(self, plugin_slug: str, version: str, shared_storage_path: Path):
+            self.plugin_slug = plugin_slug
+            self.version = version
+            self.shared_path = shared_storage_path
+            self.active_users: Set[str] = set()
+            self.instance_id = f"{plugin_slug}_{version}"
+            self.created_at = datetime.datetime.now()
+            self.last_used = datetime.datetime.now()
+        
+        async def install_for_user(self, user_id: str, db, shared_plugin_path: Path):
+            if user_id in self.active_users:
+                return {'success': False, 'error': 'Plugin already installed for user'}
+            result = await self._perform_user_installation(user_id, db, shared_plugin_path)
+            if result['success']:
+                self.active_users.add(user_id)
+                self.last_used = datetime.datetime.now()
+            return result
+        
+        async def uninstall_for_user(self, user_id: str, db):
+            if user_id not in self.active_users:
+                return {'success': False, 'error': 'Plugin not installed for user'}
+            result = await self._perform_user_uninstallation(user_id, db)
+            if result['success']:
+                self.active_users.discard(user_id)
+                self.last_used = datetime.datetime.now()
+            return result
+        
+        @abstractmethod
+        async def get_plugin_metadata(self): pass
+        @abstractmethod
+        async def get_module_metadata(self): pass
+        @abstractmethod
+        async def _perform_user_installation(self, user_id, db, shared_plugin_path): pass
+        @abstractmethod
+        async def _perform_user_uninstallation(self, user_id, db): pass
+    
+    logger.debug("Using minimal BaseLifecycleManager implementation for remote installation")
+    return BaseLifecycleManager
 
 
-class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
-    """Lifecycle manager for ChatWithYourDocuments plugin using new architecture"""
+# Manifest written into the shared version directory after each file sync
+PLUGIN_MANIFEST_FILENAME = '.plugin_manifest.json'
+# Prebuilt archive of the installable files, created by `lifecycle_manager.py build-archive`
+PLUGIN_ARCHIVE_FILENAME = 'plugin_bundle.tar.gz'
+# Index of precompressed asset variants for static servers, written at the tree root
+PRECOMPRESSED_INDEX_FILENAME = '.precompressed.json'
+# Text assets under these directories get .gz/.br siblings at install time
+PRECOMPRESS_DIRECTORIES = ('dist/', 'public/')
+PRECOMPRESS_SUFFIXES = ('.js', '.mjs', '.css', '.html', '.json', '.map', '.svg', '.txt', '.xml')
+PRECOMPRESS_MIN_SIZE = 256
+# Encoding name -> file suffix of the precompressed sibling
+PRECOMPRESS_ENCODINGS = {'gzip': '.gz', 'br': '.br'}
+
+
+@functools.lru_cache(maxsize=None)
+def _load_brotli():
+    """Import brotli on first use; None when it is not installed (.br variants are then skipped)"""
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+# Files and directories never shipped with the plugin (.gitignore-style patterns)
+DEFAULT_EXCLUDE_PATTERNS = (
+    'node_modules',
+    'package-lock.json',
+    '.git',
+    '.gitignore',
+    '__pycache__',
+    '*.pyc',
+    '.DS_Store',
+    'Thumbs.db',
+    'tests/',
+    '.pytest_cache/',
+    PLUGIN_MANIFEST_FILENAME,
+    PLUGIN_ARCHIVE_FILENAME,
+)
+
+
+class PathExclusionMatcher:
+    """
+    Compiled .gitignore-style exclusion patterns.
+    Supports '*', '?', '[...]' and '**' globs, '!' negation, a trailing '/' for
+    directory-only patterns and a leading or inner '/' to anchor a pattern to
+    the source root. Patterns without a slash match a name at any depth.
+    """
+    
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._rules = []
+        for raw_pattern in self.patterns:
+            rule = self._compile_pattern(raw_pattern)
+            if rule:
+                self._rules.append(rule)
+        
+        # Without negations the rules collapse into one regex per entry type
+        self._has_negations = any(negated for _, negated, _ in self._rules)
+        if not self._has_negations:
+            file_sources = [regex.pattern for regex, _, dir_only in self._rules if not dir_only]
+            dir_sources = [regex.pattern for regex, _, _ in self._rules]
+            self._file_regex = re.compile('|'.join(file_sources)) if file_sources else None
+            self._dir_regex = re.compile('|'.join(dir_sources)) if dir_sources else None
+    
+    @staticmethod
+    def _compile_pattern(raw_pattern: str):
+        """Translate one pattern into a (regex, negated, dir_only) rule"""
+        pattern = raw_pattern.strip()
+        if not pattern or pattern.startswith('#'):
+            return None
+        
+        negated = pattern.startswith('!')
+        if negated:
+            pattern = pattern[1:]
+        dir_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        anchored = '/' in pattern
+        pattern = pattern.lstrip('/')
+        if not pattern:
+            return None
+        
+        parts = []
+        i = 0
+        while i < len(pattern):
+            if pattern.startswith('**/', i):
+                parts.append('(?:.*/)?')
+                i += 3
+            elif pattern.startswith('**', i):
+                parts.append('.*')
+                i += 2
+            elif pattern[i] == '*':
+                parts.append('[^/]*')
+                i += 1
+            elif pattern[i] == '?':
+                parts.append('[^/]')
+                i += 1
+            elif pattern[i] == '[' and ']' in pattern[i + 1:]:
+                end = pattern.index(']', i + 1)
+                char_class = pattern[i + 1:end]
+                if char_class.startswith('!'):
+                    char_class = '^' + char_class[1:]
+                parts.append(f"[{char_class}]")
+                i = end + 1
+            else:
+                parts.append(re.escape(pattern[i]))
+                i += 1
+        
+        prefix = '' if anchored else '(?:.*/)?'
+        return re.compile(f"(?:{prefix}{''.join(parts)})$"), negated, dir_only
+    
+    def is_excluded(self, relative_path: str, is_dir: bool = False) -> bool:
+        """Check a POSIX-style path relative to the source root"""
+        if not self._has_negations:
+            regex = self._dir_regex if is_dir else self._file_regex
+            return bool(regex and regex.match(relative_path))
+        
+        excluded = False
+        for regex, negated, dir_only in self._rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(relative_path):
+                excluded = not negated
+        return excluded
+
+
+def _walk_plugin_files(root: Path, matcher: PathExclusionMatcher) -> Iterator[Tuple[str, os.DirEntry]]:
+    """
+    Yield (relative POSIX path, DirEntry) for every file under root that is not
+    excluded. Excluded directories are pruned and never descended into.
+    """
+    pending = ['']
+    while pending:
+        relative_dir = pending.pop()
+        with os.scandir(os.path.join(root, relative_dir) if relative_dir else root) as entries:
+            for entry in entries:
+                relative_path = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if not matcher.is_excluded(relative_path, is_dir=True):
+                        pending.append(relative_path)
+                elif entry.is_file():
+                    if not matcher.is_excluded(relative_path):
+                        yield relative_path, entry
+
+
+def _sha256_file(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """Return the hex SHA-256 digest of a file, read in chunks"""
+    import hashlib
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _sha256_mmap(path: Path) -> str:
+    """Return the hex SHA-256 digest of a file, hashed through a read-only memory map"""
+    import hashlib
+    import mmap
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.sha256(b'').hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return hashlib.sha256(mapped).hexdigest()
+
+
+def _verify_manifest_files(plugin_dir: Path, manifest: Dict[str, Dict[str, Any]]) -> Dict[str, List[str]]:
+    """Quick integrity check: compare installed size and mtime with the manifest (blocking)"""
+    missing, mismatched = [], []
+    for relative_key, entry in manifest.items():
+        try:
+            file_stat = os.stat(os.path.join(plugin_dir, relative_key))
+        except OSError:
+            missing.append(relative_key)
+            continue
+        expected_mtime = entry.get('installed_mtime_ns')
+        if file_stat.st_size != entry['size'] or (expected_mtime is not None and file_stat.st_mtime_ns != expected_mtime):
+            mismatched.append(relative_key)
+    return {'missing': missing, 'mismatched': mismatched}
+
+
+
+# Bounded thread pool shared by all blocking file work (walking, hashing, copying)
+FILE_IO_MAX_WORKERS = min(8, (os.cpu_count() or 1) + 4)
+_file_io_executor: Optional[ThreadPoolExecutor] = None
+_file_io_executor_lock = threading.Lock()
+
+
+def _get_file_io_executor() -> ThreadPoolExecutor:
+    """Return the process-wide file I/O thread pool, creating it on first use"""
+    global _file_io_executor
+    if _file_io_executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+        with _file_io_executor_lock:
+            if _file_io_executor is None:
+                _file_io_executor = ThreadPoolExecutor(
+                    max_workers=FILE_IO_MAX_WORKERS,
+                    thread_name_prefix='plugin-file-io'
+                )
+    return _file_io_executor
+
+
+async def _run_file_io(func: Callable, *args):
+    """Run a blocking file operation on the file I/O pool without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_file_io_executor(), functools.partial(func, *args))
+
+
+
+def _dispatch_progress(progress_callback: Callable, progress: Dict[str, Any]):
+    """Invoke a progress callback on the event loop, scheduling it if it is a coroutine"""
+    callback_result = progress_callback(progress)
+    if asyncio.iscoroutine(callback_result):
+        asyncio.ensure_future(callback_result)
+
+
+def _is_safe_relative_path(relative_path: str) -> bool:
+    """Reject absolute paths and parent-directory traversal in archive member names"""
+    parts = relative_path.split('/')
+    return (
+        bool(relative_path) and not relative_path.startswith('/') and '\\' not in relative_path
+        and not any(part in ('', '.', '..') for part in parts)
+    )
+
+
+_SHA256_HEX = re.compile(r'[0-9a-f]{64}')
+
+
+def _validate_archive_manifest(files: Any, archive_name: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Check every entry of an archive manifest before anything is stored or linked:
+    keys become paths under the shared tree and digests become object store paths,
+    so either one escaping its directory rejects the whole archive.
+    """
+    if not isinstance(files, dict):
+        raise ValueError(f"{archive_name} has a malformed manifest")
+    for relative_key, entry in files.items():
+        if not isinstance(relative_key, str) or not _is_safe_relative_path(relative_key):
+            raise ValueError(f"{archive_name} manifest contains unsafe path {relative_key!r}")
+        if (not isinstance(entry, dict) or not isinstance(entry.get('sha256'), str)
+                or not _SHA256_HEX.fullmatch(entry['sha256'])
+                or not isinstance(entry.get('size'), int) or entry['size'] < 0):
+            raise ValueError(f"{archive_name} manifest entry {relative_key!r} is malformed")
+    return files
+
+# Linux FICLONE ioctl: share extents between files on btrfs/xfs/overlayfs
+_FICLONE = 0x40049409
+# errno values meaning "this copy primitive is not usable here, try the next one"
+_COPY_FALLBACK_ERRNOS = {
+    errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP,
+    errno.ENOTTY, errno.EBADF, errno.EPERM, errno.ENOTSUP
+}
+
+
+class FileCopyEngine:
+    """
+    Copies files on the bounded file I/O pool using the cheapest primitive the
+    platform offers: reflink clone, then os.copy_file_range, then os.sendfile,
+    then a plain buffered copy. Each file is written to a temporary sibling and
+    renamed into place, so readers never see a half-written file.
+    """
+    
+    def __init__(self, max_concurrency: int = FILE_IO_MAX_WORKERS):
+        self.max_concurrency = max(1, max_concurrency)
+        # Primitives that failed on a given device are not retried for it
+        self._unsupported: Dict[Tuple[int, str], bool] = {}
+    
+    def copy_file(self, source: Path, target: Path) -> str:
+        """Copy one file (blocking) and return the name of the primitive used"""
+        import shutil
+        target = Path(target)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(source, 'rb') as src, open(temp_path, 'wb') as dst:
+                size = os.fstat(src.fileno()).st_size
+                device = os.fstat(dst.fileno()).st_dev
+                method = self._copy_contents(src, dst, size, device)
+            shutil.copystat(source, temp_path)
+            os.replace(temp_path, target)
+            return method
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+    
+    def _copy_contents(self, src, dst, size: int, device: int) -> str:
+        """Copy size bytes from src to dst with the first primitive that works"""
+        src_fd, dst_fd = src.fileno(), dst.fileno()
+        
+        if fcntl is not None and size and not self._unsupported.get((device, 'reflink')):
+            try:
+                fcntl.ioctl(dst_fd, _FICLONE, src_fd)
+                return 'reflink'
+            except OSError as e:
+                if e.errno not in _COPY_FALLBACK_ERRNOS:
+                    raise
+                self._unsupported[(device, 'reflink')] = True
+        
+        for method in ('copy_file_range', 'sendfile'):
+            if not size or not hasattr(os, method) or self._unsupported.get((device, method)):
+                continue
+            try:
+                self._copy_with_offsets(getattr(os, method), method, src_fd, dst_fd, size)
+                return method
+            except OSError as e:
+                if e.errno not in _COPY_FALLBACK_ERRNOS:
+                    raise
+                self._unsupported[(device, method)] = True
+                # Restart from a clean destination before the next primitive
+                os.lseek(src_fd, 0, os.SEEK_SET)
+                os.ftruncate(dst_fd, 0)
+                os.lseek(dst_fd, 0, os.SEEK_SET)
+        
+        import shutil
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+        return 'buffered'
+    
+    @staticmethod
+    def _copy_with_offsets(primitive: Callable, method: str, src_fd: int, dst_fd: int, size: int):
+        """Drive copy_file_range/sendfile until size bytes have been transferred"""
+        copied = 0
+        while copied < size:
+            if method == 'copy_file_range':
+                sent = primitive(src_fd, dst_fd, size - copied, copied, copied)
+            else:
+                os.lseek(dst_fd, copied, os.SEEK_SET)
+                sent = primitive(dst_fd, src_fd, copied, size - copied)
+            if sent == 0:
+                break
+            copied += sent
+        if copied != size:
+            raise OSError(errno.EIO, f"short copy: {copied} of {size} bytes")
+    
+    async def copy_files(self, jobs, progress_callback: Optional[Callable] = None) -> Dict[str, Any]:
+        """
+        Copy (key, source, target, size, path) jobs on the file I/O pool with at most
+        max_concurrency files in flight. progress_callback, if given, is called
+        on the event loop after every file with a progress dict whose 'path' is
+        the job's path (the file as the user knows it, not its store key).
+        """
+        jobs = list(jobs)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        progress = {
+            'files_done': 0,
+            'files_total': len(jobs),
+            'bytes_done': 0,
+            'bytes_total': sum(job[3] for job in jobs),
+            'path': None
+        }
+        copied, failed, methods = [], {}, {}
+        
+        async def run_job(key, source, target, size, path):
+            async with semaphore:
+                try:
+                    method = await _run_file_io(self.copy_file, source, target)
+                    copied.append(key)
+                    methods[method] = methods.get(method, 0) + 1
+                except Exception as e:
+                    failed[key] = str(e)
+            progress['files_done'] += 1
+            progress['bytes_done'] += size
+            progress['path'] = path
+            if progress_callback:
+                callback_result = progress_callback(dict(progress))
+                if asyncio.iscoroutine(callback_result):
+                    await callback_result
+        
+        await asyncio.gather(*(run_job(*job) for job in jobs))
+        return {'copied': copied, 'failed': failed, 'methods': methods}
+
+
+
+# Directory next to the version directories holding content-addressed blobs
+OBJECT_STORE_DIRNAME = '.objects'
+# errno values meaning "hard links are not possible here, fall back to a copy"
+_LINK_FALLBACK_ERRNOS = {errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EOPNOTSUPP, errno.EACCES}
+
+
+class ContentAddressedStore:
+    """
+    Blob store keyed by SHA-256 digest (shared/<slug>/.objects/<ab>/<digest>).
+    Version directories are built from hard links into the store, so a file
+    that is unchanged between versions is stored and copied only once. Blobs
+    and linked files must never be modified in place; every writer in this
+    module replaces files through a temporary sibling and a rename.
+    """
+    
+    def __init__(self, root: Path, copy_engine: FileCopyEngine):
+        self.root = Path(root)
+        self.copy_engine = copy_engine
+    
+    @property
+    def lock_path(self) -> Path:
+        """Lock file held while staging from the store or pruning it"""
+        return self.root.parent / f"{self.root.name}.lock"
+    
+    def blob_path(self, digest: str) -> Path:
+        """Return the storage path of a blob"""
+        return self.root / digest[:2] / digest
+    
+    def missing_digests(self, digests) -> List[str]:
+        """Return the digests that have no blob yet (blocking)"""
+        return [digest for digest in digests if not self.blob_path(digest).is_file()]
+    
+    def link_into(self, digest: str, target: Path) -> str:
+        """
+        Place a blob at target, replacing any existing file atomically (blocking).
+        Returns 'hardlink', or 'copy' when the filesystem cannot hard link.
+        """
+        target = Path(target)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        blob = self.blob_path(digest)
+        temp_path = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.link")
+        try:
+            os.link(blob, temp_path)
+        except OSError as e:
+            if e.errno not in _LINK_FALLBACK_ERRNOS:
+                raise
+            self.copy_engine.copy_file(blob, target)
+            return 'copy'
+        try:
+            os.replace(temp_path, target)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        return 'hardlink'
+    
+    def store_compressed_variant(self, digest: str, encoding: str) -> Optional[int]:
+        """
+        Store the compressed variant of a blob as '<digest><suffix>' and return its
+        size, or None when compression does not make it smaller (blocking).
+        Variants are keyed by content, so unchanged files are never recompressed.
+        """
+        suffix = PRECOMPRESS_ENCODINGS[encoding]
+        variant_path = self.blob_path(digest + suffix)
+        # Marker next to the blob, in its bucket directory
+        skip_path = variant_path.with_name(f".{variant_path.name}.skip")
+        if variant_path.is_file():
+            return variant_path.stat().st_size
+        if skip_path.is_file():
+            return None
+        
+        with open(self.blob_path(digest), 'rb') as f:
+            data = f.read()
+        if encoding == 'gzip':
+            import gzip
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        else:
+            compressed = _load_brotli().compress(data, quality=11)
+        
+        if len(compressed) >= len(data):
+            skip_path.touch()
+            return None
+        temp_path = variant_path.with_name(f".{variant_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(temp_path, 'wb') as f:
+            f.write(compressed)
+        os.replace(temp_path, variant_path)
+        return len(compressed)
+    
+    def prune(self) -> Dict[str, int]:
+        """
+        Delete blobs no version directory links to any more (blocking). Callers
+        must hold lock_path: a blob stored by an in-progress staging has no link yet.
+        """
+        removed = 0
+        freed_bytes = 0
+        if not self.root.is_dir():
+            return {'removed': 0, 'freed_bytes': 0}
+        for bucket in os.scandir(self.root):
+            if not bucket.is_dir(follow_symlinks=False):
+                continue
+            for blob in os.scandir(bucket.path):
+                try:
+                    blob_stat = blob.stat(follow_symlinks=False)
+                    if blob_stat.st_nlink <= 1 and not blob.name.startswith('.'):
+                        os.unlink(blob.path)
+                        removed += 1
+                        freed_bytes += blob_stat.st_size
+                except OSError as e:
+                    logger.warning(f"Failed to prune blob {blob.path}: {e}")
+        return {'removed': removed, 'freed_bytes': freed_bytes}
+
+
+
+# renameat2(2) flag that atomically swaps two existing paths (Linux 3.15+)
+_RENAME_EXCHANGE = 2
+_AT_FDCWD = -100
+_renameat2 = None
+
+
+def _exchange_paths(first: Path, second: Path) -> bool:
+    """Atomically swap two existing paths; returns False where the platform cannot"""
+    global _renameat2
+    if _renameat2 is None:
+        _renameat2 = False
+        if sys.platform.startswith('linux'):
+            try:
+                import ctypes
+                libc = ctypes.CDLL(None, use_errno=True)
+                _renameat2 = libc.renameat2
+                _renameat2.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+                _renameat2.restype = ctypes.c_int
+            except (OSError, AttributeError):
+                _renameat2 = False
+    if not _renameat2:
+        return False
+    
+    if _renameat2(_AT_FDCWD, os.fsencode(first), _AT_FDCWD, os.fsencode(second), _RENAME_EXCHANGE) == 0:
+        return True
+    import ctypes
+    error_number = ctypes.get_errno()
+    if error_number in (errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP):
+        return False
+    raise OSError(error_number, os.strerror(error_number), str(second))
+
+
+# Written into a shared version directory once it has been fully materialized
+MATERIALIZED_MARKER_FILENAME = '.materialized'
+# In-flight materializations per (event loop, shared version directory)
+_materialization_flights: Dict[Tuple[int, str], asyncio.Future] = {}
+
+
+class InterProcessFileLock:
+    """
+    Exclusive fcntl lock on a lock file, acquired on a worker thread so waiting
+    for another process never blocks the event loop. On platforms without fcntl
+    it only provides in-process exclusion through the caller's single-flight.
+    """
+    
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._fd: Optional[int] = None
+    
+    async def __aenter__(self):
+        if fcntl is None:
+            return self
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        loop = asyncio.get_running_loop()
+        acquire = loop.run_in_executor(None, fcntl.flock, fd, fcntl.LOCK_EX)
+        try:
+            await asyncio.shield(acquire)
+        except asyncio.CancelledError:
+            # The worker thread may still get the lock; release it as soon as it does
+            acquire.add_done_callback(lambda _: self._release(fd))
+            raise
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._fd is not None:
+            self._release(self._fd)
+            self._fd = None
+    
+    @staticmethod
+    def _release(fd: int):
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+
+
+# Files whose stat signature, together with the install manifest's, decides whether a cached
+# health snapshot is still valid. Files listed in the manifest are not watched: checking them
+# per file is verify_installation's job, not a per-status-call cost
+HEALTH_WATCHED_PATHS = ('dist/remoteEntry.js', 'package.json', 'assets')
+# Process-wide health snapshots: version directory -> (stat signature, health result)
+_health_snapshots: Dict[str, Tuple[tuple, Dict[str, Any]]] = {}
+_health_snapshots_lock = threading.Lock()
+
+
+def _stat_signature(plugin_dir: Path, relative_paths) -> tuple:
+    """Return (inode, size, mtime) per watched path, or None for missing paths"""
+    signature = []
+    for relative_path in relative_paths:
+        try:
+            path_stat = os.stat(os.path.join(plugin_dir, relative_path))
+            signature.append((path_stat.st_ino, path_stat.st_size, path_stat.st_mtime_ns))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def invalidate_health_snapshots(plugin_dir: Path = None):
+    """Drop cached health snapshots for one version directory, or all of them"""
+    with _health_snapshots_lock:
+        if plugin_dir is None:
+            _health_snapshots.clear()
+        else:
+            _health_snapshots.pop(str(plugin_dir), None)
+
+SERVICE_RUNTIME_TABLE_NAME = 'plugin_service_runtime'
+
+
+@functools.lru_cache(maxsize=None)
+def _service_runtime_table() -> Table:
+    """
+    Dialect-neutral definition used to create plugin_service_runtime when the host app hasn't.
+    The plugin table is declared only so the foreign key resolves; it is never created here.
+    """
+    from sqlalchemy import TIMESTAMP, Column, ForeignKey, Index, MetaData, String, Table, Text
+    metadata = MetaData()
+    Table('plugin', metadata, Column('id', String, primary_key=True))
+    return Table(
+        SERVICE_RUNTIME_TABLE_NAME, metadata,
+        Column('id', String, primary_key=True),
+        Column('plugin_id', String, ForeignKey('plugin.id', ondelete='CASCADE'), nullable=False),
+        Column('plugin_slug', String, nullable=False),
+        Column('name', String, nullable=False),
+        Column('source_url', String),
+        Column('type', String),
+        Column('install_command', Text),
+        Column('start_command', Text),
+        Column('healthcheck_url', String),
+        Column('definition_id', String),
+        Column('required_env_vars', Text),
+        Column('status', String, server_default='pending'),
+        Column('created_at', TIMESTAMP),
+        Column('updated_at', TIMESTAMP),
+        Column('user_id', String, nullable=False),
+        Index('ix_plugin_service_runtime_plugin_user', 'plugin_id', 'user_id'),
+    )
+
+# (index name, table, columns) backing the lifecycle queries' WHERE clauses
+RECOMMENDED_INDEXES = (
+    ('ix_plugin_user_slug', 'plugin', ('user_id', 'plugin_slug')),
+    ('ix_module_plugin_user', 'module', ('plugin_id', 'user_id')),
+    ('ix_plugin_service_runtime_plugin_user', 'plugin_service_runtime', ('plugin_id', 'user_id')),
+    ('ix_settings_instances_definition_user', 'settings_instances', ('definition_id', 'user_id')),
+)
+
+
+# Opt-in catalog: version-level plugin/module metadata stored once per (slug, version).
+# Per-user plugin/module rows then leave these columns NULL, and the resolving views
+# fill them in from the catalog so readers see the same rows as before. Module
+# config_fields is user state (see USER_STATE_MODULE_COLUMNS) and stays in every row.
+CATALOG_PLUGIN_COLUMNS = ('long_description', 'permissions', 'required_services_runtime')
+CATALOG_MODULE_COLUMNS = ('props', 'messages', 'required_services', 'dependencies', 'layout', 'tags')
+PLUGIN_RESOLVED_VIEW = 'plugin_resolved'
+MODULE_RESOLVED_VIEW = 'module_resolved'
+
+CATALOG_TABLE_NAMES = ('plugin_catalog', 'module_catalog')
+
+
+@functools.lru_cache(maxsize=None)
+def _catalog_tables() -> Tuple[Table, Table]:
+    """Definitions of the plugin_catalog and module_catalog tables, sharing one MetaData"""
+    from sqlalchemy import TIMESTAMP, Column, MetaData, String, Table, Text
+    metadata = MetaData()
+    plugin_catalog_table = Table(
+        'plugin_catalog', metadata,
+        Column('plugin_slug', String, primary_key=True),
+        Column('version', String, primary_key=True),
+        *(Column(column, Text) for column in CATALOG_PLUGIN_COLUMNS),
+        Column('created_at', TIMESTAMP),
+    )
+    module_catalog_table = Table(
+        'module_catalog', metadata,
+        Column('plugin_slug', String, primary_key=True),
+        Column('version', String, primary_key=True),
+        Column('name', String, primary_key=True),
+        *(Column(column, Text) for column in CATALOG_MODULE_COLUMNS),
+        Column('created_at', TIMESTAMP),
+    )
+    return plugin_catalog_table, module_catalog_table
+
+
+def _resolved_columns(alias: str, columns: List[str], catalog_columns: Tuple[str, ...]) -> str:
+    """SELECT list taking catalog columns from the per-user row when set, else from the catalog (alias c)"""
+    select = [
+        f"COALESCE({alias}.{column}, c.{column}) AS {column}" if column in catalog_columns else f"{alias}.{column}"
+        for column in columns
+    ]
+    # Catalog columns the host table lacks (e.g. required_services_runtime on older schemas)
+    select += [f"c.{column} AS {column}" for column in catalog_columns if column not in columns]
+    return ', '.join(select)
+
+
+def _create_catalog_schema(sync_connection):
+    """Create the catalog tables and the resolving views (run through AsyncConnection.run_sync)"""
+    from sqlalchemy import inspect, text
+    plugin_catalog_table, module_catalog_table = _catalog_tables()
+    plugin_catalog_table.metadata.create_all(sync_connection, checkfirst=True)
+    inspector = inspect(sync_connection)
+    existing_views = set(inspector.get_view_names())
+    if PLUGIN_RESOLVED_VIEW not in existing_views:
+        plugin_columns = [column['name'] for column in inspector.get_columns('plugin')]
+        sync_connection.execute(text(f"""
+        CREATE VIEW {PLUGIN_RESOLVED_VIEW} AS
+        SELECT {_resolved_columns('p', plugin_columns, CATALOG_PLUGIN_COLUMNS)}
+        FROM plugin p
+        LEFT JOIN {plugin_catalog_table.name} c ON c.plugin_slug = p.plugin_slug AND c.version = p.version
+        """))
+    if MODULE_RESOLVED_VIEW not in existing_views:
+        module_columns = [column['name'] for column in inspector.get_columns('module')]
+        sync_connection.execute(text(f"""
+        CREATE VIEW {MODULE_RESOLVED_VIEW} AS
+        SELECT {_resolved_columns('m', module_columns, CATALOG_MODULE_COLUMNS)}
+        FROM module m
+        LEFT JOIN plugin p ON p.id = m.plugin_id
+        LEFT JOIN {module_catalog_table.name} c
+            ON c.plugin_slug = p.plugin_slug AND c.version = p.version AND c.name = m.name
+        """))
+
+
+def _is_index_covered(columns: Tuple[str, ...], existing: List[Tuple[str, ...]]) -> bool:
+    """True when an existing index (or key) starts with exactly these columns, in any order"""
+    wanted = set(columns)
+    return any(set(index_columns[:len(columns)]) == wanted for index_columns in existing)
+
+
+class SchemaCapabilities:
+    """
+    What the host database schema supports, detected once per engine with the
+    SQLAlchemy inspector so insert paths pick their statements up front instead
+    of probing with statements that may fail.
+    """
+    
+    def __init__(self, dialect: str, plugin_columns: set, service_runtime_columns: Optional[set],
+                 supports_on_conflict: bool = False, missing_indexes: Optional[List[Tuple[str, str, Tuple[str, ...]]]] = None,
+                 has_catalog: bool = False):
+        self.dialect = dialect
+        # Catalog tables and resolving views are present
+        self.has_catalog = has_catalog
+        # Entries of RECOMMENDED_INDEXES not present on existing tables
+        self.missing_indexes = list(missing_indexes or [])
+        # INSERT ... ON CONFLICT DO NOTHING (Postgres, SQLite >= 3.24)
+        self.supports_on_conflict = supports_on_conflict
+        self.plugin_columns = plugin_columns
+        # None when the plugin_service_runtime table does not exist (yet)
+        self.service_runtime_columns = service_runtime_columns
+    
+    @property
+    def has_services_runtime_column(self) -> bool:
+        return 'required_services_runtime' in self.plugin_columns
+    
+    @property
+    def has_service_runtime_table(self) -> bool:
+        return self.service_runtime_columns is not None
+    
+    @classmethod
+    def detect(cls, sync_connection) -> 'SchemaCapabilities':
+        """Inspect the schema on a synchronous connection (run through AsyncConnection.run_sync)"""
+        from sqlalchemy import inspect
+        inspector = inspect(sync_connection)
+        plugin_columns = {column['name'] for column in inspector.get_columns('plugin')}
+        service_runtime_columns = None
+        if inspector.has_table(SERVICE_RUNTIME_TABLE_NAME):
+            service_runtime_columns = {column['name'] for column in inspector.get_columns(SERVICE_RUNTIME_TABLE_NAME)}
+        dialect = sync_connection.dialect
+        supports_on_conflict = dialect.name == 'postgresql' or (
+            dialect.name == 'sqlite' and (dialect.server_version_info or (0,)) >= (3, 24)
+        )
+        
+        missing_indexes = []
+        existing_tables = set(inspector.get_table_names())
+        for name, table, columns in RECOMMENDED_INDEXES:
+            if table not in existing_tables:
+                continue
+            existing = [tuple(index['column_names']) for index in inspector.get_indexes(table)]
+            existing += [tuple(unique['column_names']) for unique in inspector.get_unique_constraints(table)]
+            existing.append(tuple(inspector.get_pk_constraint(table).get('constrained_columns') or ()))
+            if not _is_index_covered(columns, existing):
+                missing_indexes.append((name, table, columns))
+        
+        has_catalog = (
+            all(table in existing_tables for table in CATALOG_TABLE_NAMES)
+            and {PLUGIN_RESOLVED_VIEW, MODULE_RESOLVED_VIEW} <= set(inspector.get_view_names())
+        )
+        
+        return cls(dialect.name, plugin_columns, service_runtime_columns, supports_on_conflict, missing_indexes,
+                   has_catalog)
+
+
+# Engine -> detected capabilities, for the lifetime of the engine
+_schema_capabilities: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+_schema_capabilities_lock = threading.Lock()
+
+
+async def get_schema_capabilities(db: AsyncSession) -> SchemaCapabilities:
+    """Return the cached schema capabilities of the session's engine, detecting them on first use"""
+    connection = await db.connection()
+    engine = connection.sync_engine
+    with _schema_capabilities_lock:
+        capabilities = _schema_capabilities.get(engine)
+    if capabilities is None:
+        capabilities = await connection.run_sync(SchemaCapabilities.detect)
+        logger.info(
+            f"ChatWithYourDocuments: Detected {capabilities.dialect} schema - "
+            f"required_services_runtime column: {capabilities.has_services_runtime_column}, "
+            f"plugin_service_runtime table: {capabilities.has_service_runtime_table}"
+        )
+        with _schema_capabilities_lock:
+            _schema_capabilities[engine] = capabilities
+    return capabilities
+
+
+def invalidate_schema_capabilities(engine=None):
+    """Forget detected capabilities for one engine (sync or async), or for all of them"""
+    with _schema_capabilities_lock:
+        if engine is None:
+            _schema_capabilities.clear()
+        else:
+            _schema_capabilities.pop(getattr(engine, 'sync_engine', engine), None)
+
+
+# Session.info key: engines whose cached capabilities record DDL the session has not committed yet
+_UNCOMMITTED_SCHEMA_KEY = 'chat_with_your_documents_uncommitted_schema'
+
+
+def _keep_committed_schema(session):
+    # Also fires when a savepoint is released; only the outermost commit makes the DDL durable
+    if not session.in_nested_transaction():
+        session.info.pop(_UNCOMMITTED_SCHEMA_KEY, None)
+
+
+def _discard_uncommitted_schema(session, transaction):
+    # Only the outermost transaction decides; savepoints ending changes nothing
+    if transaction.parent is None:
+        for engine in session.info.pop(_UNCOMMITTED_SCHEMA_KEY, ()):
+            invalidate_schema_capabilities(engine)
+
+
+async def _track_uncommitted_schema(db: AsyncSession):
+    """
+    Call after recording a schema change made inside the caller's transaction in the
+    cached capabilities. If that transaction ends without committing, the engine's
+    entry is dropped so the next call re-detects the schema rather than trusting a
+    table or index that was rolled back.
+    """
+    from sqlalchemy import event
+    connection = await db.connection()
+    sync_session = db.sync_session
+    if not event.contains(sync_session, 'after_transaction_end', _discard_uncommitted_schema):
+        event.listen(sync_session, 'after_commit', _keep_committed_schema)
+        event.listen(sync_session, 'after_transaction_end', _discard_uncommitted_schema)
+    sync_session.info.setdefault(_UNCOMMITTED_SCHEMA_KEY, set()).add(connection.sync_engine)
+
+
+@contextlib.asynccontextmanager
+async def _savepoint(db: AsyncSession):
+    """
+    SAVEPOINT around an optional step so its failure rolls back only that step.
+    pysqlite opens its transaction lazily on the first write, and a SAVEPOINT issued
+    before then would start (and on RELEASE commit) a transaction of its own, so the
+    outer transaction is begun explicitly first and the step is always nested in it.
+    It begins IMMEDIATE: the step is about to write, and a deferred transaction that
+    has read first cannot upgrade its lock while another session writes.
+    """
+    connection = await db.connection()
+    if connection.dialect.name == 'sqlite':
+        raw_connection = await connection.get_raw_connection()
+        if not getattr(raw_connection.driver_connection, 'in_transaction', True):
+            await connection.exec_driver_sql("BEGIN IMMEDIATE")
+    async with db.begin_nested():
+        yield
+
+
+# Set to 1/true to enable diagnostic queries on plugin existence checks
+DEBUG_DIAGNOSTICS_ENV_VAR = 'BRAINDRIVE_LIFECYCLE_DEBUG'
+
+# Set to 1/true to write thin per-user rows that reference the shared plugin/module catalog
+CATALOG_MODE_ENV_VAR = 'BRAINDRIVE_LIFECYCLE_CATALOG'
+
+# Appended to INSERTs on dialects that support it so retried installs skip existing rows
+ON_CONFLICT_DO_NOTHING = "ON CONFLICT DO NOTHING"
+
+# Columns holding per-user state, never overwritten by an in-place update
+USER_STATE_PLUGIN_COLUMNS = ('id', 'user_id', 'config_fields', 'enabled', 'status', 'downloads',
+                             'messages', 'dependencies', 'created_at', 'updated_at', 'last_updated')
+USER_STATE_MODULE_COLUMNS = ('id', 'plugin_id', 'user_id', 'config_fields', 'enabled', 'priority',
+                             'created_at', 'updated_at')
+USER_STATE_SERVICE_COLUMNS = ('id', 'plugin_id', 'user_id', 'status', 'created_at', 'updated_at')
+
+# Upper bound on ids bound into a single IN (...) list; keeps bulk statements well below
+# SQLite's host parameter limit and Postgres' parameter count on very large fleets
+BULK_QUERY_CHUNK_SIZE = 500
+
+
+def _chunked(items: List[Any], size: int) -> Iterator[List[Any]]:
+    """Yield consecutive slices of at most size items"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# Multi-row INSERT batches: at most this many rows, and never more bind parameters
+# than asyncpg accepts in one statement (psycopg allows 65535, asyncpg 32767)
+MULTI_ROW_INSERT_MAX_ROWS = 1000
+MULTI_ROW_INSERT_MAX_PARAMS = 32767
+# Dialects whose drivers gain from one multi-row VALUES statement over executemany
+MULTI_ROW_INSERT_DIALECTS = ('postgresql',)
+
+
+class RecordInsert:
+    """
+    INSERT of a fixed column list into a lifecycle table, written for whichever dialect
+    the session is bound to. SQLite's driver runs executemany over a single prepared
+    statement, which is already its fastest bulk path; on Postgres the rows are sent
+    as batches of multi-row VALUES so a bulk install costs a handful of round trips.
+    """
+    
+    def __init__(self, table: str, columns: List[str], on_conflict: bool = False):
+        self.table = table
+        self.columns = tuple(columns)
+        self.on_conflict = on_conflict
+        self._statements: Dict[Tuple[int, bool], Any] = {}
+    
+    def statement(self, row_count: int = 1, returning: bool = False):
+        """
+        The INSERT with one VALUES tuple per row; parameters of row i > 0 are suffixed _i.
+        returning appends RETURNING id, which lists only the rows actually inserted.
+        """
+        statement = self._statements.get((row_count, returning))
+        if statement is None:
+            from sqlalchemy import text
+            values = ', '.join(
+                '(' + ', '.join(f":{column}" if index == 0 else f":{column}_{index}" for column in self.columns) + ')'
+                for index in range(row_count)
+            )
+            statement = text(f"""
+            INSERT INTO {self.table}
+            ({', '.join(self.columns)})
+            VALUES
+            {values}
+            {ON_CONFLICT_DO_NOTHING if self.on_conflict else ""}
+            {"RETURNING id" if returning else ""}
+            """)
+            self._statements[(row_count, returning)] = statement
+        return statement
+    
+    @property
+    def batch_size(self) -> int:
+        return max(1, min(MULTI_ROW_INSERT_MAX_ROWS, MULTI_ROW_INSERT_MAX_PARAMS // len(self.columns)))
+    
+    def _batch_params(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        params = {}
+        for index, row in enumerate(rows):
+            for column in self.columns:
+                params[column if index == 0 else f"{column}_{index}"] = row[column]
+        return params
+    
+    async def execute(self, db: AsyncSession, rows: List[Dict[str, Any]],
+                      report_conflicts: bool = False) -> Dict[str, str]:
+        """
+        Insert rows and return {row id: 'created' | 'already_present'}.
+        With report_conflicts, rows skipped by ON CONFLICT DO NOTHING are told apart:
+        on Postgres from the ids each multi-row batch RETURNs, elsewhere from the
+        rowcount of one statement per row. Otherwise every row is reported as created.
+        """
+        if not rows:
+            return {}
+        connection = await db.connection()
+        multi_row = len(rows) > 1 and connection.dialect.name in MULTI_ROW_INSERT_DIALECTS
+        if report_conflicts:
+            status = {}
+            if multi_row:
+                for batch in _chunked(rows, self.batch_size):
+                    result = await db.execute(self.statement(len(batch), returning=True), self._batch_params(batch))
+                    inserted = {row.id for row in result}
+                    status.update((row['id'], 'created' if row['id'] in inserted else 'already_present') for row in batch)
+                return status
+            for row in rows:
+                result = await db.execute(self.statement(), row)
+                status[row['id']] = 'created' if result.rowcount else 'already_present'
+            return status
+        
+        if multi_row:
+            for batch in _chunked(rows, self.batch_size):
+                await db.execute(self.statement(len(batch)), self._batch_params(batch))
+        else:
+            await db.execute(self.statement(), rows)
+        return {row.get('id'): 'created' for row in rows}
+
+
+# (table, columns, on_conflict) -> RecordInsert, shared by every manager in the process
+# so each statement's text() constructs are built once
+_record_inserts: Dict[Tuple[str, Tuple[str, ...], bool], RecordInsert] = {}
+_record_inserts_lock = threading.Lock()
+
+
+def get_record_insert(table: str, columns, on_conflict: bool = False) -> RecordInsert:
+    """Return the registered RecordInsert for a table/column list, creating it on first use"""
+    key = (table, tuple(columns), on_conflict)
+    record_insert = _record_inserts.get(key)
+    if record_insert is None:
+        with _record_inserts_lock:
+            record_insert = _record_inserts.setdefault(key, RecordInsert(table, columns, on_conflict))
+    return record_insert
+
+
+class PluginMetadataSnapshot:
+    """
+    Immutable per-(slug, version) view of a manager's definitions with every JSON
+    column serialized once. Row builders copy the templates and bind only ids,
+    user_id and timestamps.
+    """
+    
+    __slots__ = ('plugin_slug', 'version', 'plugin_template', 'thin_plugin_template',
+                 'module_templates', 'thin_module_templates', 'service_templates')
+    
+    def __init__(self, plugin_data: Dict[str, Any], module_data: List[Dict[str, Any]],
+                 required_services_runtime: List[Dict[str, Any]]):
+        plugin_template = {
+            'name': plugin_data['name'],
+            'description': plugin_data['description'],
+            'version': plugin_data['version'],
+            'type': plugin_data['type'],
+            'enabled': True,
+            'icon': plugin_data['icon'],
+            'category': plugin_data['category'],
+            'status': 'activated',
+            'official': plugin_data['official'],
+            'author': plugin_data['author'],
+            'compatibility': plugin_data['compatibility'],
+            'downloads': 0,
+            'scope': plugin_data['scope'],
+            'bundle_method': plugin_data['bundle_method'],
+            'bundle_location': plugin_data['bundle_location'],
+            'is_local': plugin_data['is_local'],
+            'long_description': plugin_data['long_description'],
+            'config_fields': json.dumps({}),
+            'messages': None,
+            'dependencies': None,
+            'plugin_slug': plugin_data['plugin_slug'],
+            'source_type': plugin_data['source_type'],
+            'source_url': plugin_data['source_url'],
+            'update_check_url': plugin_data['update_check_url'],
+            'last_update_check': plugin_data['last_update_check'],
+            'update_available': plugin_data['update_available'],
+            'latest_version': plugin_data['latest_version'],
+            'installation_type': plugin_data['installation_type'],
+            'permissions': json.dumps(plugin_data['permissions']),
+            'required_services_runtime': json.dumps(required_services_runtime)
+        }
+        module_templates = tuple(
+            {
+                'name': module['name'],
+                'display_name': module['display_name'],
+                'description': module['description'],
+                'icon': module['icon'],
+                'category': module['category'],
+                'enabled': True,
+                'priority': module['priority'],
+                'props': json.dumps(module['props']),
+                'config_fields': json.dumps(module['config_fields']),
+                'messages': json.dumps(module['messages']),
+                'required_services': json.dumps(module['required_services']),
+                'dependencies': json.dumps(module['dependencies']),
+                'layout': json.dumps(module['layout']),
+                'tags': json.dumps(module['tags'])
+            }
+            for module in module_data
+        )
+        service_templates = tuple(
+            {
+                'plugin_slug': plugin_data['plugin_slug'],
+                'name': service['name'],
+                'source_url': service['source_url'],
+                'type': service['type'],
+                'install_command': service['install_command'],
+                'start_command': service['start_command'],
+                'healthcheck_url': service['healthcheck_url'],
+                'definition_id': service['definition_id'],
+                'required_env_vars': json.dumps(service['required_env_vars']),
+                'status': 'pending'  # Default status for new services
+            }
+            for service in required_services_runtime
+        )
+        
+        freeze = types.MappingProxyType
+        assign = functools.partial(object.__setattr__, self)
+        assign('plugin_slug', plugin_data['plugin_slug'])
+        assign('version', plugin_data['version'])
+        assign('plugin_template', freeze(plugin_template))
+        assign('thin_plugin_template', freeze(dict(plugin_template, **dict.fromkeys(CATALOG_PLUGIN_COLUMNS))))
+        assign('module_templates', tuple(freeze(template) for template in module_templates))
+        assign('thin_module_templates', tuple(
+            freeze(dict(template, **dict.fromkeys(CATALOG_MODULE_COLUMNS))) for template in module_templates
+        ))
+        assign('service_templates', tuple(freeze(template) for template in service_templates))
+    
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+
+# (plugin_slug, version) -> snapshot of that version's definitions
+_metadata_snapshots: Dict[Tuple[str, str], PluginMetadataSnapshot] = {}
+_metadata_snapshots_lock = threading.Lock()
+
+
+def invalidate_metadata_snapshots(plugin_slug: str = None):
+    """Forget metadata snapshots of one plugin, or of every plugin"""
+    with _metadata_snapshots_lock:
+        if plugin_slug is None:
+            _metadata_snapshots.clear()
+        else:
+            for key in [key for key in _metadata_snapshots if key[0] == plugin_slug]:
+                del _metadata_snapshots[key]
+
+
+# Interned user id <-> ordinal dictionary shared by every ActiveUserIndex in the process;
+# each index only stores one bit per ordinal
+_user_id_ordinals: Dict[str, int] = {}
+_user_ids_by_ordinal: List[str] = []
+_user_id_ordinals_lock = threading.Lock()
+
+
+def _user_id_ordinal(user_id: str) -> int:
+    """Ordinal of a user id, assigning the next one on first sight"""
+    ordinal = _user_id_ordinals.get(user_id)
+    if ordinal is None:
+        with _user_id_ordinals_lock:
+            ordinal = _user_id_ordinals.get(user_id)
+            if ordinal is None:
+                ordinal = len(_user_ids_by_ordinal)
+                _user_ids_by_ordinal.append(sys.intern(user_id))
+                _user_id_ordinals[_user_ids_by_ordinal[ordinal]] = ordinal
+    return ordinal
+
+
+class ActiveUserIndex(collections.abc.MutableSet):
+    """
+    Set of user ids stored as a bitmap over the shared user id dictionary, so
+    membership is O(1) and managers of several versions tracking the same
+    100k+ users cost a few kilobytes each instead of a set of strings apiece.
+    Drop-in replacement for BaseLifecycleManager.active_users.
+    """
+    
+    __slots__ = ('_bits', '_count')
+    
+    def __init__(self, user_ids=()):
+        self._bits = bytearray()
+        self._count = 0
+        self.update(user_ids)
+    
+    def __contains__(self, user_id) -> bool:
+        ordinal = _user_id_ordinals.get(str(user_id))
+        if ordinal is None or ordinal >> 3 >= len(self._bits):
+            return False
+        return bool(self._bits[ordinal >> 3] & (1 << (ordinal & 7)))
+    
+    def __iter__(self):
+        for byte_index, byte in enumerate(self._bits):
+            if byte:
+                for bit in range(8):
+                    if byte & (1 << bit):
+                        yield _user_ids_by_ordinal[(byte_index << 3) | bit]
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({len(self)} users)"
+    
+    def add(self, user_id: str):
+        ordinal = _user_id_ordinal(str(user_id))
+        byte_index, mask = ordinal >> 3, 1 << (ordinal & 7)
+        if byte_index >= len(self._bits):
+            self._bits.extend(bytes(byte_index + 1 - len(self._bits)))
+        if not self._bits[byte_index] & mask:
+            self._bits[byte_index] |= mask
+            self._count += 1
+    
+    def discard(self, user_id: str):
+        ordinal = _user_id_ordinals.get(str(user_id))
+        if ordinal is None or ordinal >> 3 >= len(self._bits):
+            return
+        byte_index, mask = ordinal >> 3, 1 << (ordinal & 7)
+        if self._bits[byte_index] & mask:
+            self._bits[byte_index] &= ~mask
+            self._count -= 1
+    
+    def clear(self):
+        self._bits = bytearray()
+        self._count = 0
+    
+    def update(self, user_ids):
+        for user_id in user_ids:
+            self.add(user_id)
+    
+    def difference_update(self, user_ids):
+        for user_id in user_ids:
+            self.discard(user_id)
+
+
+class _LifecycleManagerImplementation:
+    """
+    Lifecycle manager for ChatWithYourDocuments plugin using new architecture.
+    The public ChatWithYourDocumentsLifecycleManager combines this body with
+    BaseLifecycleManager on first access (_get_manager_class), so resolving the
+    base class never happens at import.
+    """
     
     def __init__(self, plugins_base_dir: str = None):
         """Initialize the lifecycle manager"""
@@ -127,6 +1375,17 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
 
         self.settings_definition_id = 'chat_with_document_processor_settings'
 
+        # TEMPLATE: Files and directories left out of the shared plugin directory (.gitignore syntax)
+        self.exclude_patterns = list(DEFAULT_EXCLUDE_PATTERNS)
+        # TEMPLATE: Precompressed variants generated for text assets in dist/ and public/ (empty to disable)
+        self.precompress_encodings = ['gzip', 'br']
+        # Prebuilt archive installed instead of the source tree when present (set to None to disable)
+        self.install_archive = Path(__file__).parent / PLUGIN_ARCHIVE_FILENAME
+        # Extra diagnostic queries (table counts, the user's other plugins) on existence checks
+        self.debug_diagnostics = os.environ.get(DEBUG_DIAGNOSTICS_ENV_VAR, '').lower() in ('1', 'true', 'yes')
+        # TEMPLATE: Store version-level metadata once in plugin_catalog/module_catalog (opt-in)
+        self.catalog_mode = os.environ.get(CATALOG_MODE_ENV_VAR, '').lower() in ('1', 'true', 'yes')
+
         self.required_services_runtime = [
             {
                 "name": "cwyd_service",
@@ -268,6 +1527,9 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
             version=self.plugin_data['version'],
             shared_storage_path=shared_path
         )
+        # Compact index in place of the base class's set; filled from the database on first use
+        self.active_users = ActiveUserIndex(self.active_users)
+        self._active_users_hydrated = False
     
     @property
     def PLUGIN_DATA(self):
@@ -290,7 +1552,8 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
     async def _perform_user_installation(self, user_id: str, db: AsyncSession, shared_plugin_path: Path) -> Dict[str, Any]:
         """Perform user-specific installation using shared plugin path"""
         try:
-            # Create database records for this user
+            # Plugin, module, service and settings rows form one transaction;
+            # any failure rolls all of them back
             db_result = await self._create_database_records(user_id, db)
             if not db_result['success']:
                 return db_result
@@ -298,6 +1561,7 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
             # Create settings definition and instance
             settings_result = await self._create_settings(user_id, db)
             if not settings_result['success']:
+                await db.rollback()
                 return settings_result
             
             # Commit all database changes
@@ -315,12 +1579,15 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
                 'plugin_id': db_result['plugin_id'],
                 'plugin_slug': self.plugin_data['plugin_slug'],
                 'plugin_name': self.plugin_data['name'],
+                'already_installed': not db_result['plugin_created'],
                 'modules_created': db_result['modules_created'],
-                'settings_created': settings_result['settings_created']
+                'settings_created': settings_result['settings_created'],
+                'rows': {**db_result['rows'], **settings_result.get('rows', {})}
             }
             
         except Exception as e:
             logger.error(f"ChatWithYourDocuments: User installation failed for {user_id}: {e}")
+            await db.rollback()
             return {'success': False, 'error': str(e)}
     
     async def _perform_user_uninstallation(self, user_id: str, db: AsyncSession) -> Dict[str, Any]:
@@ -360,95 +1627,670 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
             
         except Exception as e:
             logger.error(f"ChatWithYourDocuments: User uninstallation failed for {user_id}: {e}")
+            await db.rollback()
             return {'success': False, 'error': str(e)}
     
-    async def _copy_plugin_files_impl(self, user_id: str, target_dir: Path, update: bool = False) -> Dict[str, Any]:
+    async def _copy_plugin_files_impl(self, user_id: str, target_dir: Path, update: bool = False,
+                                      progress_callback: Optional[Callable] = None) -> Dict[str, Any]:
         """
         ChatWithYourDocuments-specific implementation of file copying.
         This method is called by the base class during installation.
-        Copies all files from the plugin source directory to the target directory.
+        Synchronizes the plugin source directory into the target directory using
+        a content manifest, so only new or changed files are copied and files that
+        disappeared from the source are removed. With update=True every source
+        file is rehashed instead of trusting size/mtime. File contents live in the
+        content-addressed store next to the version directories and are hard linked
+        into target_dir. All blocking work runs on the file I/O thread pool;
+        progress_callback receives per-blob copy progress.
         """
         try:
+            if self.install_archive and self.install_archive.is_file():
+                return await self._sync_from_archive(self.install_archive, target_dir, update, progress_callback)
+            
             source_dir = Path(__file__).parent
-            copied_files = []
-            
-            # Define files and directories to exclude (similar to build_archive.py)
-            exclude_patterns = {
-                'node_modules',
-                'package-lock.json',
-                '.git',
-                '.gitignore',
-                '__pycache__',
-                '*.pyc',
-                '.DS_Store',
-                'Thumbs.db'
-            }
             
-            def should_copy(path: Path) -> bool:
-                """Check if a file/directory should be copied"""
-                # Check if any part of the path matches exclude patterns
-                for part in path.parts:
-                    if part in exclude_patterns:
-                        return False
-                # Check for pattern matches
-                for pattern in exclude_patterns:
-                    if '*' in pattern and path.name.endswith(pattern.replace('*', '')):
-                        return False
-                return True
+            # Walk and hash off the event loop
+            plan = await _run_file_io(self._plan_file_sync, source_dir, target_dir, update)
+            manifest = plan['manifest']
+            removed_files = [key for key in plan['previous_manifest'] if key not in manifest]
+            
+            # Nothing changed: leave the live tree alone and only refresh the manifest
+            if (not plan['to_copy'] and not removed_files and plan['previous_manifest'] and
+                    (target_dir / PRECOMPRESSED_INDEX_FILENAME).is_file()):
+                await _run_file_io(self._write_manifest, target_dir, manifest)
+                logger.info(f"ChatWithYourDocuments: Plugin files in {target_dir} are up to date ({len(plan['unchanged'])} files)")
+                return {
+                    'success': True,
+                    'copied_files': [],
+                    'stored_blobs': [],
+                    'unchanged_files': plan['unchanged'],
+                    'removed_files': [],
+                    'failed_files': {}
+                }
+            
+            # Import content the store has never seen, once per distinct digest
+            store = self._get_object_store(target_dir)
+            digest_sources = {}
+            for relative_key, entry in manifest.items():
+                digest_sources.setdefault(entry['sha256'], relative_key)
+            missing_digests = await _run_file_io(store.missing_digests, list(digest_sources))
+            copy_jobs = [
+                (digest, source_dir / digest_sources[digest], store.blob_path(digest),
+                 manifest[digest_sources[digest]]['size'], digest_sources[digest])
+                for digest in missing_digests
+            ]
+            copy_result = await self._get_copy_engine().copy_files(copy_jobs, progress_callback)
+            
+            publish_result = await self._publish_manifest_tree(store, target_dir, manifest, copy_result['failed'])
+            if not publish_result['success']:
+                return publish_result
+            
+            copied_files = plan['to_copy']
+            logger.info(
+                f"ChatWithYourDocuments: Synced plugin files to {target_dir} - "
+                f"{len(copied_files)} updated ({len(copy_result['copied'])} new blobs), "
+                f"{len(plan['unchanged'])} unchanged, {len(removed_files)} removed, "
+                f"{publish_result['reused']} resumed from staging "
+                f"(copy methods: {copy_result['methods']}, link methods: {publish_result['methods']}, "
+                f"published by {publish_result['publish_method']})"
+            )
+            return {
+                'success': True,
+                'copied_files': copied_files,
+                'stored_blobs': copy_result['copied'],
+                'unchanged_files': plan['unchanged'],
+                'removed_files': removed_files,
+                'failed_files': {}
+            }
             
-            # Copy all files and directories recursively
-            for item in source_dir.rglob('*'):
-                # Skip the lifecycle_manager.py file itself to avoid infinite recursion
-                if item.name == 'lifecycle_manager.py' and item == Path(__file__):
+        except Exception as e:
+            logger.error(f"ChatWithYourDocuments: Error copying plugin files: {e}")
+            return {'success': False, 'error': str(e)}
+    
+    async def _publish_manifest_tree(self, store: ContentAddressedStore, target_dir: Path,
+                                     manifest: Dict[str, Dict[str, Any]], failed_digests: Dict[str, str]) -> Dict[str, Any]:
+        """Stage the tree described by manifest from the store and swap it in as target_dir"""
+        # Build the complete tree in a sibling staging directory; a previous
+        # interrupted build is resumed, since already linked files are kept
+        staging_dir = target_dir.parent / f".{target_dir.name}.staging"
+        stage_result = await _run_file_io(self._stage_from_store, store, staging_dir, manifest, failed_digests)
+        
+        failed_files = stage_result['failed']
+        if failed_files:
+            for relative_key, error in failed_files.items():
+                logger.warning(f"Failed to copy {relative_key}: {error}")
+            return {
+                'success': False,
+                'error': f"Failed to stage {len(failed_files)} plugin files; staged tree kept in {staging_dir} for resume",
+                'failed_files': failed_files
+            }
+        
+        precompressed_index = await self._stage_precompressed_variants(store, staging_dir, manifest)
+        
+        # Swap the finished tree in so readers never see a partial directory
+        await _run_file_io(self._write_manifest, staging_dir, manifest)
+        publish_method = await _run_file_io(self._publish_staged_tree, staging_dir, target_dir)
+        return {
+            'success': True,
+            'reused': stage_result['reused'],
+            'methods': stage_result['methods'],
+            'publish_method': publish_method,
+            'precompressed_files': len(precompressed_index)
+        }
+    
+    def _get_precompress_encodings(self) -> List[str]:
+        """Return the configured encodings that can be produced in this environment"""
+        return [
+            encoding for encoding in self.precompress_encodings
+            if encoding in PRECOMPRESS_ENCODINGS and (encoding != 'br' or _load_brotli() is not None)
+        ]
+    
+    async def _stage_precompressed_variants(self, store: ContentAddressedStore, staging_dir: Path,
+                                            manifest: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Link .gz/.br siblings of every text asset in dist/ and public/ into the
+        staging tree and write the variant index a static server can consult.
+        Compression runs on the file I/O pool and only for content not seen before.
+        """
+        encodings = self._get_precompress_encodings()
+        candidates = [
+            relative_key for relative_key, entry in manifest.items()
+            if relative_key.startswith(PRECOMPRESS_DIRECTORIES)
+            and relative_key.endswith(PRECOMPRESS_SUFFIXES)
+            and entry['size'] >= PRECOMPRESS_MIN_SIZE
+        ] if encodings else []
+        
+        jobs = sorted({(manifest[relative_key]['sha256'], encoding) for relative_key in candidates for encoding in encodings})
+        results = await asyncio.gather(
+            *(_run_file_io(store.store_compressed_variant, digest, encoding) for digest, encoding in jobs),
+            return_exceptions=True
+        )
+        variant_sizes = {}
+        for job, result in zip(jobs, results):
+            if isinstance(result, Exception):
+                logger.warning(f"ChatWithYourDocuments: Failed to precompress blob {job[0]} ({job[1]}): {result}")
+            elif result is not None:
+                variant_sizes[job] = result
+        
+        return await _run_file_io(self._link_precompressed_variants, store, staging_dir, manifest, candidates,
+                                  encodings, variant_sizes)
+    
+    @staticmethod
+    def _link_precompressed_variants(store: ContentAddressedStore, staging_dir: Path,
+                                     manifest: Dict[str, Dict[str, Any]], candidates: List[str],
+                                     encodings: List[str], variant_sizes: Dict[Tuple[str, str], int]) -> Dict[str, Any]:
+        """Link stored variants next to their assets and write the variant index (blocking)"""
+        index = {}
+        for relative_key in candidates:
+            entry = manifest[relative_key]
+            variants = {}
+            for encoding in encodings:
+                size = variant_sizes.get((entry['sha256'], encoding))
+                if size is None:
+                    continue
+                suffix = PRECOMPRESS_ENCODINGS[encoding]
+                try:
+                    store.link_into(entry['sha256'] + suffix, staging_dir / (relative_key + suffix))
+                    variants[encoding] = {'path': relative_key + suffix, 'size': size}
+                except OSError as e:
+                    logger.warning(f"ChatWithYourDocuments: Failed to link {encoding} variant of {relative_key}: {e}")
+            if variants:
+                index[relative_key] = {'size': entry['size'], 'sha256': entry['sha256'], 'variants': variants}
+        
+        index_path = staging_dir / PRECOMPRESSED_INDEX_FILENAME
+        temp_path = index_path.with_name(f"{index_path.name}.tmp")
+        with open(temp_path, 'w') as f:
+            json.dump({'encodings': encodings, 'files': index}, f, indent=2, sort_keys=True)
+        os.replace(temp_path, index_path)
+        return index
+    
+    async def _sync_from_archive(self, archive_path: Path, target_dir: Path, update: bool,
+                                 progress_callback: Optional[Callable] = None) -> Dict[str, Any]:
+        """
+        Install the shared version directory from the prebuilt archive. The archive
+        is read once, sequentially; only content missing from the object store is
+        written, and every file is checked against the archive manifest hash.
+        """
+        store = self._get_object_store(target_dir)
+        loop = asyncio.get_running_loop()
+        
+        def report(progress):
+            if progress_callback:
+                loop.call_soon_threadsafe(_dispatch_progress, progress_callback, progress)
+        
+        extract_result = await _run_file_io(self._extract_archive_to_store, archive_path, store, report)
+        manifest = extract_result['manifest']
+        
+        diff = await _run_file_io(self._diff_against_live_tree, target_dir, manifest)
+        if (not update and not diff['changed'] and not diff['removed'] and diff['has_manifest'] and
+                (target_dir / PRECOMPRESSED_INDEX_FILENAME).is_file()):
+            logger.info(f"ChatWithYourDocuments: Plugin files in {target_dir} match archive {archive_path.name}")
+            return {
+                'success': True,
+                'copied_files': [],
+                'stored_blobs': extract_result['stored_blobs'],
+                'unchanged_files': diff['unchanged'],
+                'removed_files': [],
+                'failed_files': {}
+            }
+        
+        publish_result = await self._publish_manifest_tree(store, target_dir, manifest, {})
+        if not publish_result['success']:
+            return publish_result
+        
+        logger.info(
+            f"ChatWithYourDocuments: Installed {archive_path.name} into {target_dir} - "
+            f"{len(diff['changed'])} updated ({len(extract_result['stored_blobs'])} new blobs), "
+            f"{len(diff['unchanged'])} unchanged, {len(diff['removed'])} removed "
+            f"(published by {publish_result['publish_method']})"
+        )
+        return {
+            'success': True,
+            'copied_files': diff['changed'],
+            'stored_blobs': extract_result['stored_blobs'],
+            'unchanged_files': diff['unchanged'],
+            'removed_files': diff['removed'],
+            'failed_files': {}
+        }
+    
+    def _extract_archive_to_store(self, archive_path: Path, store: ContentAddressedStore,
+                                  report: Callable) -> Dict[str, Any]:
+        """Stream archive members into the object store, verifying hashes (blocking)"""
+        import tarfile
+        manifest = None
+        missing = set()
+        stored_blobs = []
+        progress = {'files_done': 0, 'files_total': 0, 'bytes_done': 0, 'bytes_total': 0, 'path': None}
+        
+        with tarfile.open(archive_path, mode='r|gz') as archive:
+            for member in archive:
+                if manifest is None:
+                    if member.name != PLUGIN_MANIFEST_FILENAME or not member.isfile():
+                        raise ValueError(f"{archive_path.name} does not start with {PLUGIN_MANIFEST_FILENAME}")
+                    manifest_document = json.load(archive.extractfile(member))
+                    if manifest_document.get('version') != self.plugin_data['version']:
+                        raise ValueError(
+                            f"{archive_path.name} contains version {manifest_document.get('version')}, "
+                            f"expected {self.plugin_data['version']}"
+                        )
+                    manifest = _validate_archive_manifest(manifest_document.get('files'), archive_path.name)
+                    missing = set(store.missing_digests({entry['sha256'] for entry in manifest.values()}))
+                    progress['files_total'] = len(missing)
+                    progress['bytes_total'] = sum(
+                        {entry['sha256']: entry['size'] for entry in manifest.values() if entry['sha256'] in missing}.values()
+                    )
+                    if not missing:
+                        # Every blob is already stored; no need to read the rest of the archive
+                        break
                     continue
-                    
-                # Get relative path from source directory
-                relative_path = item.relative_to(source_dir)
                 
-                # Check if we should copy this item
-                if not should_copy(relative_path):
+                entry = manifest.get(member.name)
+                if entry is None or not member.isfile() or not _is_safe_relative_path(member.name):
+                    raise ValueError(f"{archive_path.name} contains unexpected member {member.name!r}")
+                digest = entry['sha256']
+                if digest not in missing:
                     continue
                 
-                target_path = target_dir / relative_path
+                self._write_blob_from_stream(store, archive.extractfile(member), entry)
+                missing.discard(digest)
+                stored_blobs.append(digest)
+                progress['files_done'] += 1
+                progress['bytes_done'] += entry['size']
+                progress['path'] = member.name
+                report(dict(progress))
+                if not missing:
+                    break
+        
+        if manifest is None:
+            raise ValueError(f"{archive_path.name} is empty")
+        if missing:
+            raise ValueError(f"{archive_path.name} is missing content for {len(missing)} manifest entries")
+        return {'manifest': manifest, 'stored_blobs': stored_blobs}
+    
+    @staticmethod
+    def _write_blob_from_stream(store: ContentAddressedStore, stream, entry: Dict[str, Any]):
+        """Write one archive member into the store, rejecting it on a size or hash mismatch"""
+        import hashlib
+        blob_path = store.blob_path(entry['sha256'])
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = blob_path.with_name(f".{blob_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(temp_path, 'wb') as f:
+                for chunk in iter(lambda: stream.read(1024 * 1024), b''):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+            if size != entry['size'] or digest.hexdigest() != entry['sha256']:
+                raise ValueError(f"archive content does not match manifest entry {entry['sha256']}")
+            if entry.get('mtime_ns'):
+                os.utime(temp_path, ns=(entry['mtime_ns'], entry['mtime_ns']))
+            os.replace(temp_path, blob_path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+    
+    def _diff_against_live_tree(self, target_dir: Path, manifest: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Compare a manifest with the live tree's manifest and files (blocking)"""
+        live_manifest = self._load_manifest(target_dir)
+        changed, unchanged = [], []
+        for relative_key, entry in manifest.items():
+            live_entry = live_manifest.get(relative_key)
+            target_path = target_dir / relative_key
+            if (live_entry and live_entry.get('sha256') == entry['sha256'] and
+                    target_path.is_file() and target_path.stat().st_size == entry['size']):
+                unchanged.append(relative_key)
+            else:
+                changed.append(relative_key)
+        removed = [key for key in live_manifest if key not in manifest]
+        return {'changed': changed, 'unchanged': unchanged, 'removed': removed, 'has_manifest': bool(live_manifest)}
+    
+    def build_plugin_archive(self, output_path: Path = None) -> Dict[str, Any]:
+        """
+        Build the prebuilt install archive: a gzip tarball of the installable files
+        whose first member is the content manifest. Run at build time, e.g. via
+        `python lifecycle_manager.py build-archive`.
+        """
+        import tarfile
+        try:
+            source_dir = Path(__file__).parent
+            output_path = Path(output_path or self.install_archive or source_dir / PLUGIN_ARCHIVE_FILENAME)
+            
+            files = {}
+            for relative_key, entry in _walk_plugin_files(source_dir, self._get_exclude_matcher()):
+                source_stat = entry.stat()
+                files[relative_key] = {
+                    'size': source_stat.st_size,
+                    'mtime_ns': source_stat.st_mtime_ns,
+                    'sha256': _sha256_file(entry.path)
+                }
+            manifest_bytes = json.dumps({
+                'plugin_slug': self.plugin_data['plugin_slug'],
+                'version': self.plugin_data['version'],
+                'generated_at': datetime.datetime.now().isoformat(),
+                'files': files
+            }, indent=2, sort_keys=True).encode('utf-8')
+            
+            def normalize(tarinfo: tarfile.TarInfo) -> tarfile.TarInfo:
+                tarinfo.uid = tarinfo.gid = 0
+                tarinfo.uname = tarinfo.gname = ''
+                return tarinfo
+            
+            temp_path = output_path.with_name(f".{output_path.name}.tmp")
+            with tarfile.open(temp_path, mode='w:gz', format=tarfile.PAX_FORMAT) as archive:
+                manifest_info = normalize(tarfile.TarInfo(PLUGIN_MANIFEST_FILENAME))
+                manifest_info.size = len(manifest_bytes)
+                manifest_info.mtime = int(datetime.datetime.now().timestamp())
+                archive.addfile(manifest_info, io.BytesIO(manifest_bytes))
+                for relative_key in sorted(files):
+                    archive.add(source_dir / relative_key, arcname=relative_key, recursive=False, filter=normalize)
+            os.replace(temp_path, output_path)
+            
+            logger.info(f"ChatWithYourDocuments: Built install archive {output_path} with {len(files)} files")
+            return {'success': True, 'archive_path': str(output_path), 'file_count': len(files)}
+            
+        except Exception as e:
+            logger.error(f"ChatWithYourDocuments: Error building install archive: {e}")
+            return {'success': False, 'error': str(e)}
+    
+    async def _ensure_shared_files(self, user_id: str, force: bool = False) -> Dict[str, Any]:
+        """
+        Materialize the shared version directory exactly once per (slug, version).
+        Returns immediately when the completed marker exists. Concurrent coroutines
+        share one in-flight materialization and other processes are serialized
+        through the object store's lock file. force=True resyncs
+        even when the marker is present.
+        """
+        shared_path = self.shared_path
+        if not force and (shared_path / MATERIALIZED_MARKER_FILENAME).is_file():
+            return {'success': True, 'materialized': False}
+        
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), str(shared_path))
+        flight = _materialization_flights.get(flight_key)
+        if flight is not None:
+            logger.debug(f"ChatWithYourDocuments: Waiting for in-flight materialization of {shared_path}")
+            try:
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise
+            # The leader was cancelled; take over (the first waiter to get here becomes the new leader)
+            return await self._ensure_shared_files(user_id, force)
+        
+        flight = loop.create_future()
+        _materialization_flights[flight_key] = flight
+        result = None
+        try:
+            result = await self._materialize_shared_files(user_id, force)
+        except Exception as e:
+            logger.error(f"ChatWithYourDocuments: Error materializing shared files: {e}")
+            result = {'success': False, 'error': str(e)}
+        finally:
+            _materialization_flights.pop(flight_key, None)
+            if not flight.done():
+                if result is None:
+                    # Cancelled (or otherwise aborted) leader: wake the waiters instead of leaving them hanging
+                    flight.cancel()
+                else:
+                    flight.set_result(result)
+        return result
+    
+    async def _materialize_shared_files(self, user_id: str, force: bool) -> Dict[str, Any]:
+        """Sync the shared version directory under the object store lock and mark it complete"""
+        shared_path = self.shared_path
+        marker_path = shared_path / MATERIALIZED_MARKER_FILENAME
+        
+        # The store lock also keeps prune_shared_objects away from blobs staged but not yet linked
+        async with InterProcessFileLock(self._get_object_store(shared_path).lock_path):
+            # Another process may have finished while we waited for the lock
+            if not force and marker_path.is_file():
+                return {'success': True, 'materialized': False}
+            
+            copy_result = await self._copy_plugin_files_impl(user_id, shared_path, update=force)
+            if not copy_result['success']:
+                return copy_result
+            if copy_result['failed_files']:
+                return {
+                    'success': False,
+                    'error': f"Failed to copy {len(copy_result['failed_files'])} plugin files",
+                    'failed_files': copy_result['failed_files']
+                }
+            
+            await _run_file_io(self._write_materialized_marker, marker_path, copy_result)
+            logger.info(f"ChatWithYourDocuments: Materialized shared files in {shared_path}")
+            return {'success': True, 'materialized': True, **copy_result}
+    
+    def _write_materialized_marker(self, marker_path: Path, copy_result: Dict[str, Any]):
+        """Atomically write the completed-materialization marker (blocking)"""
+        temp_path = marker_path.with_name(f"{marker_path.name}.tmp")
+        with open(temp_path, 'w') as f:
+            json.dump({
+                'plugin_slug': self.plugin_data['plugin_slug'],
+                'version': self.plugin_data['version'],
+                'completed_at': datetime.datetime.now().isoformat(),
+                'file_count': len(copy_result['copied_files']) + len(copy_result['unchanged_files'])
+            }, f, indent=2)
+        os.replace(temp_path, marker_path)
+    
+    def _plan_file_sync(self, source_dir: Path, target_dir: Path, update: bool) -> Dict[str, Any]:
+        """Walk and hash the source tree and decide which files need copying (blocking)"""
+        previous_manifest = self._load_manifest(target_dir)
+        manifest = {}
+        to_copy = []
+        unchanged = []
+        
+        # Walk the source tree without descending into excluded directories
+        for relative_key, entry in _walk_plugin_files(source_dir, self._get_exclude_matcher()):
+            target_path = target_dir / relative_key
+            try:
+                source_stat = entry.stat()
+                previous_entry = previous_manifest.get(relative_key)
+                target_intact = (
+                    target_path.is_file() and
+                    target_path.stat().st_size == source_stat.st_size
+                )
                 
-                try:
-                    if item.is_file():
-                        # Create parent directories if they don't exist
-                        target_path.parent.mkdir(parents=True, exist_ok=True)
-                        
-                        # Copy file
-                        if update and target_path.exists():
-                            target_path.unlink()  # Remove existing file
-                        shutil.copy2(item, target_path)
-                        copied_files.append(str(relative_path))
-                        logger.debug(f"Copied file: {relative_path}")
-                        
-                    elif item.is_dir():
-                        # Create directory
-                        target_path.mkdir(parents=True, exist_ok=True)
-                        logger.debug(f"Created directory: {relative_path}")
-                        
-                except Exception as e:
-                    logger.warning(f"Failed to copy {relative_path}: {e}")
+                # Fast path: same size and mtime as the last sync
+                if (not update and previous_entry and target_intact and
+                        previous_entry.get('size') == source_stat.st_size and
+                        previous_entry.get('mtime_ns') == source_stat.st_mtime_ns):
+                    manifest[relative_key] = previous_entry
+                    unchanged.append(relative_key)
                     continue
+                
+                digest = _sha256_file(entry.path)
+                manifest[relative_key] = {
+                    'size': source_stat.st_size,
+                    'mtime_ns': source_stat.st_mtime_ns,
+                    'sha256': digest
+                }
+                
+                # Touched but identical content: only refresh the manifest entry
+                if previous_entry and target_intact and previous_entry.get('sha256') == digest:
+                    if 'installed_mtime_ns' in previous_entry:
+                        manifest[relative_key]['installed_mtime_ns'] = previous_entry['installed_mtime_ns']
+                    unchanged.append(relative_key)
+                else:
+                    to_copy.append(relative_key)
+                    
+            except OSError as e:
+                logger.warning(f"Failed to read {relative_key}: {e}")
+                if relative_key in previous_manifest:
+                    manifest[relative_key] = previous_manifest[relative_key]
+        
+        return {
+            'previous_manifest': previous_manifest,
+            'manifest': manifest,
+            'to_copy': to_copy,
+            'unchanged': unchanged
+        }
+    
+    @staticmethod
+    def _stage_from_store(store: ContentAddressedStore, staging_dir: Path, manifest: Dict[str, Dict[str, Any]],
+                          failed_digests: Dict[str, str]) -> Dict[str, Any]:
+        """Link every manifest entry from the store into the staging tree (blocking)"""
+        staging_dir.mkdir(parents=True, exist_ok=True)
+        reused, failed, methods = 0, {}, {}
+        for relative_key, entry in manifest.items():
+            digest = entry['sha256']
+            if digest in failed_digests:
+                failed[relative_key] = failed_digests[digest]
+                continue
+            staged_path = staging_dir / relative_key
+            try:
+                # Already linked by an interrupted earlier build
+                if staged_path.is_file() and os.path.samefile(staged_path, store.blob_path(digest)):
+                    reused += 1
+                else:
+                    method = store.link_into(digest, staged_path)
+                    methods[method] = methods.get(method, 0) + 1
+                # Recorded for quick integrity checks of the installed file
+                entry['installed_mtime_ns'] = staged_path.stat().st_mtime_ns
+            except OSError as e:
+                failed[relative_key] = str(e)
+        
+        # Drop leftovers of an interrupted build from a different source state
+        for dirpath, dirnames, filenames in os.walk(staging_dir, topdown=False):
+            for name in filenames:
+                file_path = os.path.join(dirpath, name)
+                relative_key = os.path.relpath(file_path, staging_dir).replace(os.sep, '/')
+                if relative_key not in manifest and relative_key != PLUGIN_MANIFEST_FILENAME:
+                    os.unlink(file_path)
+            if dirpath != str(staging_dir) and not os.listdir(dirpath):
+                os.rmdir(dirpath)
+        
+        return {'reused': reused, 'failed': failed, 'methods': methods}
+    
+    @staticmethod
+    def _publish_staged_tree(staging_dir: Path, target_dir: Path) -> str:
+        """Swap a fully built staging tree into place as the live directory (blocking)"""
+        import shutil
+        if not target_dir.exists():
+            os.rename(staging_dir, target_dir)
+            return 'rename'
+        
+        if _exchange_paths(staging_dir, target_dir):
+            # staging_dir now holds the previous tree
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            return 'exchange'
+        
+        # No atomic exchange on this platform: retire the old tree, then rename
+        retired_dir = target_dir.parent / f".{target_dir.name}.retired.{os.getpid()}"
+        os.rename(target_dir, retired_dir)
+        os.rename(staging_dir, target_dir)
+        shutil.rmtree(retired_dir, ignore_errors=True)
+        return 'rename'
+    
+    def _load_manifest(self, target_dir: Path) -> Dict[str, Dict[str, Any]]:
+        """Load the file manifest written by the previous sync, if any"""
+        manifest_path = target_dir / PLUGIN_MANIFEST_FILENAME
+        try:
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+            return manifest.get('files', {})
+        except FileNotFoundError:
+            return {}
+        except (json.JSONDecodeError, AttributeError) as e:
+            logger.warning(f"ChatWithYourDocuments: Ignoring unreadable manifest {manifest_path}: {e}")
+            return {}
+    
+    def _write_manifest(self, target_dir: Path, files: Dict[str, Dict[str, Any]]):
+        """Atomically write the file manifest into the target directory"""
+        target_dir.mkdir(parents=True, exist_ok=True)
+        manifest_path = target_dir / PLUGIN_MANIFEST_FILENAME
+        temp_path = manifest_path.with_name(f"{manifest_path.name}.tmp")
+        manifest = {
+            'plugin_slug': self.plugin_data['plugin_slug'],
+            'version': self.plugin_data['version'],
+            'generated_at': datetime.datetime.now().isoformat(),
+            'files': files
+        }
+        with open(temp_path, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(temp_path, manifest_path)
+    
+    def _get_copy_engine(self) -> FileCopyEngine:
+        """Return the file copy engine used to materialize the shared plugin directory"""
+        engine = getattr(self, '_copy_engine', None)
+        if engine is None:
+            engine = FileCopyEngine()
+            self._copy_engine = engine
+        return engine
+    
+    def _get_object_store(self, target_dir: Path = None) -> ContentAddressedStore:
+        """Return the content-addressed store shared by all versions of this plugin"""
+        target_dir = Path(target_dir or self.shared_path)
+        return ContentAddressedStore(target_dir.parent / OBJECT_STORE_DIRNAME, self._get_copy_engine())
+    
+    async def prune_shared_objects(self) -> Dict[str, Any]:
+        """Delete stored blobs that no longer belong to any installed version directory"""
+        try:
+            store = self._get_object_store()
+            async with InterProcessFileLock(store.lock_path):
+                result = await _run_file_io(store.prune)
+            logger.info(f"ChatWithYourDocuments: Pruned {result['removed']} unused blobs ({result['freed_bytes']} bytes)")
+            return {'success': True, **result}
+        except Exception as e:
+            logger.error(f"ChatWithYourDocuments: Error pruning shared objects: {e}")
+            return {'success': False, 'error': str(e)}
+    
+    def _get_exclude_matcher(self) -> PathExclusionMatcher:
+        """Return the compiled exclusion matcher for this plugin's source tree"""
+        matcher = getattr(self, '_exclude_matcher', None)
+        if matcher is None:
+            matcher = PathExclusionMatcher(self.exclude_patterns)
+            self._exclude_matcher = matcher
+        return matcher
+    
+    async def verify_installation(self, deep: bool = False, plugin_dir: Path = None) -> Dict[str, Any]:
+        """
+        Verify the installed shared files against the integrity manifest.
+        Quick mode compares size and mtime only; deep mode rehashes every file
+        through memory-mapped reads on the file I/O pool.
+        """
+        try:
+            plugin_dir = Path(plugin_dir or self.shared_path)
+            manifest = await _run_file_io(self._load_manifest, plugin_dir)
+            if not manifest:
+                return {'success': False, 'valid': False, 'error': f'No integrity manifest in {plugin_dir}'}
             
-            # Also copy the lifecycle_manager.py file itself
-            lifecycle_manager_source = source_dir / 'lifecycle_manager.py'
-            lifecycle_manager_target = target_dir / 'lifecycle_manager.py'
-            if lifecycle_manager_source.exists():
-                lifecycle_manager_target.parent.mkdir(parents=True, exist_ok=True)
-                if update and lifecycle_manager_target.exists():
-                    lifecycle_manager_target.unlink()
-                shutil.copy2(lifecycle_manager_source, lifecycle_manager_target)
-                copied_files.append('lifecycle_manager.py')
-                logger.info(f"Copied lifecycle_manager.py")
+            quick_result = await _run_file_io(_verify_manifest_files, plugin_dir, manifest)
+            missing, mismatched = quick_result['missing'], quick_result['mismatched']
+            
+            if deep:
+                candidates = [key for key in manifest if key not in missing]
+                digests = await asyncio.gather(
+                    *(_run_file_io(_sha256_mmap, plugin_dir / key) for key in candidates),
+                    return_exceptions=True
+                )
+                mismatched = [
+                    key for key, digest in zip(candidates, digests)
+                    if isinstance(digest, Exception) or digest != manifest[key]['sha256']
+                ]
             
-            logger.info(f"ChatWithYourDocuments: Copied {len(copied_files)} files/directories to {target_dir}")
-            return {'success': True, 'copied_files': copied_files}
+            valid = not missing and not mismatched
+            if not valid:
+                logger.warning(
+                    f"ChatWithYourDocuments: Integrity check failed for {plugin_dir} - "
+                    f"{len(missing)} missing, {len(mismatched)} mismatched"
+                )
+            return {
+                'success': True,
+                'valid': valid,
+                'mode': 'deep' if deep else 'quick',
+                'checked': len(manifest),
+                'missing': missing,
+                'mismatched': mismatched
+            }
             
         except Exception as e:
-            logger.error(f"ChatWithYourDocuments: Error copying plugin files: {e}")
-            return {'success': False, 'error': str(e)}
+            logger.error(f"ChatWithYourDocuments: Error verifying installation: {e}")
+            return {'success': False, 'valid': False, 'error': str(e)}
     
     async def _validate_installation_impl(self, user_id: str, plugin_dir: Path) -> Dict[str, Any]:
         """
@@ -499,6 +2341,18 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
                     'error': 'ChatWithYourDocuments: Bundle file (remoteEntry.js) is empty'
                 }
             
+            # Catch truncated or corrupt bundles recorded in the integrity manifest
+            if (plugin_dir / PLUGIN_MANIFEST_FILENAME).is_file():
+                integrity = await self.verify_installation(plugin_dir=plugin_dir)
+                if not integrity['valid']:
+                    return {
+                        'valid': False,
+                        'error': (
+                            f"ChatWithYourDocuments: Integrity check failed - missing: {integrity.get('missing')}, "
+                            f"mismatched: {integrity.get('mismatched')}"
+                        )
+                    }
+            
             logger.info(f"ChatWithYourDocuments: Installation validation passed for user {user_id}")
             return {'valid': True}
             
@@ -540,11 +2394,19 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
             if assets_path.exists() and assets_path.is_dir():
                 health_info['assets_present'] = True
             
+            # Quick integrity check (stat only) against the install manifest
+            manifest = self._load_manifest(plugin_dir)
+            if manifest:
+                integrity = _verify_manifest_files(plugin_dir, manifest)
+                health_info['integrity_ok'] = not integrity['missing'] and not integrity['mismatched']
+                health_info['integrity_failures'] = integrity['missing'] + integrity['mismatched']
+            
             # Determine overall health
             is_healthy = (
                 health_info['bundle_exists'] and 
                 health_info['bundle_size'] > 0 and
-                health_info['package_json_valid']
+                health_info['package_json_valid'] and
+                health_info.get('integrity_ok', True)
             )
             
             return {
@@ -559,36 +2421,49 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
                 'details': {'error': str(e)}
             }
     
+    async def _get_shared_health_snapshot(self, plugin_dir: Path) -> Dict[str, Any]:
+        """
+        Return the health of a shared version directory from the process-wide
+        snapshot. The result is identical for every user of a version, so it is
+        only recomputed when the stat signature of the install manifest or of
+        HEALTH_WATCHED_PATHS changes. A corrupted file the manifest lists is
+        found by verify_installation, not by this snapshot.
+        """
+        key = str(plugin_dir)
+        watched_paths = HEALTH_WATCHED_PATHS + (PLUGIN_MANIFEST_FILENAME,)
+        # Taken before the health check, so a change racing with it invalidates the snapshot
+        signature = _stat_signature(plugin_dir, watched_paths)
+        with _health_snapshots_lock:
+            cached = _health_snapshots.get(key)
+        if cached is None or cached[0] != signature:
+            health = await self._get_plugin_health_impl(None, plugin_dir)
+            # Errors are not cached so the next status call retries
+            if 'error' not in health['details']:
+                with _health_snapshots_lock:
+                    _health_snapshots[key] = (signature, health)
+            cached = (signature, health)
+        health = cached[1]
+        return {'healthy': health['healthy'], 'details': dict(health['details'])}
+    
     async def _check_existing_plugin(self, user_id: str, db: AsyncSession) -> Dict[str, Any]:
         """Check if plugin already exists for user"""
+        from sqlalchemy import text
         try:
             plugin_slug = self.plugin_data['plugin_slug']
-            logger.info(f"ChatWithYourDocuments: Checking for existing plugin - user_id: {user_id}, plugin_slug: {plugin_slug}")
-            
-            # First test database connectivity
-            test_query = text("SELECT COUNT(*) as count FROM plugin")
-            test_result = await db.execute(test_query)
-            test_row = test_result.fetchone()
-            logger.info(f"ChatWithYourDocuments: Database connectivity test - total plugins: {test_row.count}")
+            logger.debug(f"ChatWithYourDocuments: Checking for existing plugin - user_id: {user_id}, plugin_slug: {plugin_slug}")
             
             plugin_query = text("""
             SELECT id, name, version, enabled, created_at, updated_at, plugin_slug
             FROM plugin
             WHERE user_id = :user_id AND plugin_slug = :plugin_slug
+            LIMIT 1
             """)
             
-            query_params = {
-                'user_id': user_id,
-                'plugin_slug': plugin_slug
-            }
-            logger.info(f"ChatWithYourDocuments: Executing query with params: {query_params}")
-            
-            result = await db.execute(plugin_query, query_params)
+            result = await db.execute(plugin_query, {'user_id': user_id, 'plugin_slug': plugin_slug})
             
             plugin_row = result.fetchone()
-            logger.info(f"ChatWithYourDocuments: Query result: {plugin_row}")
             if plugin_row:
-                logger.info(f"ChatWithYourDocuments: Found existing plugin - id: {plugin_row.id}, name: {plugin_row.name}")
+                logger.debug(f"ChatWithYourDocuments: Found existing plugin - id: {plugin_row.id}, name: {plugin_row.name}")
                 return {
                     'exists': True,
                     'plugin_id': plugin_row.id,
@@ -601,70 +2476,385 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
                         'updated_at': plugin_row.updated_at
                     }
                 }
-            else:
-                logger.warning(f"ChatWithYourDocuments: No plugin found for user_id: {user_id}, plugin_slug: {plugin_slug}")
-                
-                # Debug: Check if there are any plugins for this user
-                debug_query = text("SELECT id, plugin_slug FROM plugin WHERE user_id = :user_id")
-                debug_result = await db.execute(debug_query, {'user_id': user_id})
-                debug_rows = debug_result.fetchall()
-                if debug_rows:
-                    logger.info(f"ChatWithYourDocuments: User has {len(debug_rows)} other plugins:")
-                    for row in debug_rows:
-                        logger.info(f"  - {row.plugin_slug} (id: {row.id})")
-                else:
-                    logger.info(f"ChatWithYourDocuments: User has no plugins installed")
-                
-                return {'exists': False}
+            
+            if self.debug_diagnostics:
+                await self._log_existence_diagnostics(user_id, db)
+            return {'exists': False}
                 
         except Exception as e:
             logger.error(f"ChatWithYourDocuments: Error checking existing plugin: {e}")
             return {'exists': False, 'error': str(e)}
     
+    async def _log_existence_diagnostics(self, user_id: str, db: AsyncSession):
+        """Connectivity test and listing of the user's other plugins, only run in debug mode"""
+        from sqlalchemy import text
+        plugin_slug = self.plugin_data['plugin_slug']
+        logger.warning(f"ChatWithYourDocuments: No plugin found for user_id: {user_id}, plugin_slug: {plugin_slug}")
+        
+        test_result = await db.execute(text("SELECT COUNT(*) as count FROM plugin"))
+        logger.info(f"ChatWithYourDocuments: Database connectivity test - total plugins: {test_result.fetchone().count}")
+        
+        debug_result = await db.execute(
+            text("SELECT id, plugin_slug FROM plugin WHERE user_id = :user_id"),
+            {'user_id': user_id}
+        )
+        debug_rows = debug_result.fetchall()
+        if debug_rows:
+            logger.info(f"ChatWithYourDocuments: User has {len(debug_rows)} other plugins:")
+            for row in debug_rows:
+                logger.info(f"  - {row.plugin_slug} (id: {row.id})")
+        else:
+            logger.info(f"ChatWithYourDocuments: User has no plugins installed")
+    
+    async def hydrate_active_users(self, db: AsyncSession, force: bool = False) -> int:
+        """
+        Load every user with a plugin row for this slug and version into active_users with one query.
+        Runs once per manager (again with force); install and uninstall keep it current after that.
+        Returns the number of active users.
+        """
+        from sqlalchemy import text
+        if self._active_users_hydrated and not force:
+            return len(self.active_users)
+        result = await db.execute(
+            text("SELECT user_id FROM plugin WHERE plugin_slug = :plugin_slug AND version = :version"),
+            {'plugin_slug': self.plugin_data['plugin_slug'], 'version': self.plugin_data['version']}
+        )
+        active_users = ActiveUserIndex(row.user_id for row in result if row.user_id is not None)
+        self.active_users = active_users
+        self._active_users_hydrated = True
+        logger.info(f"ChatWithYourDocuments: Hydrated {len(active_users)} active users")
+        return len(active_users)
+    
+    async def plugin_exists(self, user_id: str, db: AsyncSession) -> bool:
+        """Single indexed EXISTS probe for whether the user has this plugin installed"""
+        from sqlalchemy import text
+        result = await db.execute(
+            text("""
+            SELECT EXISTS (
+                SELECT 1 FROM plugin WHERE user_id = :user_id AND plugin_slug = :plugin_slug
+            )
+            """),
+            {'user_id': user_id, 'plugin_slug': self.plugin_data['plugin_slug']}
+        )
+        return bool(result.scalar())
+    
+    async def plugins_exist(self, user_ids: List[str], db: AsyncSession) -> Dict[str, bool]:
+        """Batched existence check: {user_id: installed} for many users in one query per chunk"""
+        user_ids = list(dict.fromkeys(str(user_id) for user_id in user_ids))
+        installed = await self._get_installed_user_ids(user_ids, db)
+        return {user_id: user_id in installed for user_id in user_ids}
+    
+    async def _get_installed_user_ids(self, user_ids: List[str], db: AsyncSession) -> Dict[str, str]:
+        """Return {user_id: plugin_id} for every given user that already has this plugin, in chunked IN queries"""
+        from sqlalchemy import bindparam, text
+        query = text("""
+        SELECT user_id, id FROM plugin
+        WHERE plugin_slug = :plugin_slug AND user_id IN :user_ids
+        """).bindparams(bindparam('user_ids', expanding=True))
+        
+        installed = {}
+        for chunk in _chunked(user_ids, BULK_QUERY_CHUNK_SIZE):
+            result = await db.execute(query, {'plugin_slug': self.plugin_data['plugin_slug'], 'user_ids': chunk})
+            for row in result.fetchall():
+                installed[row.user_id] = row.id
+        return installed
+    
+    async def _get_users_with_settings_instance(self, user_ids: List[str], db: AsyncSession) -> set:
+        """Return the subset of user_ids that already own a settings instance for this plugin"""
+        from sqlalchemy import bindparam, text
+        query = text("""
+        SELECT user_id FROM settings_instances
+        WHERE definition_id = :definition_id AND user_id IN :user_ids
+        """).bindparams(bindparam('user_ids', expanding=True))
+        
+        existing = set()
+        for chunk in _chunked(user_ids, BULK_QUERY_CHUNK_SIZE):
+            result = await db.execute(query, {'definition_id': self.settings_definition_id, 'user_ids': chunk})
+            existing.update(row.user_id for row in result.fetchall())
+        return existing
+    
+    async def ensure_recommended_indexes(self, db: AsyncSession) -> Dict[str, Any]:
+        """
+        Create any RECOMMENDED_INDEXES missing from the schema. Detection is part of the
+        cached schema capabilities, so once everything exists this costs no queries.
+        """
+        from sqlalchemy import Column, Index, MetaData, String, Table
+        capabilities = await get_schema_capabilities(db)
+        created, failed = [], []
+        for name, table, columns in list(capabilities.missing_indexes):
+            index = Index(name, *Table(table, MetaData(), *(Column(column, String) for column in columns)).c)
+            try:
+                async with _savepoint(db):
+                    connection = await db.connection()
+                    await connection.run_sync(index.create, checkfirst=True)
+                capabilities.missing_indexes.remove((name, table, columns))
+                await _track_uncommitted_schema(db)
+                created.append(name)
+                logger.info(f"ChatWithYourDocuments: Created index {name} on {table} ({', '.join(columns)})")
+            except Exception as index_error:
+                failed.append(name)
+                logger.warning(f"ChatWithYourDocuments: Failed to create index {name} on {table}: {index_error}")
+        return {'success': not failed, 'created': created, 'failed': failed}
+    
+    def _lifecycle_queries(self) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """(name, SQL, sample params) of the keyed lookups behind install, status, update and uninstall"""
+        plugin_slug = self.plugin_data['plugin_slug']
+        user_id = '__explain__'
+        plugin_id = f"{user_id}_{plugin_slug}"
+        return [
+            ('plugin_by_user', "SELECT id FROM plugin WHERE user_id = :user_id AND plugin_slug = :plugin_slug",
+             {'user_id': user_id, 'plugin_slug': plugin_slug}),
+            ('modules_by_plugin', "SELECT id FROM module WHERE plugin_id = :plugin_id AND user_id = :user_id",
+             {'plugin_id': plugin_id, 'user_id': user_id}),
+            ('services_by_plugin', "SELECT id FROM plugin_service_runtime WHERE plugin_id = :plugin_id AND user_id = :user_id",
+             {'plugin_id': plugin_id, 'user_id': user_id}),
+            ('settings_instance_by_user', "SELECT id FROM settings_instances WHERE definition_id = :definition_id AND user_id = :user_id",
+             {'definition_id': self.settings_definition_id, 'user_id': user_id}),
+        ]
+    
+    async def explain_lifecycle_queries(self, db: AsyncSession) -> Dict[str, Any]:
+        """
+        Run EXPLAIN QUERY PLAN (SQLite) or EXPLAIN (Postgres) on each lifecycle query
+        and flag the ones answered with a full table scan.
+        """
+        from sqlalchemy import text
+        capabilities = await get_schema_capabilities(db)
+        if capabilities.dialect == 'sqlite':
+            explain_prefix = "EXPLAIN QUERY PLAN "
+        elif capabilities.dialect == 'postgresql':
+            explain_prefix = "EXPLAIN "
+        else:
+            return {'success': False, 'error': f'EXPLAIN diagnostics not supported for {capabilities.dialect}'}
+        
+        queries, full_scans = {}, []
+        for name, sql, params in self._lifecycle_queries():
+            try:
+                result = await db.execute(text(explain_prefix + sql), params)
+                # SQLite: (id, parent, notused, detail); Postgres: one plan line per row
+                plan = [str(row[-1]) for row in result.fetchall()]
+            except Exception as explain_error:
+                queries[name] = {'sql': sql, 'error': str(explain_error)}
+                continue
+            
+            if capabilities.dialect == 'sqlite':
+                full_scan = any(line.startswith('SCAN ') and ' USING ' not in line for line in plan)
+            else:
+                full_scan = any('Seq Scan' in line for line in plan)
+            queries[name] = {'sql': sql, 'plan': plan, 'full_scan': full_scan}
+            if full_scan:
+                full_scans.append(name)
+                logger.warning(f"ChatWithYourDocuments: Lifecycle query {name} uses a full table scan: {plan}")
+        
+        return {'success': True, 'dialect': capabilities.dialect, 'queries': queries, 'full_scans': full_scans}
+    
     async def _check_and_create_service_runtime_table(self, db: AsyncSession) -> bool:
         """Check if plugin_service_runtime table exists and create it if not"""
         try:
-            # Try to check if the table exists
-            check_table_query = text("""
-            SELECT name FROM sqlite_master 
-            WHERE type='table' AND name='plugin_service_runtime'
-            """)
-            result = await db.execute(check_table_query)
-            table_exists = result.fetchone() is not None
-            
-            if not table_exists:
-                logger.info("plugin_service_runtime table does not exist, creating it...")
-                create_table_query = text("""
-                CREATE TABLE plugin_service_runtime (
-                    id VARCHAR PRIMARY KEY,
-                    plugin_id VARCHAR NOT NULL,
-                    plugin_slug VARCHAR NOT NULL,
-                    name VARCHAR NOT NULL,
-                    source_url VARCHAR,
-                    type VARCHAR,
-                    install_command TEXT,
-                    start_command TEXT,
-                    healthcheck_url VARCHAR,
-                    required_env_vars TEXT,
-                    status VARCHAR DEFAULT 'pending',
-                    created_at TIMESTAMP,
-                    updated_at TIMESTAMP,
-                    user_id VARCHAR NOT NULL,
-                    FOREIGN KEY (plugin_id) REFERENCES plugin (id) ON DELETE CASCADE
-                )
-                """)
-                await db.execute(create_table_query)
-                await db.commit()
-                logger.info("plugin_service_runtime table created successfully")
-                return True
-            else:
-                logger.info("plugin_service_runtime table already exists")
+            capabilities = await get_schema_capabilities(db)
+            if capabilities.has_service_runtime_table:
                 return True
+            
+            logger.info("plugin_service_runtime table does not exist, creating it...")
+            # Created inside the install transaction so it rolls back with it
+            service_runtime_table = _service_runtime_table()
+            async with _savepoint(db):
+                connection = await db.connection()
+                await connection.run_sync(service_runtime_table.create, checkfirst=True)
+            capabilities.service_runtime_columns = {column.name for column in service_runtime_table.columns}
+            await _track_uncommitted_schema(db)
+            logger.info("plugin_service_runtime table created successfully")
+            return True
                 
         except Exception as e:
             logger.warning(f"Failed to create plugin_service_runtime table: {e}")
             return False
 
+    @staticmethod
+    def _plugin_insert_statement(include_services_runtime: bool = True, on_conflict: bool = False) -> RecordInsert:
+        """INSERT for a plugin row, optionally without the newer required_services_runtime column"""
+        columns = [
+            'id', 'name', 'description', 'version', 'type', 'enabled', 'icon', 'category', 'status',
+            'official', 'author', 'last_updated', 'compatibility', 'downloads', 'scope',
+            'bundle_method', 'bundle_location', 'is_local', 'long_description',
+            'config_fields', 'messages', 'dependencies', 'created_at', 'updated_at', 'user_id',
+            'plugin_slug', 'source_type', 'source_url', 'update_check_url', 'last_update_check',
+            'update_available', 'latest_version', 'installation_type', 'permissions'
+        ]
+        if include_services_runtime:
+            columns.append('required_services_runtime')
+        return get_record_insert('plugin', columns, on_conflict)
+    
+    @staticmethod
+    def _module_insert_statement(on_conflict: bool = False) -> RecordInsert:
+        """INSERT for a module row"""
+        return get_record_insert('module', [
+            'id', 'plugin_id', 'name', 'display_name', 'description', 'icon', 'category',
+            'enabled', 'priority', 'props', 'config_fields', 'messages', 'required_services',
+            'dependencies', 'layout', 'tags', 'created_at', 'updated_at', 'user_id'
+        ], on_conflict)
+    
+    @staticmethod
+    def _service_insert_statement(available_columns: Optional[set] = None, on_conflict: bool = False) -> RecordInsert:
+        """INSERT for a plugin_service_runtime row, limited to the columns the table actually has"""
+        columns = [
+            'id', 'plugin_id', 'plugin_slug', 'name', 'source_url', 'type', 'install_command', 'start_command',
+            'healthcheck_url', 'definition_id', 'required_env_vars', 'status', 'created_at', 'updated_at', 'user_id'
+        ]
+        if available_columns is not None:
+            columns = [column for column in columns if column in available_columns]
+        return get_record_insert(SERVICE_RUNTIME_TABLE_NAME, columns, on_conflict)
+    
+    @staticmethod
+    async def _execute_insert(db: AsyncSession, statement: RecordInsert, rows: List[Dict[str, Any]],
+                              report_conflicts: bool = False) -> Dict[str, str]:
+        """Execute an INSERT for rows and return {row id: 'created' | 'already_present'} (see RecordInsert.execute)"""
+        return await statement.execute(db, rows, report_conflicts)
+    
+    @property
+    def metadata_snapshot(self) -> PluginMetadataSnapshot:
+        """Serialized definitions of this version, built once per (slug, version) and shared across managers"""
+        key = (self.plugin_data['plugin_slug'], self.plugin_data['version'])
+        snapshot = _metadata_snapshots.get(key)
+        if snapshot is None:
+            snapshot = PluginMetadataSnapshot(self.plugin_data, self.module_data, self.required_services_runtime)
+            with _metadata_snapshots_lock:
+                snapshot = _metadata_snapshots.setdefault(key, snapshot)
+        return snapshot
+    
+    def _build_plugin_row(self, user_id: str, current_time: str, thin: bool = False) -> Dict[str, Any]:
+        """Build the bind parameters of the plugin row for a user; thin rows leave catalog columns NULL"""
+        snapshot = self.metadata_snapshot
+        row = dict(snapshot.thin_plugin_template if thin else snapshot.plugin_template)
+        row['id'] = f"{user_id}_{snapshot.plugin_slug}"
+        row['user_id'] = user_id
+        row['last_updated'] = row['created_at'] = row['updated_at'] = current_time
+        return row
+    
+    def _build_module_rows(self, user_id: str, plugin_id: str, current_time: str,
+                           thin: bool = False) -> List[Dict[str, Any]]:
+        """Build the bind parameters of every module row for a user; thin rows leave catalog columns NULL"""
+        snapshot = self.metadata_snapshot
+        rows = []
+        for template in (snapshot.thin_module_templates if thin else snapshot.module_templates):
+            row = dict(template)
+            row['id'] = f"{user_id}_{snapshot.plugin_slug}_{template['name']}"
+            row['plugin_id'] = plugin_id
+            row['user_id'] = user_id
+            row['created_at'] = row['updated_at'] = current_time
+            rows.append(row)
+        return rows
+    
+    def _build_service_rows(self, user_id: str, plugin_id: str, current_time: str) -> List[Dict[str, Any]]:
+        """Build the bind parameters of every service runtime row for a user"""
+        snapshot = self.metadata_snapshot
+        rows = []
+        for template in snapshot.service_templates:
+            row = dict(template)
+            row['id'] = f"{user_id}_{snapshot.plugin_slug}_{template['name']}"
+            row['plugin_id'] = plugin_id
+            row['user_id'] = user_id
+            row['created_at'] = row['updated_at'] = current_time
+            rows.append(row)
+        return rows
+    
+    @staticmethod
+    def _catalog_insert_statement(table: Table, on_conflict: bool = False) -> RecordInsert:
+        """INSERT for a plugin_catalog/module_catalog row"""
+        return get_record_insert(table.name, [column.name for column in table.columns], on_conflict)
+    
+    def _build_catalog_rows(self, current_time: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """Build the plugin_catalog row and module_catalog rows of this version"""
+        key = {'plugin_slug': self.plugin_data['plugin_slug'], 'version': self.plugin_data['version'],
+               'created_at': current_time}
+        plugin_row = self._build_plugin_row('', current_time)
+        plugin_catalog_row = dict(key, **{column: plugin_row[column] for column in CATALOG_PLUGIN_COLUMNS})
+        module_catalog_rows = [
+            dict(key, name=module_row['name'], **{column: module_row[column] for column in CATALOG_MODULE_COLUMNS})
+            for module_row in self._build_module_rows('', '', current_time)
+        ]
+        return plugin_catalog_row, module_catalog_rows
+    
+    async def _ensure_catalog(self, db: AsyncSession, keep_existing: bool = False) -> bool:
+        """
+        In catalog mode, make sure this version's catalog entries exist (creating the catalog
+        tables and views on first use). Returns True when per-user rows may be written thin;
+        any failure returns False so the caller falls back to full rows.
+        keep_existing also populates an existing catalog outside catalog mode, for updates
+        of rows that may have been written thin earlier.
+        """
+        capabilities = await get_schema_capabilities(db)
+        if not (self.catalog_mode or (keep_existing and capabilities.has_catalog)):
+            return False
+        
+        from sqlalchemy import text
+        plugin_catalog_table, module_catalog_table = _catalog_tables()
+        params = {'plugin_slug': self.plugin_data['plugin_slug'], 'version': self.plugin_data['version']}
+        try:
+            # Inside the caller's transaction so catalog rows commit with the first thin rows
+            async with _savepoint(db):
+                if not capabilities.has_catalog:
+                    connection = await db.connection()
+                    await connection.run_sync(_create_catalog_schema)
+                    capabilities.has_catalog = True
+                    await _track_uncommitted_schema(db)
+                    logger.info("ChatWithYourDocuments: Created plugin/module catalog tables and views")
+                
+                result = await db.execute(text(f"""
+                SELECT 1 FROM {plugin_catalog_table.name}
+                WHERE plugin_slug = :plugin_slug AND version = :version
+                LIMIT 1
+                """), params)
+                if result.first() is None:
+                    on_conflict = capabilities.supports_on_conflict
+                    current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    plugin_catalog_row, module_catalog_rows = self._build_catalog_rows(current_time)
+                    await self._execute_insert(
+                        db, self._catalog_insert_statement(plugin_catalog_table, on_conflict), [plugin_catalog_row]
+                    )
+                    await self._execute_insert(
+                        db, self._catalog_insert_statement(module_catalog_table, on_conflict), module_catalog_rows
+                    )
+                    logger.info(f"ChatWithYourDocuments: Added catalog entry {params['plugin_slug']} {params['version']}")
+            return True
+        except Exception as catalog_error:
+            # Re-detect on the next attempt in case the tables went away with a rolled back transaction
+            capabilities.has_catalog = False
+            logger.warning(f"ChatWithYourDocuments: Catalog unavailable, writing full rows: {catalog_error}")
+            return False
+    
+    async def _insert_plugin_rows(self, db: AsyncSession, plugin_rows: List[Dict[str, Any]],
+                                  report_conflicts: bool = False) -> Dict[str, str]:
+        """Insert plugin rows, omitting required_services_runtime on legacy schemas without that column"""
+        capabilities = await get_schema_capabilities(db)
+        on_conflict = capabilities.supports_on_conflict
+        if capabilities.has_services_runtime_column:
+            statement = self._plugin_insert_statement(True, on_conflict)
+        else:
+            statement = self._plugin_insert_statement(False, on_conflict)
+            plugin_rows = [
+                {key: value for key, value in row.items() if key != 'required_services_runtime'}
+                for row in plugin_rows
+            ]
+        return await self._execute_insert(db, statement, plugin_rows, report_conflicts and on_conflict)
+    
+    async def _insert_service_rows(self, db: AsyncSession, service_rows: List[Dict[str, Any]],
+                                   report_conflicts: bool = False) -> Dict[str, str]:
+        """
+        Insert service runtime rows inside a savepoint; a failure skips them without failing the install.
+        Returns the per-row status, empty when the rows could not be inserted.
+        """
+        capabilities = await get_schema_capabilities(db)
+        on_conflict = capabilities.supports_on_conflict
+        statement = self._service_insert_statement(capabilities.service_runtime_columns, on_conflict)
+        try:
+            async with _savepoint(db):
+                status = await self._execute_insert(db, statement, service_rows, report_conflicts and on_conflict)
+            logger.info(f"Created {list(status.values()).count('created')} service runtime records")
+            return status
+        except Exception as service_error:
+            logger.warning(f"Failed to create service runtime records: {service_error}")
+            return {}
+    
     async def _create_database_records(self, user_id: str, db: AsyncSession) -> Dict[str, Any]:
         """Create plugin and module records in database"""
         try:
@@ -674,225 +2864,46 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
             
             logger.info(f"ChatWithYourDocuments: Creating database records - user_id: {user_id}, plugin_slug: {plugin_slug}, plugin_id: {plugin_id}")
             
-            try:
-                # Test if the column exists by trying to insert with it
-                plugin_stmt = text("""
-                INSERT INTO plugin
-                (id, name, description, version, type, enabled, icon, category, status,
-                official, author, last_updated, compatibility, downloads, scope,
-                bundle_method, bundle_location, is_local, long_description,
-                config_fields, messages, dependencies, created_at, updated_at, user_id,
-                plugin_slug, source_type, source_url, update_check_url, last_update_check,
-                update_available, latest_version, installation_type, permissions, required_services_runtime)
-                VALUES
-                (:id, :name, :description, :version, :type, :enabled, :icon, :category,
-                :status, :official, :author, :last_updated, :compatibility, :downloads,
-                :scope, :bundle_method, :bundle_location, :is_local, :long_description,
-                :config_fields, :messages, :dependencies, :created_at, :updated_at, :user_id,
-                :plugin_slug, :source_type, :source_url, :update_check_url, :last_update_check,
-                :update_available, :latest_version, :installation_type, :permissions, :required_services_runtime)
-                """)
-                
-                await db.execute(plugin_stmt, {
-                    'id': plugin_id,
-                    'name': self.plugin_data['name'],
-                    'description': self.plugin_data['description'],
-                    'version': self.plugin_data['version'],
-                    'type': self.plugin_data['type'],
-                    'enabled': True,
-                    'icon': self.plugin_data['icon'],
-                    'category': self.plugin_data['category'],
-                    'status': 'activated',
-                    'official': self.plugin_data['official'],
-                    'author': self.plugin_data['author'],
-                    'last_updated': current_time,
-                    'compatibility': self.plugin_data['compatibility'],
-                    'downloads': 0,
-                    'scope': self.plugin_data['scope'],
-                    'bundle_method': self.plugin_data['bundle_method'],
-                    'bundle_location': self.plugin_data['bundle_location'],
-                    'is_local': self.plugin_data['is_local'],
-                    'long_description': self.plugin_data['long_description'],
-                    'config_fields': json.dumps({}),
-                    'messages': None,
-                    'dependencies': None,
-                    'created_at': current_time,
-                    'updated_at': current_time,
-                    'user_id': user_id,
-                    'plugin_slug': plugin_slug,
-                    'source_type': self.plugin_data['source_type'],
-                    'source_url': self.plugin_data['source_url'],
-                    'update_check_url': self.plugin_data['update_check_url'],
-                    'last_update_check': self.plugin_data['last_update_check'],
-                    'update_available': self.plugin_data['update_available'],
-                    'latest_version': self.plugin_data['latest_version'],
-                    'installation_type': self.plugin_data['installation_type'],
-                    'permissions': json.dumps(self.plugin_data['permissions']),
-                    'required_services_runtime': json.dumps(self.required_services_runtime)
-                })
-                
-            except Exception as column_error:
-                logger.warning(f"required_services_runtime column not found in plugin table: {column_error}")
-                
-                # Fallback: Insert without required_services_runtime column
-                plugin_stmt = text("""
-                INSERT INTO plugin
-                (id, name, description, version, type, enabled, icon, category, status,
-                official, author, last_updated, compatibility, downloads, scope,
-                bundle_method, bundle_location, is_local, long_description,
-                config_fields, messages, dependencies, created_at, updated_at, user_id,
-                plugin_slug, source_type, source_url, update_check_url, last_update_check,
-                update_available, latest_version, installation_type, permissions)
-                VALUES
-                (:id, :name, :description, :version, :type, :enabled, :icon, :category,
-                :status, :official, :author, :last_updated, :compatibility, :downloads,
-                :scope, :bundle_method, :bundle_location, :is_local, :long_description,
-                :config_fields, :messages, :dependencies, :created_at, :updated_at, :user_id,
-                :plugin_slug, :source_type, :source_url, :update_check_url, :last_update_check,
-                :update_available, :latest_version, :installation_type, :permissions)
-                """)
-                
-                await db.execute(plugin_stmt, {
-                    'id': plugin_id,
-                    'name': self.plugin_data['name'],
-                    'description': self.plugin_data['description'],
-                    'version': self.plugin_data['version'],
-                    'type': self.plugin_data['type'],
-                    'enabled': True,
-                    'icon': self.plugin_data['icon'],
-                    'category': self.plugin_data['category'],
-                    'status': 'activated',
-                    'official': self.plugin_data['official'],
-                    'author': self.plugin_data['author'],
-                    'last_updated': current_time,
-                    'compatibility': self.plugin_data['compatibility'],
-                    'downloads': 0,
-                    'scope': self.plugin_data['scope'],
-                    'bundle_method': self.plugin_data['bundle_method'],
-                    'bundle_location': self.plugin_data['bundle_location'],
-                    'is_local': self.plugin_data['is_local'],
-                    'long_description': self.plugin_data['long_description'],
-                    'config_fields': json.dumps({}),
-                    'messages': None,
-                    'dependencies': None,
-                    'created_at': current_time,
-                    'updated_at': current_time,
-                    'user_id': user_id,
-                    'plugin_slug': plugin_slug,
-                    'source_type': self.plugin_data['source_type'],
-                    'source_url': self.plugin_data['source_url'],
-                    'update_check_url': self.plugin_data['update_check_url'],
-                    'last_update_check': self.plugin_data['last_update_check'],
-                    'update_available': self.plugin_data['update_available'],
-                    'latest_version': self.plugin_data['latest_version'],
-                    'installation_type': self.plugin_data['installation_type'],
-                    'permissions': json.dumps(self.plugin_data['permissions'])
-                })
-            
-            modules_created = []
-            for module_data in self.module_data:
-                module_id = f"{user_id}_{plugin_slug}_{module_data['name']}"
-                
-                module_stmt = text("""
-                INSERT INTO module
-                (id, plugin_id, name, display_name, description, icon, category,
-                enabled, priority, props, config_fields, messages, required_services,
-                dependencies, layout, tags, created_at, updated_at, user_id)
-                VALUES
-                (:id, :plugin_id, :name, :display_name, :description, :icon, :category,
-                :enabled, :priority, :props, :config_fields, :messages, :required_services,
-                :dependencies, :layout, :tags, :created_at, :updated_at, :user_id)
-                """)
-                
-                await db.execute(module_stmt, {
-                    'id': module_id,
-                    'plugin_id': plugin_id,
-                    'name': module_data['name'],
-                    'display_name': module_data['display_name'],
-                    'description': module_data['description'],
-                    'icon': module_data['icon'],
-                    'category': module_data['category'],
-                    'enabled': True,
-                    'priority': module_data['priority'],
-                    'props': json.dumps(module_data['props']),
-                    'config_fields': json.dumps(module_data['config_fields']),
-                    'messages': json.dumps(module_data['messages']),
-                    'required_services': json.dumps(module_data['required_services']),
-                    'dependencies': json.dumps(module_data['dependencies']),
-                    'layout': json.dumps(module_data['layout']),
-                    'tags': json.dumps(module_data['tags']),
-                    'created_at': current_time,
-                    'updated_at': current_time,
-                    'user_id': user_id
-                })
-                
-                modules_created.append(module_id)
+            # Rows that already exist (a retried install) are left untouched and reported as already_present
+            capabilities = await get_schema_capabilities(db)
+            on_conflict = capabilities.supports_on_conflict
+            thin = await self._ensure_catalog(db)
             
-            # Try to create service runtime records if table exists or can be created
-            services_created = []
-            service_table_available = await self._check_and_create_service_runtime_table(db)
+            plugin_status = await self._insert_plugin_rows(
+                db, [self._build_plugin_row(user_id, current_time, thin)], report_conflicts=True
+            )
             
-            if service_table_available and self.required_services_runtime:
-                try:
-                    for service_data in self.required_services_runtime:
-                        service_id = f"{user_id}_{plugin_slug}_{service_data['name']}"
-                        
-                        service_stmt = text("""
-                        INSERT INTO plugin_service_runtime
-                        (id, plugin_id, plugin_slug, name, source_url, type, install_command, start_command,
-                        healthcheck_url, definition_id, required_env_vars, status, created_at, updated_at, user_id)
-                        VALUES
-                        (:id, :plugin_id, :plugin_slug, :name, :source_url, :type, :install_command, :start_command,
-                        :healthcheck_url, :definition_id, :required_env_vars, :status, :created_at, :updated_at, :user_id)
-                        """)
-                        
-                        await db.execute(service_stmt, {
-                            'id': service_id,
-                            'plugin_id': plugin_id,
-                            'plugin_slug': plugin_slug,
-                            'name': service_data['name'],
-                            'source_url': service_data['source_url'],
-                            'type': service_data['type'],
-                            'install_command': service_data['install_command'],
-                            'start_command': service_data['start_command'],
-                            'healthcheck_url': service_data['healthcheck_url'],
-                            'definition_id': service_data['definition_id'],
-                            'required_env_vars': json.dumps(service_data['required_env_vars']),
-                            'status': 'pending',  # Default status for new services
-                            'created_at': current_time,
-                            'updated_at': current_time,
-                            'user_id': user_id
-                        })
-                        
-                        services_created.append(service_id)
-                    
-                    logger.info(f"Created {len(services_created)} service runtime records")
-                
-                except Exception as service_error:
-                    logger.warning(f"Failed to create service runtime records: {service_error}")
-                    # Don't fail the entire operation if service table creation fails
-                    services_created = []
+            module_rows = self._build_module_rows(user_id, plugin_id, current_time, thin)
+            module_status = await self._execute_insert(
+                db, self._module_insert_statement(on_conflict), module_rows, report_conflicts=on_conflict
+            )
             
-            # Commit the transaction
-            await db.commit()
-            logger.info(f"ChatWithYourDocuments: Database transaction committed successfully")
+            # Try to create service runtime records if table exists or can be created
+            service_status = {}
+            service_table_available = await self._check_and_create_service_runtime_table(db)
+            
+            if service_table_available and self.required_services_runtime:
+                service_rows = self._build_service_rows(user_id, plugin_id, current_time)
+                # Don't fail the entire operation if service rows can't be created
+                service_status = await self._insert_service_rows(db, service_rows, report_conflicts=True)
             
-            # Verify the plugin was actually created
-            verify_query = text("SELECT id, plugin_slug FROM plugin WHERE id = :plugin_id AND user_id = :user_id")
-            verify_result = await db.execute(verify_query, {'plugin_id': plugin_id, 'user_id': user_id})
-            verify_row = verify_result.fetchone()
+            modules_created = [row_id for row_id, state in module_status.items() if state == 'created']
+            services_created = [row_id for row_id, state in service_status.items() if state == 'created']
             
-            if verify_row:
-                logger.info(f"ChatWithYourDocuments: Successfully created and verified database records for plugin {plugin_id} with {len(modules_created)} modules and {len(services_created)} services")
-            else:
-                logger.error(f"ChatWithYourDocuments: Plugin creation appeared to succeed but verification failed for plugin_id: {plugin_id}")
-                return {'success': False, 'error': 'Plugin creation verification failed'}
+            # Committed by the caller together with the settings rows
+            logger.info(f"ChatWithYourDocuments: Created database records for plugin {plugin_id} with {len(modules_created)} modules and {len(services_created)} services")
             
             return {
                 'success': True, 
                 'plugin_id': plugin_id, 
+                'plugin_created': plugin_status.get(plugin_id) == 'created',
                 'modules_created': modules_created,
-                'services_created': services_created
+                'services_created': services_created,
+                'rows': {
+                    'plugin': plugin_status,
+                    'module': module_status,
+                    'plugin_service_runtime': service_status
+                }
             }
             
         except Exception as e:
@@ -902,11 +2913,13 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
     
     async def _delete_database_records(self, user_id: str, plugin_id: str, db: AsyncSession) -> Dict[str, Any]:
         """Delete plugin and module records from database"""
+        from sqlalchemy import text
         try:
             deleted_services = 0
             
-            # Try to delete service runtime records first if table exists
-            try:
+            # Delete service runtime records first if the table exists
+            capabilities = await get_schema_capabilities(db)
+            if capabilities.has_service_runtime_table:
                 service_delete_stmt = text("""
                 DELETE FROM plugin_service_runtime 
                 WHERE plugin_id = :plugin_id AND user_id = :user_id
@@ -919,11 +2932,6 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
                 
                 deleted_services = service_result.rowcount
                 logger.info(f"Deleted {deleted_services} service runtime records")
-                
-            except Exception as service_error:
-                logger.warning(f"Failed to delete service runtime records (table may not exist): {service_error}")
-                # Continue with plugin deletion even if service deletion fails
-                deleted_services = 0
             
             # Delete modules (foreign key constraint)
             module_delete_stmt = text("""
@@ -953,9 +2961,7 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
                 await db.rollback()
                 return {'success': False, 'error': 'Plugin not found or not owned by user'}
             
-            # Commit the transaction
-            await db.commit()
-            
+            # Committed by the caller together with the settings removal
             logger.info(f"Deleted database records for plugin {plugin_id} ({deleted_modules} modules, {deleted_services} services)")
             return {
                 'success': True, 
@@ -968,88 +2974,208 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
             await db.rollback()
             return {'success': False, 'error': str(e)}
 
+    async def _delete_records_for_users(self, user_ids: List[str], db: AsyncSession) -> Dict[str, int]:
+        """
+        Delete service runtime, module, plugin and settings instance rows for a chunk of
+        users with one set-based DELETE per table. Does not commit; returns per-table rowcounts.
+        """
+        from sqlalchemy import bindparam, text
+        params = {
+            'plugin_slug': self.plugin_data['plugin_slug'],
+            'definition_id': self.settings_definition_id,
+            'user_ids': user_ids
+        }
+        deleted = {'plugin_service_runtime': 0, 'module': 0, 'plugin': 0, 'settings_instances': 0}
+        
+        # Service runtime rows first, matching the single-user delete order
+        capabilities = await get_schema_capabilities(db)
+        if capabilities.has_service_runtime_table:
+            service_delete_stmt = text("""
+            DELETE FROM plugin_service_runtime
+            WHERE plugin_slug = :plugin_slug AND user_id IN :user_ids
+            """).bindparams(bindparam('user_ids', expanding=True))
+            service_result = await db.execute(service_delete_stmt, params)
+            deleted['plugin_service_runtime'] = service_result.rowcount
+        
+        # Delete modules (foreign key constraint)
+        module_delete_stmt = text("""
+        DELETE FROM module
+        WHERE user_id IN :user_ids AND plugin_id IN (
+            SELECT id FROM plugin WHERE plugin_slug = :plugin_slug AND user_id IN :user_ids
+        )
+        """).bindparams(bindparam('user_ids', expanding=True))
+        deleted['module'] = (await db.execute(module_delete_stmt, params)).rowcount
+        
+        plugin_delete_stmt = text("""
+        DELETE FROM plugin
+        WHERE plugin_slug = :plugin_slug AND user_id IN :user_ids
+        """).bindparams(bindparam('user_ids', expanding=True))
+        deleted['plugin'] = (await db.execute(plugin_delete_stmt, params)).rowcount
+        
+        settings_delete_stmt = text("""
+        DELETE FROM settings_instances
+        WHERE definition_id = :definition_id AND user_id IN :user_ids
+        """).bindparams(bindparam('user_ids', expanding=True))
+        deleted['settings_instances'] = (await db.execute(settings_delete_stmt, params)).rowcount
+        
+        return deleted
+    
+    def _get_default_settings_value(self) -> Dict[str, Any]:
+        """
+        Default settings value based on Docker Compose environment variables.
+        String environment variables are converted to their appropriate types.
+        """
+        return {
+            "LLM_PROVIDER": 'ollama',
+            "EMBEDDING_PROVIDER": 'ollama',
+            "ENABLE_CONTEXTUAL_RETRIEVAL": True,
+            "OLLAMA_CONTEXTUAL_LLM_BASE_URL": 'http://localhost:11434',
+            "OLLAMA_CONTEXTUAL_LLM_MODEL": 'llama3.2:3b',
+            "OLLAMA_LLM_BASE_URL": 'http://localhost:11434',
+            "OLLAMA_LLM_MODEL": 'qwen3:8b',
+            "OLLAMA_EMBEDDING_BASE_URL": 'http://localhost:11434',
+            "OLLAMA_EMBEDDING_MODEL": 'mxbai-embed-large',
+            "DOCUMENT_PROCESSOR_API_URL": 'http://localhost:8080/documents/',
+            "DOCUMENT_PROCESSOR_API_KEY": 'default_api_key',
+            "DOCUMENT_PROCESSOR_TIMEOUT": 600,
+            "DOCUMENT_PROCESSOR_MAX_RETRIES": 3,
+            # Document Processing Service
+            "DISABLE_AUTH": True,
+            "AUTH_METHOD": 'api_key',
+            "AUTH_API_KEY": '',
+            "JWT_SECRET": '',
+            "JWT_ALGORITHM": 'HS256',
+            "JWT_EXPIRE_MINUTES": 60,
+            "SPACY_MODEL": 'en_core_web_sm',
+            "DEFAULT_CHUNKING_STRATEGY": 'hierarchical',
+            "DEFAULT_CHUNK_SIZE": 1000,
+            "DEFAULT_CHUNK_OVERLAP": 200,
+            "MIN_CHUNK_SIZE": 100,
+            "MAX_CHUNK_SIZE": 2000,
+            "LOG_FORMAT": 'console',
+            "LOG_FILE": '/app/logs/app.log'
+        }
+
+    def _build_settings_definition_row(self, current_time: str) -> Dict[str, Any]:
+        """Build the bind parameters of the shared settings definition row"""
+        return {
+            'id': self.settings_definition_id,
+            'name': 'Chat with Document Processor Settings',
+            'description': 'Configure the Chat with Document Processor services.',
+            'category': 'LLM and Embeddings',
+            'type': 'object',
+            'default_value': json.dumps(self._get_default_settings_value()),
+            'allowed_scopes': json.dumps(['user']),
+            'validation': json.dumps({}),
+            'is_multiple': False,
+            'tags': json.dumps(['ollama', 'document-processor', 'settings']),
+            'created_at': current_time,
+            'updated_at': current_time
+        }
+    
+    def _build_settings_instance_row(self, user_id: str, current_time: str) -> Dict[str, Any]:
+        """Build the bind parameters of a user's settings instance row"""
+        return {
+            'id': f"chat_with_doc_proc_settings_{user_id}",
+            'name': 'LLM and Document Processor Settings',
+            'definition_id': self.settings_definition_id,
+            'scope': 'user',
+            'user_id': user_id,
+            'value': json.dumps(self._get_default_settings_value()), # Use the same default values for the initial instance
+            'created_at': current_time,
+            'updated_at': current_time
+        }
+    
+    @staticmethod
+    def _settings_definition_insert_statement(on_conflict: bool = False) -> RecordInsert:
+        """INSERT for the settings definition row"""
+        return get_record_insert('settings_definitions', [
+            'id', 'name', 'description', 'category', 'type', 'default_value', 'allowed_scopes',
+            'validation', 'is_multiple', 'tags', 'created_at', 'updated_at'
+        ], on_conflict)
+    
+    @staticmethod
+    def _settings_instance_insert_statement(on_conflict: bool = False) -> RecordInsert:
+        """INSERT for a settings instance row"""
+        return get_record_insert('settings_instances', [
+            'id', 'name', 'definition_id', 'scope', 'user_id', 'value', 'created_at', 'updated_at'
+        ], on_conflict)
+    
+    async def _ensure_settings_definition(self, db: AsyncSession) -> Optional[str]:
+        """
+        Create the shared settings definition if it doesn't exist yet.
+        Returns 'created', 'already_present', or None when the insert failed.
+        """
+        from sqlalchemy import text
+        capabilities = await get_schema_capabilities(db)
+        if capabilities.supports_on_conflict:
+            current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            try:
+                async with _savepoint(db):
+                    status = await self._execute_insert(
+                        db, self._settings_definition_insert_statement(True),
+                        [self._build_settings_definition_row(current_time)], report_conflicts=True
+                    )
+                return status[self.settings_definition_id]
+            except Exception as def_error:
+                logger.error(f"Failed to create settings definition: {def_error}")
+                return None
+        
+        definition = await db.execute(
+            text("SELECT id FROM settings_definitions WHERE id = :definition_id"),
+            {"definition_id": self.settings_definition_id}
+        )
+        if definition.scalar_one_or_none():
+            logger.info("Settings definition already exists")
+            return 'already_present'
+        
+        logger.info("Settings definition not found, creating new one")
+        current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            async with _savepoint(db):
+                await self._execute_insert(
+                    db, self._settings_definition_insert_statement(), [self._build_settings_definition_row(current_time)]
+                )
+            logger.info("Successfully created settings definition")
+            return 'created'
+        except Exception as def_error:
+            logger.error(f"Failed to create settings definition: {def_error}")
+            return None
+    
     async def _create_settings(self, user_id: str, db: AsyncSession) -> Dict[str, Any]:
         """
         Create settings definition and instance based on Docker Compose environment variables.
         """
+        from sqlalchemy import text
         try:
             logger.info(f"Starting settings creation for user {user_id}")
             
             # Use a unique ID for the new settings definition
             definition_id = self.settings_definition_id
 
-            # Check if settings definition exists
-            definition = await db.execute(
-                text("SELECT id FROM settings_definitions WHERE id = :definition_id"),
-                {"definition_id": definition_id}
-            )
-            definition = definition.scalar_one_or_none()
-            
-            # Construct the default value dictionary from the assumed class attributes.
-            # Convert string environment variables to their appropriate types.
-            default_settings_value = {
-                "LLM_PROVIDER": 'ollama',
-                "EMBEDDING_PROVIDER": 'ollama',
-                "ENABLE_CONTEXTUAL_RETRIEVAL": True,
-                "OLLAMA_CONTEXTUAL_LLM_BASE_URL": 'http://localhost:11434',
-                "OLLAMA_CONTEXTUAL_LLM_MODEL": 'llama3.2:3b',
-                "OLLAMA_LLM_BASE_URL": 'http://localhost:11434',
-                "OLLAMA_LLM_MODEL": 'qwen3:8b',
-                "OLLAMA_EMBEDDING_BASE_URL": 'http://localhost:11434',
-                "OLLAMA_EMBEDDING_MODEL": 'mxbai-embed-large',
-                "DOCUMENT_PROCESSOR_API_URL": 'http://localhost:8080/documents/',
-                "DOCUMENT_PROCESSOR_API_KEY": 'default_api_key',
-                "DOCUMENT_PROCESSOR_TIMEOUT": 600,
-                "DOCUMENT_PROCESSOR_MAX_RETRIES": 3,
-                # Document Processing Service
-                "DISABLE_AUTH": True,
-                "AUTH_METHOD": 'api_key',
-                "AUTH_API_KEY": '',
-                "JWT_SECRET": '',
-                "JWT_ALGORITHM": 'HS256',
-                "JWT_EXPIRE_MINUTES": 60,
-                "SPACY_MODEL": 'en_core_web_sm',
-                "DEFAULT_CHUNKING_STRATEGY": 'hierarchical',
-                "DEFAULT_CHUNK_SIZE": 1000,
-                "DEFAULT_CHUNK_OVERLAP": 200,
-                "MIN_CHUNK_SIZE": 100,
-                "MAX_CHUNK_SIZE": 2000,
-                "LOG_FORMAT": 'console',
-                "LOG_FILE": '/app/logs/app.log'
-            }
-
             # Create settings definition if it doesn't exist
-            if not definition:
-                logger.info("Settings definition not found, creating new one")
-                definition_data = {
-                    'id': definition_id,
-                    'name': 'Chat with Document Processor Settings',
-                    'description': 'Configure the Chat with Document Processor services.',
-                    'category': 'LLM and Embeddings',
-                    'type': 'object',
-                    'default_value': json.dumps(default_settings_value),
-                    'allowed_scopes': json.dumps(['user']),
-                    'validation': json.dumps({}),
-                    'is_multiple': False,
-                    'tags': json.dumps(['ollama', 'document-processor', 'settings']),
-                    'created_at': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    'updated_at': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                }
-                
-                definition_stmt = text("""
-                INSERT INTO settings_definitions
-                (id, name, description, category, type, default_value, allowed_scopes, validation, is_multiple, tags, created_at, updated_at)
-                VALUES
-                (:id, :name, :description, :category, :type, :default_value, :allowed_scopes, :validation, :is_multiple, :tags, :created_at, :updated_at)
-                """)
-                
+            definition_status = await self._ensure_settings_definition(db)
+            instance_id = f"chat_with_doc_proc_settings_{user_id}"
+
+            capabilities = await get_schema_capabilities(db)
+            if capabilities.supports_on_conflict:
+                current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 try:
-                    await db.execute(definition_stmt, definition_data)
-                    logger.info("Successfully created settings definition")
-                except Exception as def_error:
-                    logger.error(f"Failed to create settings definition: {def_error}")
-            else:
-                logger.info("Settings definition already exists")
+                    instance_status = await self._execute_insert(
+                        db, self._settings_instance_insert_statement(True),
+                        [self._build_settings_instance_row(user_id, current_time)], report_conflicts=True
+                    )
+                except Exception as inst_error:
+                    logger.error(f"Failed to create settings instance: {inst_error}")
+                    return {'success': False, 'error': f'Failed to create settings instance: {str(inst_error)}'}
+                return {
+                    'success': True,
+                    'settings_created': [definition_id, instance_id],
+                    'rows': {
+                        'settings_definitions': {definition_id: definition_status} if definition_status else {},
+                        'settings_instances': instance_status
+                    }
+                }
 
             # Create settings instance for user
             existing_instance = await db.execute(
@@ -1059,26 +3185,11 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
             existing_instance = existing_instance.scalar_one_or_none()
             
             if not existing_instance:
-                instance_data = {
-                    'id': f"chat_with_doc_proc_settings_{user_id}",
-                    'name': 'LLM and Document Processor Settings',
-                    'definition_id': definition_id,
-                    'scope': 'user',
-                    'user_id': user_id,
-                    'value': json.dumps(default_settings_value), # Use the same default values for the initial instance
-                    'created_at': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    'updated_at': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                }
-                
-                instance_stmt = text("""
-                INSERT INTO settings_instances
-                (id, name, definition_id, scope, user_id, value, created_at, updated_at)
-                VALUES
-                (:id, :name, :definition_id, :scope, :user_id, :value, :created_at, :updated_at)
-                """)
-                
+                current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 try:
-                    await db.execute(instance_stmt, instance_data)
+                    await self._execute_insert(
+                        db, self._settings_instance_insert_statement(), [self._build_settings_instance_row(user_id, current_time)]
+                    )
                     logger.info(f"Successfully created settings instance for user {user_id}")
                 except Exception as inst_error:
                     logger.error(f"Failed to create settings instance: {inst_error}")
@@ -1089,7 +3200,11 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
             logger.info(f"Settings creation completed successfully for user {user_id}")
             return {
                 'success': True,
-                'settings_created': [definition_id, f"chat_with_doc_proc_settings_{user_id}"]
+                'settings_created': [definition_id, instance_id],
+                'rows': {
+                    'settings_definitions': {definition_id: definition_status} if definition_status else {},
+                    'settings_instances': {instance_id: 'already_present' if existing_instance else 'created'}
+                }
             }
 
         except Exception as e:
@@ -1100,6 +3215,7 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
 
     async def _remove_settings(self, user_id: str, db: AsyncSession) -> Dict[str, Any]:
         """Remove settings instance for user"""
+        from sqlalchemy import text
         try:
             # Use the same unique ID for the settings definition
             definition_id = 'chat_with_document_processor_settings'
@@ -1132,6 +3248,7 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
 
     async def _export_user_data(self, user_id: str, db: AsyncSession) -> Dict[str, Any]:
         """Export user-specific data for migration during updates"""
+        from sqlalchemy import text
         try:
             # Get plugin configuration
             plugin_query = text("""
@@ -1153,11 +3270,11 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
             module_query = text("""
             SELECT name, config_fields, enabled, priority
             FROM module 
-            WHERE plugin_id LIKE :plugin_pattern AND user_id = :user_id
+            WHERE plugin_id = :plugin_id AND user_id = :user_id
             """)
             
             module_result = await db.execute(module_query, {
-                'plugin_pattern': f"{user_id}_{self.plugin_data['plugin_slug']}_%",
+                'plugin_id': f"{user_id}_{self.plugin_data['plugin_slug']}",
                 'user_id': user_id
             })
             
@@ -1193,6 +3310,7 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
     
     async def _import_user_data(self, user_id: str, db: AsyncSession, user_data: Dict[str, Any]):
         """Import user-specific data after migration during updates"""
+        from sqlalchemy import text
         try:
             if not user_data:
                 logger.info(f"ChatWithYourDocuments: No user data to import for {user_id}")
@@ -1222,7 +3340,7 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
                 module_update_stmt = text("""
                 UPDATE module 
                 SET config_fields = :config_fields, enabled = :enabled, priority = :priority
-                WHERE name = :module_name AND plugin_id LIKE :plugin_pattern AND user_id = :user_id
+                WHERE name = :module_name AND plugin_id = :plugin_id AND user_id = :user_id
                 """)
                 
                 await db.execute(module_update_stmt, {
@@ -1230,7 +3348,7 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
                     'enabled': module_config.get('enabled', True),
                     'priority': module_config.get('priority', 1),
                     'module_name': module_name,
-                    'plugin_pattern': f"{user_id}_{self.plugin_data['plugin_slug']}_%",
+                    'plugin_id': f"{user_id}_{self.plugin_data['plugin_slug']}",
                     'user_id': user_id
                 })
             
@@ -1255,40 +3373,51 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
         try:
             logger.info(f"ChatWithYourDocuments: Starting installation for user {user_id}")
             
-            # Check if plugin is already installed for this user
+            # With ON CONFLICT the inserts themselves are idempotent and a retried install
+            # succeeds without touching existing rows; other dialects keep check-then-insert
+            await self.hydrate_active_users(db)
+            capabilities = await get_schema_capabilities(db)
+            if capabilities.missing_indexes:
+                await self.ensure_recommended_indexes(db)
             existing_check = await self._check_existing_plugin(user_id, db)
-            if existing_check['exists']:
-                logger.warning(f"ChatWithYourDocuments: Plugin already installed for user {user_id}")
-                return {
-                    'success': False,
-                    'error': 'Plugin already installed for user',
-                    'plugin_id': existing_check['plugin_id']
-                }
+            if existing_check['exists'] and existing_check['plugin_info']['version'] != self.version:
+                # The user's rows belong to another version; they are migrated, never merged into this one
+                self.active_users.discard(user_id)
+                return await self._install_over_other_version(user_id, db, existing_check)
+            if not capabilities.supports_on_conflict:
+                if existing_check['exists']:
+                    logger.warning(f"ChatWithYourDocuments: Plugin already installed for user {user_id}")
+                    return {
+                        'success': False,
+                        'error': 'Plugin already installed for user',
+                        'plugin_id': existing_check['plugin_id']
+                    }
+                # A long-lived manager may still track a user whose rows were removed elsewhere
+                self.active_users.discard(user_id)
             
             shared_path = self.shared_path
-            shared_path.mkdir(parents=True, exist_ok=True)
-            logger.info(f"ChatWithYourDocuments: Created shared directory: {shared_path}")
 
-            # Copy plugin files to the shared directory first
-            copy_result = await self._copy_plugin_files_impl(user_id, shared_path)
+            # Materialize the shared files once per version; later installs skip straight to the database
+            copy_result = await self._ensure_shared_files(user_id)
             if not copy_result['success']:
                 logger.error(f"ChatWithYourDocuments: File copying failed: {copy_result.get('error')}")
                 return copy_result
 
-            logger.info(f"ChatWithYourDocuments: Files copied successfully, proceeding with database installation")
+            logger.info(f"ChatWithYourDocuments: Shared files ready, proceeding with database installation")
             
             # Ensure we're in a transaction
             try:
-                result = await self.install_for_user(user_id, db, shared_path)
+                if capabilities.supports_on_conflict and user_id in self.active_users:
+                    # The base class rejects users it already tracks; re-run the idempotent inserts instead
+                    result = await self._perform_user_installation(user_id, db, shared_path)
+                else:
+                    result = await self.install_for_user(user_id, db, shared_path)
                 
                 if result.get('success'):
-                    # Verify the installation was successful
-                    verify_check = await self._check_existing_plugin(user_id, db)
-                    if not verify_check['exists']:
-                        logger.error(f"ChatWithYourDocuments: Installation appeared successful but verification failed")
-                        return {'success': False, 'error': 'Installation verification failed'}
-                    
-                    logger.info(f"ChatWithYourDocuments: Installation verified successfully for user {user_id}")
+                    if result.get('already_installed'):
+                        logger.info(f"ChatWithYourDocuments: Plugin was already installed for user {user_id}, nothing to do")
+                    else:
+                        logger.info(f"ChatWithYourDocuments: Installation committed for user {user_id}")
                     result.update({
                         'plugin_slug': self.plugin_data['plugin_slug'],
                         'plugin_name': self.plugin_data['name']
@@ -1311,11 +3440,240 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
             logger.error(f"ChatWithYourDocuments: Install plugin failed: {e}")
             return {'success': False, 'error': str(e)}
     
+    async def _install_over_other_version(self, user_id: str, db: AsyncSession,
+                                          existing_check: Dict[str, Any]) -> Dict[str, Any]:
+        """Update a user installed at another version through that version's registered manager"""
+        installed_version = existing_check['plugin_info']['version']
+        installed_manager = _find_registered_manager(self.shared_path.parent, installed_version)
+        if installed_manager is None:
+            logger.warning(f"ChatWithYourDocuments: User {user_id} has version {installed_version} installed, not {self.version}")
+            return {
+                'success': False,
+                'error': f'Plugin version {installed_version} is installed for user; update it with update_plugin',
+                'plugin_id': existing_check['plugin_id'],
+                'installed_version': installed_version
+            }
+        
+        logger.info(f"ChatWithYourDocuments: User {user_id} has version {installed_version} installed, updating to {self.version}")
+        return await installed_manager.update_plugin(user_id, db, self)
+    
+    async def install_for_users(self, user_ids: List[str], db: AsyncSession) -> Dict[str, Any]:
+        """
+        Install ChatWithYourDocuments plugin for many users at once.
+        Existing installs are found with one set-based query per chunk, and every
+        plugin, module, service and settings row is inserted with executemany
+        inside a single transaction. Returns per-user results under 'results'.
+        """
+        # Preserve caller order while dropping duplicates
+        user_ids = list(dict.fromkeys(str(user_id) for user_id in user_ids))
+        if not user_ids:
+            return {'success': True, 'installed': [], 'skipped': [], 'results': {}}
+        
+        try:
+            logger.info(f"ChatWithYourDocuments: Starting bulk installation for {len(user_ids)} users")
+            
+            copy_result = await self._ensure_shared_files(user_ids[0])
+            if not copy_result['success']:
+                logger.error(f"ChatWithYourDocuments: File copying failed: {copy_result.get('error')}")
+                return copy_result
+            
+            await self.hydrate_active_users(db)
+            if (await get_schema_capabilities(db)).missing_indexes:
+                await self.ensure_recommended_indexes(db)
+            installed_ids = await self._get_installed_user_ids(user_ids, db)
+            # Reported like a retried single install_plugin: already installed is not a failure
+            results: Dict[str, Dict[str, Any]] = {
+                user_id: {'success': True, 'already_installed': True, 'plugin_id': plugin_id}
+                for user_id, plugin_id in installed_ids.items()
+            }
+            pending = [user_id for user_id in user_ids if user_id not in installed_ids]
+            if not pending:
+                logger.info("ChatWithYourDocuments: Plugin already installed for every requested user")
+                return {'success': True, 'installed': [], 'skipped': list(installed_ids), 'results': results}
+            
+            current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            
+            try:
+                thin = await self._ensure_catalog(db)
+                plugin_rows = [self._build_plugin_row(user_id, current_time, thin) for user_id in pending]
+                plugin_status = await self._insert_plugin_rows(db, plugin_rows, report_conflicts=True)
+                # A concurrent install may have added some of these users since the lookup above;
+                # ON CONFLICT skipped their rows, so the rest of the install leaves them alone
+                for row in plugin_rows:
+                    if plugin_status.get(row['id']) != 'created':
+                        installed_ids[row['user_id']] = row['id']
+                        results[row['user_id']] = {'success': True, 'already_installed': True, 'plugin_id': row['id']}
+                plugin_rows = [row for row in plugin_rows if row['user_id'] not in installed_ids]
+                installed = [row['user_id'] for row in plugin_rows]
+                module_rows_by_user = {
+                    row['user_id']: self._build_module_rows(row['user_id'], row['id'], current_time, thin)
+                    for row in plugin_rows
+                }
+                
+                # ON CONFLICT keeps a concurrent single install of one of these users from failing the batch
+                on_conflict = (await get_schema_capabilities(db)).supports_on_conflict
+                module_rows = [row for rows in module_rows_by_user.values() for row in rows]
+                await self._execute_insert(db, self._module_insert_statement(on_conflict), module_rows)
+                
+                services_created = False
+                if self.required_services_runtime and await self._check_and_create_service_runtime_table(db):
+                    service_rows = [
+                        service_row
+                        for row in plugin_rows
+                        for service_row in self._build_service_rows(row['user_id'], row['id'], current_time)
+                    ]
+                    services_created = bool(await self._insert_service_rows(db, service_rows))
+                
+                await self._ensure_settings_definition(db)
+                with_settings = await self._get_users_with_settings_instance(installed, db)
+                settings_rows = [
+                    self._build_settings_instance_row(user_id, current_time)
+                    for user_id in installed if user_id not in with_settings
+                ]
+                await self._execute_insert(db, self._settings_instance_insert_statement(on_conflict), settings_rows)
+                
+                await db.commit()
+            except Exception as db_error:
+                logger.error(f"ChatWithYourDocuments: Bulk database installation failed: {db_error}")
+                await db.rollback()
+                for user_id in pending:
+                    results[user_id] = {'success': False, 'error': f'Database operation failed: {str(db_error)}'}
+                return {'success': False, 'error': str(db_error), 'installed': [], 'skipped': list(installed_ids), 'results': results}
+            
+            for row in plugin_rows:
+                user_id = row['user_id']
+                self.active_users.add(user_id)
+                results[user_id] = {
+                    'success': True,
+                    'plugin_id': row['id'],
+                    'plugin_slug': self.plugin_data['plugin_slug'],
+                    'plugin_name': self.plugin_data['name'],
+                    'modules_created': [module_row['id'] for module_row in module_rows_by_user[user_id]],
+                    'services_created': [
+                        f"{user_id}_{self.plugin_data['plugin_slug']}_{service_data['name']}"
+                        for service_data in self.required_services_runtime
+                    ] if services_created else [],
+                    'settings_created': [self.settings_definition_id, f"chat_with_doc_proc_settings_{user_id}"]
+                }
+            
+            logger.info(f"ChatWithYourDocuments: Bulk installation completed - {len(installed)} installed, {len(installed_ids)} already present")
+            return {'success': True, 'installed': installed, 'skipped': list(installed_ids), 'results': results}
+            
+        except Exception as e:
+            logger.error(f"ChatWithYourDocuments: Bulk install failed: {e}")
+            return {'success': False, 'error': str(e)}
+    
+    async def uninstall_for_users(self, user_ids: List[str], db: AsyncSession) -> Dict[str, Any]:
+        """
+        Remove ChatWithYourDocuments plugin for many users at once.
+        Users are processed in chunks of BULK_QUERY_CHUNK_SIZE, each chunk being a
+        single transaction of set-based DELETEs. Returns per-table rowcounts.
+        """
+        user_ids = list(dict.fromkeys(str(user_id) for user_id in user_ids))
+        deleted = {'plugin_service_runtime': 0, 'module': 0, 'plugin': 0, 'settings_instances': 0}
+        processed: List[str] = []
+        
+        logger.info(f"ChatWithYourDocuments: Starting bulk uninstallation for {len(user_ids)} users")
+        for chunk in _chunked(user_ids, BULK_QUERY_CHUNK_SIZE):
+            try:
+                chunk_deleted = await self._delete_records_for_users(chunk, db)
+                await db.commit()
+            except Exception as e:
+                logger.error(f"ChatWithYourDocuments: Bulk uninstall failed after {len(processed)} users: {e}")
+                await db.rollback()
+                return {
+                    'success': False,
+                    'error': str(e),
+                    'users_processed': processed,
+                    'failed_user_ids': user_ids[len(processed):],
+                    'deleted': deleted
+                }
+            
+            for table, count in chunk_deleted.items():
+                deleted[table] += count
+            processed.extend(chunk)
+            self.active_users.difference_update(chunk)
+        
+        logger.info(f"ChatWithYourDocuments: Bulk uninstallation completed - {deleted}")
+        return {'success': True, 'users_processed': processed, 'deleted': deleted}
+    
+    async def purge_plugin(self, db: AsyncSession) -> Dict[str, Any]:
+        """
+        Remove ChatWithYourDocuments plugin for every user (retiring the plugin).
+        Installed users are drained in chunked transactions through uninstall_for_users,
+        then settings instances and service runtime rows left without a plugin row are swept.
+        """
+        from sqlalchemy import text
+        plugin_slug = self.plugin_data['plugin_slug']
+        deleted = {'plugin_service_runtime': 0, 'module': 0, 'plugin': 0, 'settings_instances': 0}
+        users_processed = 0
+        
+        next_users_query = text("""
+        SELECT user_id FROM plugin
+        WHERE plugin_slug = :plugin_slug
+        ORDER BY user_id
+        LIMIT :limit
+        """)
+        
+        try:
+            logger.info(f"ChatWithYourDocuments: Purging plugin {plugin_slug} for all users")
+            while True:
+                result = await db.execute(next_users_query, {'plugin_slug': plugin_slug, 'limit': BULK_QUERY_CHUNK_SIZE})
+                chunk = [row.user_id for row in result.fetchall()]
+                if not chunk:
+                    break
+                
+                chunk_result = await self.uninstall_for_users(chunk, db)
+                for table, count in chunk_result['deleted'].items():
+                    deleted[table] += count
+                users_processed += len(chunk_result['users_processed'])
+                if not chunk_result['success']:
+                    return {'success': False, 'error': chunk_result['error'], 'users_processed': users_processed, 'deleted': deleted}
+                if chunk_result['deleted']['plugin'] == 0:
+                    # Nothing removed for a non-empty chunk; bail out instead of spinning
+                    return {'success': False, 'error': 'Plugin rows could not be removed', 'users_processed': users_processed, 'deleted': deleted}
+            
+            # Orphans: rows whose plugin record was already gone
+            settings_result = await db.execute(
+                text("DELETE FROM settings_instances WHERE definition_id = :definition_id"),
+                {'definition_id': self.settings_definition_id}
+            )
+            deleted['settings_instances'] += settings_result.rowcount
+            if (await get_schema_capabilities(db)).has_service_runtime_table:
+                service_result = await db.execute(
+                    text("DELETE FROM plugin_service_runtime WHERE plugin_slug = :plugin_slug"),
+                    {'plugin_slug': plugin_slug}
+                )
+                deleted['plugin_service_runtime'] += service_result.rowcount
+            if (await get_schema_capabilities(db)).has_catalog:
+                for table in reversed(_catalog_tables()):
+                    catalog_result = await db.execute(
+                        text(f"DELETE FROM {table.name} WHERE plugin_slug = :plugin_slug"),
+                        {'plugin_slug': plugin_slug}
+                    )
+                    deleted[table.name] = catalog_result.rowcount
+            await db.commit()
+            
+            self.active_users.clear()
+            logger.info(f"ChatWithYourDocuments: Purge completed for {users_processed} users - {deleted}")
+            return {'success': True, 'users_processed': users_processed, 'deleted': deleted}
+            
+        except Exception as e:
+            logger.error(f"ChatWithYourDocuments: Plugin purge failed: {e}")
+            await db.rollback()
+            return {'success': False, 'error': str(e), 'users_processed': users_processed, 'deleted': deleted}
+    
     async def delete_plugin(self, user_id: str, db: AsyncSession) -> Dict[str, Any]:
         """Delete ChatWithYourDocuments plugin for user (compatibility method)"""
         try:
             logger.info(f"ChatWithYourDocuments: Starting deletion for user {user_id}")
             
+            # The base class only uninstalls users it tracks; installs done by another
+            # process since hydration are picked up from the database
+            await self.hydrate_active_users(db)
+            if user_id not in self.active_users and await self.plugin_exists(user_id, db):
+                self.active_users.add(user_id)
+            
             # Let the base class handle the deletion - it will call _perform_user_uninstallation
             # which includes the database check
             result = await self.uninstall_for_user(user_id, db)
@@ -1337,8 +3695,8 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
             if not existing_check['exists']:
                 return {'exists': False, 'status': 'not_installed'}
             
-            # Check if shared plugin files exist
-            plugin_health = await self._get_plugin_health_impl(user_id, self.shared_path)
+            # Check if shared plugin files exist (shared snapshot, recomputed only when files change)
+            plugin_health = await self._get_shared_health_snapshot(self.shared_path)
             
             return {
                 'exists': True,
@@ -1352,8 +3710,180 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
             logger.error(f"ChatWithYourDocuments: Error checking plugin status: {e}")
             return {'exists': False, 'status': 'error', 'error': str(e)}
     
+    @staticmethod
+    def _diff_rows(old_rows: Dict[str, Dict[str, Any]], new_rows: Dict[str, Dict[str, Any]],
+                   ignored_columns) -> Dict[str, Any]:
+        """Diff definition rows keyed by name into added / removed / {name: changed columns}"""
+        changed = {}
+        for name in old_rows.keys() & new_rows.keys():
+            columns = [
+                column for column, value in new_rows[name].items()
+                if column not in ignored_columns and old_rows[name].get(column) != value
+            ]
+            if columns:
+                changed[name] = columns
+        return {
+            'added': [name for name in new_rows if name not in old_rows],
+            'removed': [name for name in old_rows if name not in new_rows],
+            'changed': changed
+        }
+    
+    def _plan_record_migration(self, new_version_manager: 'ChatWithYourDocumentsLifecycleManager') -> Dict[str, Any]:
+        """
+        Diff this version's plugin/module/service definitions against the new version's.
+        The plan does not depend on the user, so it is computed once per manager pair.
+        """
+        # Rows are built for a placeholder user; only definition columns are compared
+        placeholder_user, placeholder_time = '', ''
+        plugin_id = f"_{self.plugin_data['plugin_slug']}"
+        
+        old_plugin = self._build_plugin_row(placeholder_user, placeholder_time)
+        new_plugin = new_version_manager._build_plugin_row(placeholder_user, placeholder_time)
+        plugin_columns = [
+            column for column, value in new_plugin.items()
+            if column not in USER_STATE_PLUGIN_COLUMNS and old_plugin.get(column) != value
+        ]
+        
+        def by_name(rows):
+            return {row['name']: row for row in rows}
+        
+        modules = self._diff_rows(
+            by_name(self._build_module_rows(placeholder_user, plugin_id, placeholder_time)),
+            by_name(new_version_manager._build_module_rows(placeholder_user, plugin_id, placeholder_time)),
+            USER_STATE_MODULE_COLUMNS
+        )
+        services = self._diff_rows(
+            by_name(self._build_service_rows(placeholder_user, plugin_id, placeholder_time)),
+            by_name(new_version_manager._build_service_rows(placeholder_user, plugin_id, placeholder_time)),
+            USER_STATE_SERVICE_COLUMNS
+        )
+        return {'plugin_columns': plugin_columns, 'modules': modules, 'services': services}
+    
+    async def _apply_record_migration(self, user_id: str, db: AsyncSession,
+                                      new_version_manager: 'ChatWithYourDocumentsLifecycleManager',
+                                      plan: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply a migration plan to one user's rows with only the needed UPDATE/INSERT/DELETE statements. Does not commit."""
+        from sqlalchemy import text
+        capabilities = await get_schema_capabilities(db)
+        on_conflict = capabilities.supports_on_conflict
+        current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        plugin_id = f"{user_id}_{self.plugin_data['plugin_slug']}"
+        
+        # Plugin row: changed definition columns plus timestamps; also proves the user has the plugin
+        # Catalog columns are written NULL when the new version's catalog entry is in place
+        thin = await new_version_manager._ensure_catalog(db, keep_existing=True)
+        new_plugin = new_version_manager._build_plugin_row(user_id, current_time, thin)
+        plugin_columns = [
+            column for column in plan['plugin_columns']
+            if column != 'required_services_runtime' or capabilities.has_services_runtime_column
+        ]
+        assignments = ', '.join(f"{column} = :{column}" for column in plugin_columns + ['updated_at', 'last_updated'])
+        plugin_params = {column: new_plugin[column] for column in plugin_columns}
+        plugin_params.update({'updated_at': current_time, 'last_updated': current_time,
+                              'plugin_id': plugin_id, 'user_id': user_id})
+        plugin_result = await db.execute(
+            text(f"UPDATE plugin SET {assignments} WHERE id = :plugin_id AND user_id = :user_id"),
+            plugin_params
+        )
+        if plugin_result.rowcount == 0:
+            return {'success': False, 'error': 'Plugin not found for user'}
+        
+        await self._apply_child_diff(
+            db, 'module', plan['modules'],
+            {row['name']: row for row in new_version_manager._build_module_rows(user_id, plugin_id, current_time, thin)},
+            self._module_insert_statement(on_conflict), user_id, plugin_id, current_time
+        )
+        
+        services = plan['services']
+        if services['added'] or services['removed'] or services['changed']:
+            if await self._check_and_create_service_runtime_table(db):
+                available_columns = capabilities.service_runtime_columns
+                new_services = {
+                    row['name']: {column: value for column, value in row.items() if column in available_columns}
+                    for row in new_version_manager._build_service_rows(user_id, plugin_id, current_time)
+                }
+                await self._apply_child_diff(
+                    db, 'plugin_service_runtime', services, new_services,
+                    self._service_insert_statement(available_columns, on_conflict), user_id, plugin_id, current_time
+                )
+        
+        return {
+            'success': True,
+            'plugin_id': plugin_id,
+            'changes': {
+                'plugin': plugin_columns,
+                'modules': plan['modules'],
+                'services': services
+            }
+        }
+    
+    @staticmethod
+    async def _apply_child_diff(db: AsyncSession, table: str, diff: Dict[str, Any],
+                                new_rows: Dict[str, Dict[str, Any]], insert_statement,
+                                user_id: str, plugin_id: str, current_time: str):
+        """Delete removed, insert added and update changed module/service rows of one user"""
+        from sqlalchemy import bindparam, text
+        if diff['removed']:
+            delete_stmt = text(f"""
+            DELETE FROM {table}
+            WHERE plugin_id = :plugin_id AND user_id = :user_id AND name IN :names
+            """).bindparams(bindparam('names', expanding=True))
+            await db.execute(delete_stmt, {'plugin_id': plugin_id, 'user_id': user_id, 'names': diff['removed']})
+        
+        if diff['added']:
+            await insert_statement.execute(db, [new_rows[name] for name in diff['added']])
+        
+        for name, columns in diff['changed'].items():
+            columns = [column for column in columns if column in new_rows[name]]
+            assignments = ', '.join(f"{column} = :{column}" for column in columns + ['updated_at'])
+            params = {column: new_rows[name][column] for column in columns}
+            params.update({'updated_at': current_time, 'id': new_rows[name]['id'], 'user_id': user_id})
+            await db.execute(text(f"UPDATE {table} SET {assignments} WHERE id = :id AND user_id = :user_id"), params)
+    
     async def update_plugin(self, user_id: str, db: AsyncSession, new_version_manager: 'ChatWithYourDocumentsLifecycleManager') -> Dict[str, Any]:
-        """Update ChatWithYourDocuments plugin for user (compatibility method)"""
+        """
+        Update ChatWithYourDocuments plugin for user (compatibility method).
+        Migrates the user's rows in place: only definition columns that differ between the
+        versions are updated, modules/services are added or removed as needed, and user
+        state (config_fields, enabled, priority, status, settings) is left untouched.
+        Everything happens in one transaction.
+        """
+        if new_version_manager.plugin_data['plugin_slug'] != self.plugin_data['plugin_slug']:
+            # Rows are keyed by slug, so a renamed plugin needs a full reinstall
+            return await self._reinstall_update(user_id, db, new_version_manager)
+        
+        try:
+            # Materialize the new version's shared files; unchanged content is only re-linked
+            copy_result = await new_version_manager._ensure_shared_files(user_id)
+            if not copy_result['success']:
+                return copy_result
+            
+            plan = self._plan_record_migration(new_version_manager)
+            migration_result = await self._apply_record_migration(user_id, db, new_version_manager, plan)
+            if not migration_result['success']:
+                await db.rollback()
+                return migration_result
+            
+            await db.commit()
+            self.active_users.discard(user_id)
+            new_version_manager.active_users.add(user_id)
+            
+            logger.info(f"ChatWithYourDocuments: Plugin updated in place for user {user_id} ({self.version} -> {new_version_manager.version})")
+            return {
+                'success': True,
+                'old_version': self.version,
+                'new_version': new_version_manager.version,
+                'plugin_id': migration_result['plugin_id'],
+                'changes': migration_result['changes']
+            }
+            
+        except Exception as e:
+            logger.error(f"ChatWithYourDocuments: Plugin update failed for user {user_id}: {e}")
+            await db.rollback()
+            return {'success': False, 'error': str(e)}
+    
+    async def _reinstall_update(self, user_id: str, db: AsyncSession, new_version_manager: 'ChatWithYourDocumentsLifecycleManager') -> Dict[str, Any]:
+        """Update by export, uninstall, install and import; only needed when the plugin slug changes"""
         try:
             # Export current user data
             export_result = await self._export_user_data(user_id, db)
@@ -1365,13 +3895,19 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
             if not uninstall_result['success']:
                 return uninstall_result
             
+            # Materialize the new version's shared files; unchanged content is only re-linked
+            copy_result = await new_version_manager._ensure_shared_files(user_id)
+            if not copy_result['success']:
+                return copy_result
+            
             # Install new version
             install_result = await new_version_manager.install_for_user(user_id, db, new_version_manager.shared_path)
             if not install_result['success']:
                 return install_result
             
-            # Import user data to new version
+            # Import user data to new version; the install above has already committed
             await new_version_manager._import_user_data(user_id, db, export_result.get('user_data', {}))
+            await db.commit()
             
             logger.info(f"ChatWithYourDocuments: Plugin updated successfully for user {user_id}")
             return {
@@ -1386,35 +3922,368 @@ class ChatWithYourDocumentsLifecycleManager(BaseLifecycleManager):
             return {'success': False, 'error': str(e)}
 
 
+@functools.lru_cache(maxsize=None)
+def _get_manager_class() -> type:
+    """Build ChatWithYourDocumentsLifecycleManager on first use"""
+    base_class = _resolve_base_class()
+    return type(base_class)('ChatWithYourDocumentsLifecycleManager', (_LifecycleManagerImplementation, base_class), {
+        '__module__': __name__,
+        '__qualname__': 'ChatWithYourDocumentsLifecycleManager',
+        '__doc__': 'Lifecycle manager of the ChatWithYourDocuments plugin'
+    })
+
+
+if TYPE_CHECKING:
+    # What the lazily built classes offer, for type checkers and linters; at runtime both
+    # are served by __getattr__ from _LAZY_ATTRIBUTES
+    from app.plugins.base_lifecycle_manager import BaseLifecycleManager
+    ChatWithYourDocumentsLifecycleManager = _LifecycleManagerImplementation
+
+
+# Module attributes built on first access instead of at import time
+_LAZY_ATTRIBUTES: Dict[str, Callable[[], Any]] = {
+    'BaseLifecycleManager': lambda: _resolve_base_class(),
+    'ChatWithYourDocumentsLifecycleManager': lambda: _get_manager_class(),
+    'SERVICE_RUNTIME_TABLE': lambda: _service_runtime_table(),
+    'PLUGIN_CATALOG_TABLE': lambda: _catalog_tables()[0],
+    'MODULE_CATALOG_TABLE': lambda: _catalog_tables()[1],
+    'ROLLOUT_CHECKPOINT_TABLE': lambda: _rollout_checkpoint_table(),
+}
+
+
+def __getattr__(name: str):
+    """Resolve the lazily built classes and table definitions (PEP 562)"""
+    factory = _LAZY_ATTRIBUTES.get(name)
+    if factory is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return factory()
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
+
+
+@functools.lru_cache(maxsize=None)
+def _rollout_checkpoint_table() -> Table:
+    """Progress of fleet rollouts, one row per rollout; last_user_id is the keyset cursor"""
+    from sqlalchemy import Column, Integer, MetaData, String, Table, Text
+    return Table(
+        'plugin_rollout_checkpoint', MetaData(),
+        Column('rollout_id', String, primary_key=True),
+        Column('plugin_slug', String, nullable=False),
+        Column('from_version', String, nullable=False),
+        Column('to_version', String, nullable=False),
+        Column('last_user_id', String),
+        Column('users_updated', Integer, nullable=False, default=0),
+        Column('users_failed', Integer, nullable=False, default=0),
+        Column('failed_user_ids', Text),
+        Column('status', String, nullable=False),
+        Column('started_at', String),
+        Column('updated_at', String),
+    )
+
+
+class PluginRolloutScheduler:
+    """
+    Updates every user on the old version to the new version in keyset-ordered batches.
+    Each batch is processed by up to `concurrency` workers, each with its own session
+    from `session_factory`. The cursor and counters are checkpointed after every batch,
+    so an interrupted rollout resumes after the last completed batch instead of restarting.
+    """
+    
+    def __init__(self, old_manager: 'ChatWithYourDocumentsLifecycleManager',
+                 new_manager: 'ChatWithYourDocumentsLifecycleManager',
+                 session_factory: Callable[[], AsyncSession],
+                 concurrency: int = 4, batch_size: int = 100,
+                 rollout_id: Optional[str] = None,
+                 progress_callback: Optional[Callable] = None):
+        self.old_manager = old_manager
+        self.new_manager = new_manager
+        self.session_factory = session_factory
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.plugin_slug = old_manager.plugin_data['plugin_slug']
+        self.from_version = old_manager.plugin_data['version']
+        self.to_version = new_manager.plugin_data['version']
+        self.rollout_id = rollout_id or f"{self.plugin_slug}:{self.from_version}->{self.to_version}"
+        self.progress_callback = progress_callback
+    
+    async def _load_checkpoint(self, db: AsyncSession) -> Optional[Dict[str, Any]]:
+        from sqlalchemy import text
+        connection = await db.connection()
+        await connection.run_sync(_rollout_checkpoint_table().create, checkfirst=True)
+        result = await db.execute(
+            text("SELECT * FROM plugin_rollout_checkpoint WHERE rollout_id = :rollout_id"),
+            {'rollout_id': self.rollout_id}
+        )
+        row = result.mappings().fetchone()
+        await db.commit()
+        return dict(row) if row else None
+    
+    async def _save_checkpoint(self, db: AsyncSession, checkpoint: Dict[str, Any], insert: bool = False,
+                               replace: bool = False):
+        """Update the checkpoint row; insert=True creates it, replace=True first deletes a stored one"""
+        from sqlalchemy import text
+        checkpoint['updated_at'] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if replace:
+            # A restart starts a new row: versions and started_at must not survive from the old run
+            await db.execute(
+                text("DELETE FROM plugin_rollout_checkpoint WHERE rollout_id = :rollout_id"),
+                {'rollout_id': checkpoint['rollout_id']}
+            )
+        if insert or replace:
+            statement = text("""
+            INSERT INTO plugin_rollout_checkpoint
+            (rollout_id, plugin_slug, from_version, to_version, last_user_id, users_updated,
+            users_failed, failed_user_ids, status, started_at, updated_at)
+            VALUES
+            (:rollout_id, :plugin_slug, :from_version, :to_version, :last_user_id, :users_updated,
+            :users_failed, :failed_user_ids, :status, :started_at, :updated_at)
+            """)
+        else:
+            statement = text("""
+            UPDATE plugin_rollout_checkpoint
+            SET last_user_id = :last_user_id, users_updated = :users_updated, users_failed = :users_failed,
+            failed_user_ids = :failed_user_ids, status = :status, updated_at = :updated_at
+            WHERE rollout_id = :rollout_id
+            """)
+        await db.execute(statement, checkpoint)
+        await db.commit()
+    
+    async def _next_batch(self, db: AsyncSession, last_user_id: Optional[str]) -> List[str]:
+        """Keyset pagination over users still on the old version"""
+        from sqlalchemy import text
+        result = await db.execute(
+            text("""
+            SELECT user_id FROM plugin
+            WHERE plugin_slug = :plugin_slug AND version = :from_version AND user_id > :last_user_id
+            ORDER BY user_id
+            LIMIT :limit
+            """),
+            {
+                'plugin_slug': self.plugin_slug,
+                'from_version': self.from_version,
+                'last_user_id': last_user_id or '',
+                'limit': self.batch_size
+            }
+        )
+        return [row.user_id for row in result.fetchall()]
+    
+    async def _update_user(self, user_id: str, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                async with self.session_factory() as db:
+                    return await self.old_manager.update_plugin(user_id, db, self.new_manager)
+            except Exception as e:
+                logger.error(f"ChatWithYourDocuments: Rollout update failed for user {user_id}: {e}")
+                return {'success': False, 'error': str(e)}
+    
+    async def run(self, restart: bool = False) -> Dict[str, Any]:
+        """Run (or resume) the rollout; restart=True discards the stored checkpoint"""
+        started = datetime.datetime.now()
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
+        
+        try:
+            # Shared files are materialized once up front rather than checked per user
+            copy_result = await self.new_manager._ensure_shared_files('rollout')
+            if not copy_result['success']:
+                return copy_result
+            
+            async with self.session_factory() as db:
+                checkpoint = await self._load_checkpoint(db)
+                if checkpoint and checkpoint['status'] == 'completed' and not restart:
+                    logger.info(f"ChatWithYourDocuments: Rollout {self.rollout_id} already completed")
+                    return {'success': True, 'rollout_id': self.rollout_id, 'resumed': True,
+                            'users_updated': checkpoint['users_updated'], 'users_failed': checkpoint['users_failed'],
+                            'failed_user_ids': json.loads(checkpoint['failed_user_ids'] or '[]'),
+                            'elapsed_seconds': loop.time() - start_time, 'users_per_second': 0.0}
+                
+                resumed = checkpoint is not None and not restart
+                if checkpoint is None or restart:
+                    fresh = {
+                        'rollout_id': self.rollout_id, 'plugin_slug': self.plugin_slug,
+                        'from_version': self.from_version, 'to_version': self.to_version,
+                        'last_user_id': None, 'users_updated': 0, 'users_failed': 0,
+                        'failed_user_ids': '[]', 'status': 'running',
+                        'started_at': started.strftime("%Y-%m-%d %H:%M:%S")
+                    }
+                    await self._save_checkpoint(db, fresh, insert=checkpoint is None, replace=checkpoint is not None)
+                    checkpoint = fresh
+                else:
+                    checkpoint['status'] = 'running'
+                
+                failed_user_ids = json.loads(checkpoint['failed_user_ids'] or '[]')
+                processed_this_run = 0
+                semaphore = asyncio.Semaphore(self.concurrency)
+                logger.info(f"ChatWithYourDocuments: {'Resuming' if resumed else 'Starting'} rollout {self.rollout_id} after user {checkpoint['last_user_id']!r}")
+                
+                while True:
+                    batch = await self._next_batch(db, checkpoint['last_user_id'])
+                    await db.commit()
+                    if not batch:
+                        break
+                    
+                    results = await asyncio.gather(*(self._update_user(user_id, semaphore) for user_id in batch))
+                    for user_id, result in zip(batch, results):
+                        if result.get('success'):
+                            checkpoint['users_updated'] += 1
+                        else:
+                            checkpoint['users_failed'] += 1
+                            failed_user_ids.append(user_id)
+                    
+                    processed_this_run += len(batch)
+                    checkpoint['last_user_id'] = batch[-1]
+                    checkpoint['failed_user_ids'] = json.dumps(failed_user_ids)
+                    await self._save_checkpoint(db, checkpoint)
+                    
+                    elapsed = loop.time() - start_time
+                    users_per_second = processed_this_run / elapsed if elapsed > 0 else 0.0
+                    logger.info(f"ChatWithYourDocuments: Rollout {self.rollout_id} - {checkpoint['users_updated']} updated, {checkpoint['users_failed']} failed, {users_per_second:.1f} users/sec")
+                    if self.progress_callback:
+                        _dispatch_progress(self.progress_callback, {
+                            'rollout_id': self.rollout_id,
+                            'users_updated': checkpoint['users_updated'],
+                            'users_failed': checkpoint['users_failed'],
+                            'last_user_id': checkpoint['last_user_id'],
+                            'users_per_second': users_per_second
+                        })
+                
+                checkpoint['status'] = 'completed'
+                await self._save_checkpoint(db, checkpoint)
+            
+            elapsed = loop.time() - start_time
+            users_per_second = processed_this_run / elapsed if elapsed > 0 else 0.0
+            logger.info(f"ChatWithYourDocuments: Rollout {self.rollout_id} completed - {checkpoint['users_updated']} updated, {checkpoint['users_failed']} failed in {elapsed:.1f}s ({users_per_second:.1f} users/sec)")
+            return {
+                'success': True,
+                'rollout_id': self.rollout_id,
+                'resumed': resumed,
+                'users_updated': checkpoint['users_updated'],
+                'users_failed': checkpoint['users_failed'],
+                'failed_user_ids': failed_user_ids,
+                'elapsed_seconds': elapsed,
+                'users_per_second': users_per_second
+            }
+            
+        except Exception as e:
+            logger.error(f"ChatWithYourDocuments: Rollout {self.rollout_id} interrupted: {e}")
+            return {'success': False, 'rollout_id': self.rollout_id, 'error': str(e)}
+
+
 # Standalone functions for compatibility with remote installer
+# (plugins_base_dir, version) -> manager reused by the standalone entry points, so repeated
+# calls (e.g. status polling) share one warmed instance and its active_users
+_lifecycle_managers: Dict[Tuple[Optional[str], str], ChatWithYourDocumentsLifecycleManager] = {}
+# plugins_base_dir -> version served when the caller does not ask for one
+_default_manager_versions: Dict[Optional[str], str] = {}
+_lifecycle_managers_lock = threading.Lock()
+
+
+def _manager_base_dir_key(plugins_base_dir) -> Optional[str]:
+    return str(plugins_base_dir) if plugins_base_dir else None
+
+
+def register_lifecycle_manager(manager: ChatWithYourDocumentsLifecycleManager, plugins_base_dir: str = None,
+                               default: bool = False) -> ChatWithYourDocumentsLifecycleManager:
+    """
+    Register a manager under (plugins_base_dir, its version). An existing registration wins
+    and is returned; default makes it the version served when none is requested.
+    """
+    base_dir = _manager_base_dir_key(plugins_base_dir)
+    with _lifecycle_managers_lock:
+        manager = _lifecycle_managers.setdefault((base_dir, manager.version), manager)
+        if default or base_dir not in _default_manager_versions:
+            _default_manager_versions[base_dir] = manager.version
+    return manager
+
+
+def get_lifecycle_manager(plugins_base_dir: str = None, version: str = None) -> ChatWithYourDocumentsLifecycleManager:
+    """
+    Return the process-wide manager for plugins_base_dir and version, creating it on first use.
+    Without a version the default registered for plugins_base_dir is used, falling back to the
+    version defined in this module; other versions must be registered first.
+    """
+    base_dir = _manager_base_dir_key(plugins_base_dir)
+    with _lifecycle_managers_lock:
+        requested_version = version or _default_manager_versions.get(base_dir)
+        manager = _lifecycle_managers.get((base_dir, requested_version)) if requested_version else None
+    if manager is not None:
+        return manager
+    
+    manager = _get_manager_class()(plugins_base_dir)
+    if version and manager.version != version:
+        raise KeyError(f"No lifecycle manager registered for version {version} under {plugins_base_dir}")
+    return register_lifecycle_manager(manager, plugins_base_dir)
+
+
+def _find_registered_manager(slug_dir: Path, version: str) -> Optional[ChatWithYourDocumentsLifecycleManager]:
+    """Return a registered manager of version whose shared files live under slug_dir, if any"""
+    with _lifecycle_managers_lock:
+        for manager in _lifecycle_managers.values():
+            if manager.version == version and manager.shared_path.parent == slug_dir:
+                return manager
+    return None
+
+
+def invalidate_lifecycle_managers(plugins_base_dir: str = None, version: str = None):
+    """Drop cached managers matching plugins_base_dir and/or version; no arguments drops them all"""
+    base_dir = _manager_base_dir_key(plugins_base_dir)
+    with _lifecycle_managers_lock:
+        for key in list(_lifecycle_managers):
+            if (plugins_base_dir is None or key[0] == base_dir) and (version is None or key[1] == version):
+                del _lifecycle_managers[key]
+        for key in [key for key, default_version in _default_manager_versions.items()
+                    if (key, default_version) not in _lifecycle_managers]:
+            del _default_manager_versions[key]
+
+
 async def install_plugin(user_id: str, db: AsyncSession, plugins_base_dir: str = None) -> Dict[str, Any]:
-    manager = ChatWithYourDocumentsLifecycleManager(plugins_base_dir)
+    manager = get_lifecycle_manager(plugins_base_dir)
     return await manager.install_plugin(user_id, db)
 
+async def install_plugin_for_users(user_ids: List[str], db: AsyncSession, plugins_base_dir: str = None) -> Dict[str, Any]:
+    manager = get_lifecycle_manager(plugins_base_dir)
+    return await manager.install_for_users(user_ids, db)
+
 async def delete_plugin(user_id: str, db: AsyncSession, plugins_base_dir: str = None) -> Dict[str, Any]:
-    manager = ChatWithYourDocumentsLifecycleManager(plugins_base_dir)
+    manager = get_lifecycle_manager(plugins_base_dir)
     return await manager.delete_plugin(user_id, db)
 
+async def uninstall_plugin_for_users(user_ids: List[str], db: AsyncSession, plugins_base_dir: str = None) -> Dict[str, Any]:
+    manager = get_lifecycle_manager(plugins_base_dir)
+    return await manager.uninstall_for_users(user_ids, db)
+
+async def purge_plugin(db: AsyncSession, plugins_base_dir: str = None) -> Dict[str, Any]:
+    manager = get_lifecycle_manager(plugins_base_dir)
+    return await manager.purge_plugin(db)
+
 async def get_plugin_status(user_id: str, db: AsyncSession, plugins_base_dir: str = None) -> Dict[str, Any]:
-    manager = ChatWithYourDocumentsLifecycleManager(plugins_base_dir)
+    manager = get_lifecycle_manager(plugins_base_dir)
     return await manager.get_plugin_status(user_id, db)
 
 async def update_plugin(user_id: str, db: AsyncSession, new_version_manager: 'ChatWithYourDocumentsLifecycleManager', plugins_base_dir: str = None) -> Dict[str, Any]:
-    old_manager = ChatWithYourDocumentsLifecycleManager(plugins_base_dir)
+    old_manager = get_lifecycle_manager(plugins_base_dir)
     return await old_manager.update_plugin(user_id, db, new_version_manager)
 
+async def rollout_plugin_update(session_factory: Callable[[], AsyncSession],
+                                new_version_manager: 'ChatWithYourDocumentsLifecycleManager',
+                                plugins_base_dir: str = None, concurrency: int = 4,
+                                batch_size: int = 100) -> Dict[str, Any]:
+    old_manager = get_lifecycle_manager(plugins_base_dir)
+    scheduler = PluginRolloutScheduler(old_manager, new_version_manager, session_factory,
+                                       concurrency=concurrency, batch_size=batch_size)
+    return await scheduler.run()
+
 
 # Test script for development
 if __name__ == "__main__":
-    import sys
-    import asyncio
-    
     async def main():
         print("ChatWithYourDocuments Plugin Lifecycle Manager - Test Mode")
         print("=" * 50)
         
         # Test manager initialization
-        manager = ChatWithYourDocumentsLifecycleManager()
+        manager = _get_manager_class()()
         print(f"Plugin: {manager.plugin_data['name']}")
         print(f"Version: {manager.plugin_data['version']}")
         print(f"Slug: {manager.plugin_data['plugin_slug']}")
@@ -1422,5 +4291,14 @@ if __name__ == "__main__":
         
         for module in manager.module_data:
             print(f"  - {module['display_name']} ({module['name']})")
+        
+        # Build the prebuilt install archive: python lifecycle_manager.py build-archive [output_path]
+        if len(sys.argv) > 1 and sys.argv[1] == 'build-archive':
+            result = manager.build_plugin_archive(sys.argv[2] if len(sys.argv) > 2 else None)
+            if result['success']:
+                print(f"Archive: {result['archive_path']} ({result['file_count']} files)")
+            else:
+                print(f"Archive build failed: {result['error']}")
+                sys.exit(1)
     
     asyncio.run(main())
\ No newline at end of file
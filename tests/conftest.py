@@ -0,0 +1,127 @@
+"""
+Shared fixtures for the lifecycle manager tests.
+
+The lifecycle manager is async and SQLAlchemy-backed; tests drive it with
+asyncio.run against a throwaway SQLite database that carries the BrainDrive
+tables the plugin writes to.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lifecycle_manager  # noqa: E402
+
+
+# Host tables the plugin writes to, as created by BrainDrive's migrations
+HOST_SCHEMA = (
+    """
+    CREATE TABLE plugin (
+        id VARCHAR PRIMARY KEY, name VARCHAR, description TEXT, version VARCHAR, type VARCHAR,
+        enabled BOOLEAN, icon VARCHAR, category VARCHAR, status VARCHAR, official BOOLEAN,
+        author VARCHAR, last_updated VARCHAR, compatibility VARCHAR, downloads INTEGER,
+        scope VARCHAR, bundle_method VARCHAR, bundle_location VARCHAR, is_local BOOLEAN,
+        long_description TEXT, config_fields TEXT, messages TEXT, dependencies TEXT,
+        created_at VARCHAR, updated_at VARCHAR, user_id VARCHAR, plugin_slug VARCHAR,
+        source_type VARCHAR, source_url VARCHAR, update_check_url VARCHAR,
+        last_update_check VARCHAR, update_available BOOLEAN, latest_version VARCHAR,
+        installation_type VARCHAR, permissions TEXT, required_services_runtime TEXT
+    )
+    """,
+    """
+    CREATE TABLE module (
+        id VARCHAR PRIMARY KEY, plugin_id VARCHAR, name VARCHAR, display_name VARCHAR,
+        description TEXT, icon VARCHAR, category VARCHAR, enabled BOOLEAN, priority INTEGER,
+        props TEXT, config_fields TEXT, messages TEXT, required_services TEXT,
+        dependencies TEXT, layout TEXT, tags TEXT, created_at VARCHAR, updated_at VARCHAR,
+        user_id VARCHAR
+    )
+    """,
+    """
+    CREATE TABLE settings_definitions (
+        id VARCHAR PRIMARY KEY, name VARCHAR, description TEXT, category VARCHAR, type VARCHAR,
+        default_value TEXT, allowed_scopes TEXT, validation TEXT, is_multiple BOOLEAN,
+        tags TEXT, created_at VARCHAR, updated_at VARCHAR
+    )
+    """,
+    """
+    CREATE TABLE settings_instances (
+        id VARCHAR PRIMARY KEY, name VARCHAR, definition_id VARCHAR, scope VARCHAR,
+        user_id VARCHAR, value TEXT, created_at VARCHAR, updated_at VARCHAR
+    )
+    """,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_lifecycle_caches():
+    """Module-level caches must not leak managers or capabilities between tests"""
+    yield
+    lifecycle_manager.invalidate_lifecycle_managers()
+    lifecycle_manager.invalidate_schema_capabilities()
+    lifecycle_manager.invalidate_metadata_snapshots()
+
+
+@pytest.fixture
+def plugins_base_dir(tmp_path):
+    return str(tmp_path / 'plugins')
+
+
+@pytest.fixture
+def make_database(tmp_path):
+    """
+    Async factory for a SQLite database with the host schema. Returns (engine, session_factory);
+    legacy=True omits the plugin.required_services_runtime column like older hosts.
+    """
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    async def factory(name: str = 'braindrive.db', legacy: bool = False):
+        # NullPool: connections close with their session, before asyncio.run closes the loop
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / name}", poolclass=NullPool)
+        async with engine.begin() as connection:
+            for statement in HOST_SCHEMA:
+                if legacy:
+                    statement = statement.replace(", required_services_runtime TEXT", "")
+                await connection.execute(text(statement))
+        return engine, async_sessionmaker(engine, expire_on_commit=False)
+
+    return factory
+
+
+@pytest.fixture
+def count_rows():
+    """Async row count of a table, optionally filtered by column equality"""
+    from sqlalchemy import text
+
+    async def count(db, table: str, **where) -> int:
+        clause = ' AND '.join(f"{column} = :{column}" for column in where)
+        query = f"SELECT COUNT(*) FROM {table}" + (f" WHERE {clause}" if clause else '')
+        return (await db.execute(text(query), where)).scalar()
+
+    return count
+
+
+@pytest.fixture
+def plugin_source(tmp_path, monkeypatch):
+    """
+    Make a small throwaway tree the plugin source directory (the directory of lifecycle_manager.py),
+    so file sync tests can edit sources; returns its path
+    """
+    source_dir = tmp_path / 'source'
+    files = {
+        'package.json': '{"name": "chat-with-your-documents"}\n',
+        'dist/main.js': 'console.log("main");\n' * 50,
+        'dist/old.js': 'console.log("old");\n',
+        'public/index.html': '<!doctype html><title>x</title>\n',
+    }
+    for relative_key, content in files.items():
+        path = source_dir / relative_key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    monkeypatch.setattr(lifecycle_manager, '__file__', str(source_dir / 'lifecycle_manager.py'))
+    return source_dir
@@ -0,0 +1,98 @@
+"""Installing the shared version directory from the prebuilt archive"""
+
+import asyncio
+import hashlib
+import io
+import json
+import tarfile
+
+import pytest
+
+import lifecycle_manager
+
+
+def _write_archive(path, manifest_files, members, version):
+    """Write an install archive with the given manifest 'files' and (name, bytes) members"""
+    manifest_bytes = json.dumps({'plugin_slug': 'ChatWithYourDocuments', 'version': version,
+                                 'files': manifest_files}).encode('utf-8')
+    with tarfile.open(path, mode='w:gz', format=tarfile.PAX_FORMAT) as archive:
+        for name, data in [(lifecycle_manager.PLUGIN_MANIFEST_FILENAME, manifest_bytes)] + members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+
+def _entry(data):
+    return {'size': len(data), 'sha256': hashlib.sha256(data).hexdigest()}
+
+
+@pytest.fixture
+def manager(plugins_base_dir):
+    return lifecycle_manager.get_lifecycle_manager(plugins_base_dir)
+
+
+def test_built_archive_installs_matching_tree(manager, tmp_path):
+    archive_path = tmp_path / 'bundle.tar.gz'
+    build_result = manager.build_plugin_archive(archive_path)
+    assert build_result['success'], build_result
+    manager.install_archive = archive_path
+
+    result = asyncio.run(manager._ensure_shared_files('user-a'))
+    assert result['success'], result
+    assert len(result['stored_blobs']) > 0
+    source_dir = lifecycle_manager.Path(lifecycle_manager.__file__).parent
+    for relative_key in ('package.json', 'dist/remoteEntry.js'):
+        assert (manager.shared_path / relative_key).read_bytes() == (source_dir / relative_key).read_bytes()
+    assert asyncio.run(manager.verify_installation(deep=True))['success']
+
+
+@pytest.mark.parametrize('unsafe_key', ['../../../escaped.txt', '{tmp_path}/escaped.txt', 'dist/../../escaped.txt',
+                                        'dist/./escaped.txt', 'dist\\..\\escaped.txt'])
+def test_unsafe_manifest_key_rejects_whole_archive(manager, tmp_path, unsafe_key):
+    unsafe_key = unsafe_key.format(tmp_path=tmp_path)
+    data = b'payload\n'
+    archive_path = tmp_path / 'bundle.tar.gz'
+    # The unsafe key shares its content with a safe member, so no member of its own is ever read
+    _write_archive(archive_path, {'ok.txt': _entry(data), unsafe_key: _entry(data)},
+                   [('ok.txt', data)], manager.version)
+    manager.install_archive = archive_path
+
+    result = asyncio.run(manager._ensure_shared_files('user-a'))
+    assert not result['success']
+    assert 'unsafe path' in result['error']
+    assert not any(path.name == 'escaped.txt' for path in tmp_path.rglob('*'))
+    assert not (manager.shared_path / 'ok.txt').exists()
+    assert not (manager.shared_path / lifecycle_manager.MATERIALIZED_MARKER_FILENAME).exists()
+
+
+def test_malformed_digest_rejects_archive(manager, tmp_path):
+    data = b'payload\n'
+    archive_path = tmp_path / 'bundle.tar.gz'
+    _write_archive(archive_path, {'ok.txt': {'size': len(data), 'sha256': '../../escaped'}},
+                   [('ok.txt', data)], manager.version)
+    manager.install_archive = archive_path
+
+    result = asyncio.run(manager._ensure_shared_files('user-a'))
+    assert not result['success']
+    assert 'malformed' in result['error']
+
+
+def test_content_mismatch_and_version_mismatch_are_rejected(manager, tmp_path):
+    data = b'payload\n'
+    archive_path = tmp_path / 'bundle.tar.gz'
+    _write_archive(archive_path, {'ok.txt': _entry(b'other content\n')}, [('ok.txt', data)], manager.version)
+    manager.install_archive = archive_path
+    assert not asyncio.run(manager._ensure_shared_files('user-a'))['success']
+
+    _write_archive(archive_path, {'ok.txt': _entry(data)}, [('ok.txt', data)], '0.0.0')
+    result = asyncio.run(manager._ensure_shared_files('user-a'))
+    assert not result['success']
+    assert 'expected' in result['error']
+
+
+@pytest.mark.parametrize('relative_path, safe', [
+    ('dist/main.js', True), ('a', True), ('', False), ('/etc/passwd', False), ('../x', False),
+    ('a/../b', False), ('a//b', False), ('./a', False), ('a\\b', False),
+])
+def test_is_safe_relative_path(relative_path, safe):
+    assert lifecycle_manager._is_safe_relative_path(relative_path) is safe
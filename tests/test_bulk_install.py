@@ -0,0 +1,147 @@
+"""Bulk install/uninstall and the active-user index"""
+
+import asyncio
+
+from sqlalchemy import text
+
+import lifecycle_manager
+from lifecycle_manager import ActiveUserIndex
+
+
+def test_bulk_install_and_uninstall(make_database, plugins_base_dir, count_rows):
+    async def scenario():
+        engine, Session = await make_database()
+        manager = lifecycle_manager.get_lifecycle_manager(plugins_base_dir)
+        users = [f"user-{index}" for index in range(5)]
+        async with Session() as db:
+            result = await lifecycle_manager.install_plugin_for_users(users + ['user-0'], db, plugins_base_dir)
+            assert result['success'], result
+            assert result['installed'] == users and result['skipped'] == []
+            assert await count_rows(db, 'plugin') == 5
+            assert await count_rows(db, 'module') == 5 * len(manager.module_data)
+            assert await count_rows(db, 'settings_instances') == 5
+            assert set(manager.active_users) == set(users)
+
+            again = await lifecycle_manager.install_plugin_for_users(users[:2] + ['user-5'], db, plugins_base_dir)
+            assert again['installed'] == ['user-5'] and again['skipped'] == users[:2]
+            assert again['results']['user-0'] == {
+                'success': True, 'already_installed': True, 'plugin_id': 'user-0_ChatWithYourDocuments'
+            }
+            assert again['results']['user-5']['success'] and 'already_installed' not in again['results']['user-5']
+
+            removed = await lifecycle_manager.uninstall_plugin_for_users(users, db, plugins_base_dir)
+            assert removed['success'], removed
+            assert await count_rows(db, 'plugin') == 1
+            assert await count_rows(db, 'plugin_service_runtime', user_id='user-0') == 0
+            assert set(manager.active_users) == {'user-5'}
+
+    asyncio.run(scenario())
+
+
+def test_bulk_install_reports_rows_skipped_by_on_conflict(make_database, plugins_base_dir, monkeypatch, count_rows):
+    async def scenario():
+        engine, Session = await make_database()
+        manager = lifecycle_manager.get_lifecycle_manager(plugins_base_dir)
+        async with Session() as db:
+            assert (await lifecycle_manager.install_plugin('user-b', db, plugins_base_dir))['success']
+
+            # user-b's install lands between the existence lookup and the inserts
+            async def nothing_installed(user_ids, db):
+                return {}
+            monkeypatch.setattr(manager, '_get_installed_user_ids', nothing_installed)
+
+            result = await manager.install_for_users(['user-a', 'user-b', 'user-c'], db)
+            assert result['success'], result
+            assert result['installed'] == ['user-a', 'user-c']
+            assert result['skipped'] == ['user-b']
+            assert result['results']['user-b'] == {
+                'success': True, 'already_installed': True, 'plugin_id': 'user-b_ChatWithYourDocuments'
+            }
+            assert result['results']['user-a']['success']
+            for user_id in ('user-a', 'user-b', 'user-c'):
+                assert await count_rows(db, 'plugin', user_id=user_id) == 1
+                assert await count_rows(db, 'settings_instances', user_id=user_id) == 1
+
+    asyncio.run(scenario())
+
+
+def test_hydration_only_counts_this_version(make_database, plugins_base_dir):
+    async def scenario():
+        engine, Session = await make_database()
+        async with Session() as db:
+            assert (await lifecycle_manager.install_plugin('user-current', db, plugins_base_dir))['success']
+            await db.execute(text(
+                "INSERT INTO plugin (id, user_id, plugin_slug, version) "
+                "VALUES ('user-old_ChatWithYourDocuments', 'user-old', 'ChatWithYourDocuments', '0.9.0')"
+            ))
+            await db.commit()
+
+            manager = lifecycle_manager.get_lifecycle_manager(plugins_base_dir)
+            assert await manager.hydrate_active_users(db, force=True) == 1
+            assert 'user-current' in manager.active_users
+            assert 'user-old' not in manager.active_users
+
+    asyncio.run(scenario())
+
+
+def test_active_user_index_behaves_like_a_set():
+    index = ActiveUserIndex(['a', 'b'])
+    index.add('c')
+    index.add('a')
+    index.discard('b')
+    index.discard('missing')
+    assert len(index) == 2
+    assert set(index) == {'a', 'c'}
+    assert 'b' not in index and 'never-seen' not in index
+    index -= {'a'}
+    assert set(index) == {'c'}
+    index.clear()
+    assert len(index) == 0 and list(index) == []
+
+
+def _manager_for_version(plugins_base_dir, version):
+    manager = lifecycle_manager.ChatWithYourDocumentsLifecycleManager(plugins_base_dir)
+    manager.version = version
+    manager.plugin_data = dict(manager.plugin_data, version=version)
+    manager.shared_path = manager.shared_path.parent / f"v{version}"
+    return manager
+
+
+def test_install_does_not_adopt_a_user_on_another_version(make_database, plugins_base_dir, count_rows):
+    async def scenario():
+        engine, Session = await make_database()
+        old_manager = _manager_for_version(plugins_base_dir, '0.9.0')
+        async with Session() as db:
+            assert (await old_manager.install_plugin('user-old', db))['success']
+            modules_before = await count_rows(db, 'module', user_id='user-old')
+
+            # No manager of 0.9.0 registered: refused, nothing merged into the current version
+            result = await lifecycle_manager.install_plugin('user-old', db, plugins_base_dir)
+            assert not result['success']
+            assert result['installed_version'] == '0.9.0'
+            manager = lifecycle_manager.get_lifecycle_manager(plugins_base_dir)
+            assert 'user-old' not in manager.active_users
+            assert await count_rows(db, 'plugin', user_id='user-old', version='0.9.0') == 1
+            assert await count_rows(db, 'module', user_id='user-old') == modules_before
+
+    asyncio.run(scenario())
+
+
+def test_install_updates_a_user_on_a_registered_version(make_database, plugins_base_dir, count_rows):
+    async def scenario():
+        engine, Session = await make_database()
+        old_manager = lifecycle_manager.register_lifecycle_manager(
+            _manager_for_version(plugins_base_dir, '0.9.0'), plugins_base_dir
+        )
+        async with Session() as db:
+            assert (await old_manager.install_plugin('user-old', db))['success']
+
+            current = lifecycle_manager.ChatWithYourDocumentsLifecycleManager(plugins_base_dir)
+            result = await current.install_plugin('user-old', db)
+            assert result['success'], result
+            assert (result['old_version'], result['new_version']) == ('0.9.0', current.version)
+            assert await count_rows(db, 'plugin', user_id='user-old', version=current.version) == 1
+            assert 'user-old' in current.active_users
+            assert 'user-old' not in old_manager.active_users
+
+    asyncio.run(scenario())
@@ -0,0 +1,92 @@
+"""FileCopyEngine primitive fallbacks and copy progress"""
+
+import asyncio
+import errno
+import os
+
+import pytest
+
+import lifecycle_manager
+from lifecycle_manager import FileCopyEngine
+
+PRIMITIVES = ['reflink', 'copy_file_range', 'sendfile']
+
+
+def _disable(monkeypatch, primitives, calls):
+    """Make each named primitive fail the way an unsupporting filesystem does"""
+    def failing(name, error_number):
+        def primitive(*args, **kwargs):
+            calls.append(name)
+            raise OSError(error_number, f"{name} not supported")
+        return primitive
+
+    for index, name in enumerate(primitives):
+        error_number = errno.EXDEV if index % 2 == 0 else errno.ENOSYS
+        if name == 'reflink':
+            monkeypatch.setattr(lifecycle_manager.fcntl, 'ioctl', failing(name, error_number))
+        else:
+            monkeypatch.setattr(os, name, failing(name, error_number))
+
+
+def _jobs(tmp_path):
+    source_dir = tmp_path / 'source'
+    source_dir.mkdir()
+    jobs = []
+    for index, size in enumerate([1, 4096, 3 * 1024 * 1024 + 7]):
+        source = source_dir / f"file-{index}.bin"
+        source.write_bytes(os.urandom(size))
+        jobs.append((f"key-{index}", source, tmp_path / 'target' / f"key-{index}", size, f"dist/file-{index}.bin"))
+    return jobs
+
+
+@pytest.mark.skipif(lifecycle_manager.fcntl is None, reason="reflink needs fcntl")
+@pytest.mark.parametrize('expected_method', ['copy_file_range', 'sendfile', 'buffered'])
+def test_fallback_copies_identical_bytes_and_reports_progress(tmp_path, monkeypatch, expected_method):
+    if expected_method != 'buffered' and not hasattr(os, expected_method):
+        pytest.skip(f"os.{expected_method} is not available")
+    calls = []
+    disabled = PRIMITIVES[:PRIMITIVES.index(expected_method)] if expected_method in PRIMITIVES else PRIMITIVES
+    _disable(monkeypatch, disabled, calls)
+    engine = FileCopyEngine(max_concurrency=2)
+    jobs = _jobs(tmp_path)
+    progress = []
+
+    result = asyncio.run(engine.copy_files(jobs, progress.append))
+
+    assert result['failed'] == {}
+    assert sorted(result['copied']) == ['key-0', 'key-1', 'key-2']
+    assert result['methods'] == {expected_method: 3}
+    for key, source, target, size, path in jobs:
+        assert target.read_bytes() == source.read_bytes()
+        assert not list(target.parent.glob('.*.tmp'))
+    assert sorted(update['path'] for update in progress) == [job[4] for job in jobs]
+    assert progress[-1]['files_done'] == progress[-1]['files_total'] == 3
+    assert progress[-1]['bytes_done'] == progress[-1]['bytes_total'] == sum(job[3] for job in jobs)
+    # A primitive that failed on this device is tried once, not once per file
+    assert sorted(calls) == sorted(disabled)
+
+
+def test_other_errors_are_not_treated_as_fallbacks(tmp_path, monkeypatch):
+    def failing(*args):
+        raise OSError(errno.EIO, "I/O error")
+
+    monkeypatch.setattr(lifecycle_manager, 'fcntl', None)
+    monkeypatch.setattr(os, 'copy_file_range', failing)
+    jobs = _jobs(tmp_path)
+    result = asyncio.run(FileCopyEngine().copy_files(jobs))
+
+    assert result['copied'] == []
+    assert set(result['failed']) == {'key-0', 'key-1', 'key-2'}
+    assert not any(job[2].exists() for job in jobs)
+
+
+def test_sync_progress_reports_relative_paths(plugins_base_dir, plugin_source):
+    manager = lifecycle_manager.ChatWithYourDocumentsLifecycleManager(plugins_base_dir)
+    manager.install_archive = None
+    progress = []
+
+    result = asyncio.run(manager._copy_plugin_files_impl('user-a', manager.shared_path,
+                                                         progress_callback=progress.append))
+
+    assert result['success'], result
+    assert sorted(update['path'] for update in progress) == sorted(result['copied_files'])
@@ -0,0 +1,76 @@
+"""Exclusion patterns and the pruning source walker"""
+
+import os
+
+import pytest
+
+import lifecycle_manager
+from lifecycle_manager import PathExclusionMatcher
+
+
+@pytest.mark.parametrize('pattern, path, is_dir, excluded', [
+    # Unanchored: a name at any depth
+    ('node_modules', 'node_modules', True, True),
+    ('node_modules', 'src/node_modules', True, True),
+    ('*.pyc', 'a/b/c.pyc', False, True),
+    ('*.pyc', 'a/b/c.py', False, False),
+    # Anchored by a leading or inner slash: relative to the source root only
+    ('/build', 'build', True, True),
+    ('/build', 'src/build', True, False),
+    ('docs/*.md', 'docs/readme.md', False, True),
+    ('docs/*.md', 'src/docs/readme.md', False, False),
+    ('docs/*.md', 'docs/sub/readme.md', False, False),
+    # ** spans directories
+    ('**/fixtures', 'a/b/fixtures', True, True),
+    ('dist/**/*.map', 'dist/main.js.map', False, True),
+    ('dist/**/*.map', 'dist/a/b/main.js.map', False, True),
+    ('dist/**/*.map', 'src/dist/main.js.map', False, False),
+    # Trailing slash: directories only
+    ('tests/', 'tests', True, True),
+    ('tests/', 'src/tests', True, True),
+    ('tests/', 'tests', False, False),
+    ('[Tt]humbs.db', 'Thumbs.db', False, True),
+    ('?.txt', 'a.txt', False, True),
+])
+def test_pattern_semantics(pattern, path, is_dir, excluded):
+    assert PathExclusionMatcher([pattern]).is_excluded(path, is_dir=is_dir) is excluded
+
+
+def test_negation_reincludes_and_last_match_wins():
+    matcher = PathExclusionMatcher(['*.log', '!keep.log', 'logs/keep.log', '# comment', ''])
+    assert matcher.is_excluded('debug.log')
+    assert not matcher.is_excluded('keep.log')
+    assert not matcher.is_excluded('a/keep.log')
+    assert matcher.is_excluded('logs/keep.log')
+    assert not matcher.is_excluded('readme.md')
+
+
+@pytest.mark.parametrize('path, is_dir', [
+    ('node_modules', True), ('.git', True), ('__pycache__', True), ('tests', True), ('.pytest_cache', True),
+    ('package-lock.json', False), ('src/module.pyc', False), (lifecycle_manager.PLUGIN_MANIFEST_FILENAME, False),
+])
+def test_default_patterns_exclude_development_files(path, is_dir):
+    assert PathExclusionMatcher(lifecycle_manager.DEFAULT_EXCLUDE_PATTERNS).is_excluded(path, is_dir=is_dir)
+
+
+def test_walk_never_descends_into_excluded_directories(tmp_path, monkeypatch):
+    for relative_path in ('package.json', 'dist/main.js', 'node_modules/lib/index.js',
+                          'src/node_modules/x.js', 'tests/test_a.py', '.pytest_cache/v/cache',
+                          'src/app.tsx', 'src/app.pyc'):
+        path = tmp_path / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('x')
+
+    scanned = []
+    real_scandir = os.scandir
+
+    def scandir(path):
+        scanned.append(os.path.relpath(path, tmp_path))
+        return real_scandir(path)
+
+    monkeypatch.setattr(lifecycle_manager.os, 'scandir', scandir)
+    matcher = PathExclusionMatcher(lifecycle_manager.DEFAULT_EXCLUDE_PATTERNS)
+    files = sorted(relative_path for relative_path, entry in lifecycle_manager._walk_plugin_files(tmp_path, matcher))
+
+    assert files == ['dist/main.js', 'package.json', 'src/app.tsx']
+    assert sorted(scanned) == ['.', 'dist', 'src']
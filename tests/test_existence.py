@@ -0,0 +1,89 @@
+"""plugin_exists/plugins_exist and the debug-only existence diagnostics"""
+
+import asyncio
+
+import pytest
+from sqlalchemy import event, text
+
+import lifecycle_manager
+
+
+def _statements(engine):
+    """Record every SQL statement the engine executes"""
+    executed = []
+
+    def record(conn, cursor, statement, params, context, executemany):
+        executed.append(' '.join(statement.split()))
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', record)
+    return executed
+
+
+async def _add_plugin_rows(db, manager, user_ids):
+    for user_id in user_ids:
+        await db.execute(
+            text("INSERT INTO plugin (id, user_id, plugin_slug, version) VALUES (:id, :user_id, :slug, :version)"),
+            {'id': f"{user_id}_{manager.plugin_data['plugin_slug']}", 'user_id': user_id,
+             'slug': manager.plugin_data['plugin_slug'], 'version': manager.version}
+        )
+    # Another plugin of the same user must not count
+    await db.execute(text("INSERT INTO plugin (id, user_id, plugin_slug) VALUES ('other', 'user-absent', 'Other')"))
+    await db.commit()
+
+
+def test_plugin_exists_for_present_and_absent_users(make_database, plugins_base_dir):
+    async def scenario():
+        engine, Session = await make_database()
+        manager = lifecycle_manager.ChatWithYourDocumentsLifecycleManager(plugins_base_dir)
+        async with Session() as db:
+            await _add_plugin_rows(db, manager, ['user-a'])
+            executed = _statements(engine)
+            assert await manager.plugin_exists('user-a', db) is True
+            assert await manager.plugin_exists('user-absent', db) is False
+            assert len(executed) == 2 and all('EXISTS' in statement for statement in executed)
+
+    asyncio.run(scenario())
+
+
+def test_plugins_exist_queries_in_chunks(make_database, plugins_base_dir, monkeypatch):
+    monkeypatch.setattr(lifecycle_manager, 'BULK_QUERY_CHUNK_SIZE', 2)
+
+    async def scenario():
+        engine, Session = await make_database()
+        manager = lifecycle_manager.ChatWithYourDocumentsLifecycleManager(plugins_base_dir)
+        async with Session() as db:
+            await _add_plugin_rows(db, manager, ['user-0', 'user-2', 'user-4'])
+            executed = _statements(engine)
+            user_ids = ['user-0', 'user-1', 'user-2', 'user-absent', 'user-4', 'user-0']
+            assert await manager.plugins_exist(user_ids, db) == {
+                'user-0': True, 'user-1': False, 'user-2': True, 'user-absent': False, 'user-4': True
+            }
+            # Five distinct ids, two per IN list
+            assert len(executed) == 3
+            assert await manager.plugins_exist([], db) == {}
+            assert len(executed) == 3
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize('env_value, debug', [(None, False), ('0', False), ('1', True), ('true', True)])
+def test_existence_diagnostics_only_run_in_debug_mode(make_database, plugins_base_dir, monkeypatch, env_value, debug):
+    if env_value is None:
+        monkeypatch.delenv(lifecycle_manager.DEBUG_DIAGNOSTICS_ENV_VAR, raising=False)
+    else:
+        monkeypatch.setenv(lifecycle_manager.DEBUG_DIAGNOSTICS_ENV_VAR, env_value)
+
+    async def scenario():
+        engine, Session = await make_database()
+        manager = lifecycle_manager.ChatWithYourDocumentsLifecycleManager(plugins_base_dir)
+        assert manager.debug_diagnostics is debug
+        async with Session() as db:
+            await _add_plugin_rows(db, manager, ['user-a'])
+            executed = _statements(engine)
+            assert (await manager._check_existing_plugin('user-a', db))['exists']
+            assert (await manager._check_existing_plugin('user-absent', db)) == {'exists': False}
+            counts = [statement for statement in executed if 'COUNT(*)' in statement]
+            assert len(counts) == (1 if debug else 0)
+            assert len(executed) == (4 if debug else 2)
+
+    asyncio.run(scenario())
@@ -0,0 +1,76 @@
+"""Incremental sync of the plugin source into a version directory through the content manifest"""
+
+import asyncio
+import hashlib
+import json
+import os
+
+import pytest
+
+import lifecycle_manager
+
+
+@pytest.fixture
+def manager(plugins_base_dir, plugin_source):
+    manager = lifecycle_manager.ChatWithYourDocumentsLifecycleManager(plugins_base_dir)
+    manager.install_archive = None
+    return manager
+
+
+def _manifest(target_dir):
+    return json.loads((target_dir / lifecycle_manager.PLUGIN_MANIFEST_FILENAME).read_text())['files']
+
+
+def test_resync_copies_only_changed_files_and_removes_deleted_ones(manager, plugin_source):
+    target_dir = manager.shared_path
+    first = asyncio.run(manager._copy_plugin_files_impl('user-a', target_dir))
+    assert first['success'], first
+    assert sorted(first['copied_files']) == ['dist/main.js', 'dist/old.js', 'package.json', 'public/index.html']
+
+    changed = plugin_source / 'dist' / 'main.js'
+    changed.write_text('console.log("main, changed");\n')
+    os.utime(changed, ns=(changed.stat().st_atime_ns, changed.stat().st_mtime_ns + 1_000_000_000))
+    (plugin_source / 'dist' / 'old.js').unlink()
+    # New mtime, same content: the manifest entry is refreshed without a copy
+    touched = plugin_source / 'package.json'
+    os.utime(touched, ns=(touched.stat().st_atime_ns, touched.stat().st_mtime_ns + 1_000_000_000))
+
+    second = asyncio.run(manager._copy_plugin_files_impl('user-a', target_dir))
+    assert second['success'], second
+    assert second['copied_files'] == ['dist/main.js']
+    assert second['removed_files'] == ['dist/old.js']
+    assert sorted(second['unchanged_files']) == ['package.json', 'public/index.html']
+    assert not (target_dir / 'dist' / 'old.js').exists()
+    assert (target_dir / 'dist' / 'main.js').read_text() == 'console.log("main, changed");\n'
+
+    manifest = _manifest(target_dir)
+    assert sorted(manifest) == ['dist/main.js', 'package.json', 'public/index.html']
+    for relative_key, entry in manifest.items():
+        source_stat = (plugin_source / relative_key).stat()
+        assert entry['size'] == source_stat.st_size
+        assert entry['mtime_ns'] == source_stat.st_mtime_ns
+        assert entry['sha256'] == hashlib.sha256((plugin_source / relative_key).read_bytes()).hexdigest()
+
+
+def test_unchanged_resync_copies_nothing(manager):
+    target_dir = manager.shared_path
+    assert asyncio.run(manager._copy_plugin_files_impl('user-a', target_dir))['success']
+    result = asyncio.run(manager._copy_plugin_files_impl('user-a', target_dir))
+    assert result['success'] and result['copied_files'] == [] and result['removed_files'] == []
+    assert len(result['unchanged_files']) == 4
+
+
+def test_update_mode_rehashes_files_with_unchanged_stat(manager, plugin_source):
+    target_dir = manager.shared_path
+    assert asyncio.run(manager._copy_plugin_files_impl('user-a', target_dir))['success']
+    # Same size and mtime, different content: only update=True looks past the stat
+    source = plugin_source / 'public' / 'index.html'
+    source_stat = source.stat()
+    source.write_text(source.read_text().replace('x', 'y'))
+    os.utime(source, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+
+    quick = asyncio.run(manager._copy_plugin_files_impl('user-a', target_dir))
+    assert quick['copied_files'] == []
+    full = asyncio.run(manager._copy_plugin_files_impl('user-a', target_dir, update=True))
+    assert full['copied_files'] == ['public/index.html']
+    assert (target_dir / 'public' / 'index.html').read_text() == source.read_text()
@@ -0,0 +1,103 @@
+"""Plugin health snapshots and installation integrity"""
+
+import asyncio
+import os
+
+import pytest
+
+import lifecycle_manager
+
+
+@pytest.fixture
+def manager(plugins_base_dir):
+    manager = lifecycle_manager.get_lifecycle_manager(plugins_base_dir)
+    assert asyncio.run(manager._ensure_shared_files('user-a'))['success']
+    yield manager
+    lifecycle_manager.invalidate_health_snapshots()
+
+
+def _count_health_checks(manager, monkeypatch):
+    calls = []
+    real_check = manager._get_plugin_health_impl
+
+    async def check(user_id, plugin_dir):
+        calls.append(plugin_dir)
+        return await real_check(user_id, plugin_dir)
+
+    monkeypatch.setattr(manager, '_get_plugin_health_impl', check)
+    return calls
+
+
+def test_snapshot_is_reused_while_files_are_unchanged(manager, monkeypatch):
+    calls = _count_health_checks(manager, monkeypatch)
+    first = asyncio.run(manager._get_shared_health_snapshot(manager.shared_path))
+    second = asyncio.run(manager._get_shared_health_snapshot(manager.shared_path))
+    assert first['healthy'] and second['healthy']
+    assert first['details']['integrity_ok']
+    assert len(calls) == 1
+
+
+def test_truncated_watched_file_invalidates_snapshot(manager, monkeypatch):
+    calls = _count_health_checks(manager, monkeypatch)
+    assert asyncio.run(manager._get_shared_health_snapshot(manager.shared_path))['healthy']
+
+    bundle = manager.shared_path / 'dist' / 'remoteEntry.js'
+    assert 'dist/remoteEntry.js' in lifecycle_manager.HEALTH_WATCHED_PATHS
+    os.truncate(bundle, 0)
+
+    health = asyncio.run(manager._get_shared_health_snapshot(manager.shared_path))
+    assert not health['healthy']
+    assert 'dist/remoteEntry.js' in health['details']['integrity_failures']
+    assert len(calls) == 2
+
+
+def test_unwatched_files_are_left_to_verify_installation(manager, monkeypatch):
+    calls = _count_health_checks(manager, monkeypatch)
+    assert asyncio.run(manager._get_shared_health_snapshot(manager.shared_path))['healthy']
+    stat_calls = []
+    real_stat = os.stat
+
+    def counting_stat(path, *args, **kwargs):
+        stat_calls.append(path)
+        return real_stat(path, *args, **kwargs)
+
+    # Listed in the install manifest but not one of HEALTH_WATCHED_PATHS
+    truncated = manager.shared_path / 'dist' / 'main.js'
+    assert 'dist/main.js' not in lifecycle_manager.HEALTH_WATCHED_PATHS
+    os.truncate(truncated, truncated.stat().st_size // 2)
+
+    monkeypatch.setattr(os, 'stat', counting_stat)
+    assert asyncio.run(manager._get_shared_health_snapshot(manager.shared_path))['healthy']
+    monkeypatch.setattr(os, 'stat', real_stat)
+    # The cache check stats the manifest and the watched paths, not every installed file
+    assert len(stat_calls) == len(lifecycle_manager.HEALTH_WATCHED_PATHS) + 1
+    assert len(calls) == 1
+
+    verification = asyncio.run(manager.verify_installation())
+    assert not verification['valid']
+    assert verification['mismatched'] == ['dist/main.js']
+
+
+def test_replaced_manifest_invalidates_snapshot(manager, monkeypatch):
+    calls = _count_health_checks(manager, monkeypatch)
+    asyncio.run(manager._get_shared_health_snapshot(manager.shared_path))
+
+    manifest_path = manager.shared_path / lifecycle_manager.PLUGIN_MANIFEST_FILENAME
+    manifest_path.write_text(manifest_path.read_text())
+    asyncio.run(manager._get_shared_health_snapshot(manager.shared_path))
+    assert len(calls) == 2
+
+
+def test_quick_and_deep_verification_detect_corruption(manager):
+    assert asyncio.run(manager.verify_installation())['valid']
+    bundle = manager.shared_path / 'dist' / 'remoteEntry.js'
+    data = bundle.read_bytes()
+    stat = bundle.stat()
+    # Same size and mtime: only the deep (hashing) check can tell
+    bundle.write_bytes(bytes([data[0] ^ 1]) + data[1:])
+    os.utime(bundle, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    assert asyncio.run(manager.verify_installation())['valid']
+    deep = asyncio.run(manager.verify_installation(deep=True))
+    assert not deep['valid']
+    assert deep['mismatched'] == ['dist/remoteEntry.js']
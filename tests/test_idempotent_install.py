@@ -0,0 +1,74 @@
+"""Retried and concurrent installs for the same user succeed without duplicating rows"""
+
+import asyncio
+
+from sqlalchemy import text
+
+import lifecycle_manager
+
+
+def _statuses(result, table):
+    return set(result['rows'][table].values())
+
+
+def test_second_install_reports_already_installed(make_database, plugins_base_dir, count_rows):
+    async def scenario():
+        engine, Session = await make_database()
+        async with Session() as db:
+            first = await lifecycle_manager.install_plugin('user-a', db, plugins_base_dir)
+            assert first['success'], first
+            assert not first['already_installed']
+            assert _statuses(first, 'plugin') == {'created'}
+
+            second = await lifecycle_manager.install_plugin('user-a', db, plugins_base_dir)
+            assert second['success'], second
+            assert second['already_installed']
+            assert second['plugin_id'] == first['plugin_id']
+            assert second['modules_created'] == []
+            for table in ('plugin', 'module', 'plugin_service_runtime'):
+                assert _statuses(second, table) == {'already_present'}, table
+            assert await count_rows(db, 'plugin', user_id='user-a') == 1
+            assert await count_rows(db, 'settings_instances', user_id='user-a') == 1
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_installs_for_one_user(make_database, plugins_base_dir, count_rows):
+    async def scenario():
+        engine, Session = await make_database()
+
+        async def install():
+            async with Session() as db:
+                return await lifecycle_manager.install_plugin('user-a', db, plugins_base_dir)
+
+        results = await asyncio.gather(*(install() for _ in range(3)))
+        assert all(result['success'] for result in results), results
+        assert sorted(result['already_installed'] for result in results) == [False, True, True]
+        async with Session() as db:
+            manager = lifecycle_manager.get_lifecycle_manager(plugins_base_dir)
+            assert await count_rows(db, 'plugin', user_id='user-a') == 1
+            assert await count_rows(db, 'module', user_id='user-a') == len(manager.module_data)
+            assert await count_rows(db, 'settings_instances', user_id='user-a') == 1
+
+    asyncio.run(scenario())
+
+
+def test_partially_installed_user_is_repaired(make_database, plugins_base_dir, count_rows):
+    async def scenario():
+        engine, Session = await make_database()
+        manager = lifecycle_manager.get_lifecycle_manager(plugins_base_dir)
+        async with Session() as db:
+            assert (await lifecycle_manager.install_plugin('user-a', db, plugins_base_dir))['success']
+            # An interrupted install left the plugin row without its modules
+            await db.execute(text("DELETE FROM module WHERE user_id = 'user-a'"))
+            await db.commit()
+
+            repaired = await lifecycle_manager.install_plugin('user-a', db, plugins_base_dir)
+            assert repaired['success'], repaired
+            assert repaired['already_installed']
+            assert _statuses(repaired, 'plugin') == {'already_present'}
+            assert _statuses(repaired, 'module') == {'created'}
+            assert len(repaired['modules_created']) == len(manager.module_data)
+            assert await count_rows(db, 'module', user_id='user-a') == len(manager.module_data)
+
+    asyncio.run(scenario())
@@ -0,0 +1,58 @@
+"""
+Import cost: plugin discovery imports lifecycle_manager for every plugin, so the import
+must not load the modules deferred to the first lifecycle call. The wall-clock budget
+depends on the machine and only runs when LIFECYCLE_TEST_IMPORT_BUDGET_MS is set.
+"""
+
+import json
+import os
+import py_compile
+import subprocess
+import sys
+
+import pytest
+
+# Opt-in budget (ms) for the cumulative `-X importtime` cost of the module, measured in a
+# process that already has the stdlib modules any BrainDrive host has loaded
+IMPORT_TIME_BUDGET_ENV_VAR = 'LIFECYCLE_TEST_IMPORT_BUDGET_MS'
+IMPORT_TIME_PRELOADED_MODULES = ('asyncio', 'json', 'logging')
+# Must stay unloaded until a lifecycle call needs them
+IMPORT_TIME_DEFERRED_MODULES = ('sqlalchemy', 'structlog', 'ctypes', 'tarfile', 'gzip', 'zlib', 'hashlib',
+                                'mmap', 'shutil', 'brotli')
+
+MODULE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULE_NAME = 'lifecycle_manager'
+
+
+def _import_in_fresh_interpreter():
+    """Return (cumulative import ms, deferred modules that got loaded)"""
+    script = (
+        f"import sys, json, {', '.join(IMPORT_TIME_PRELOADED_MODULES)}; import {MODULE_NAME}; "
+        f"print(json.dumps([name for name in {IMPORT_TIME_DEFERRED_MODULES!r} if name in sys.modules]))"
+    )
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', script],
+        cwd=MODULE_DIR, capture_output=True, text=True, check=True
+    )
+    # Lines look like "import time: self [us] | cumulative | imported package"
+    import_ms = None
+    for line in completed.stderr.splitlines():
+        fields = [field.strip() for field in line.split('|')]
+        if len(fields) == 3 and fields[2] == MODULE_NAME:
+            import_ms = int(fields[1]) / 1000
+    return import_ms, json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def test_import_defers_heavy_modules():
+    import_ms, deferred_loaded = _import_in_fresh_interpreter()
+    assert import_ms is not None
+    assert deferred_loaded == []
+
+
+@pytest.mark.skipif(not os.environ.get(IMPORT_TIME_BUDGET_ENV_VAR), reason=f"set {IMPORT_TIME_BUDGET_ENV_VAR} to check")
+def test_import_time_within_budget():
+    budget_ms = float(os.environ[IMPORT_TIME_BUDGET_ENV_VAR])
+    # Measure with current bytecode, as a deployed plugin has it (PYTHONDONTWRITEBYTECODE may be set here)
+    py_compile.compile(os.path.join(MODULE_DIR, f"{MODULE_NAME}.py"), doraise=True)
+    best_ms = min(_import_in_fresh_interpreter()[0] for _ in range(3))
+    assert best_ms <= budget_ms, f"importing {MODULE_NAME} took {best_ms:.1f} ms"
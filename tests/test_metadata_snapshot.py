@@ -0,0 +1,79 @@
+"""PluginMetadataSnapshot: serialized definitions shared by every manager of a (slug, version)"""
+
+import json
+
+import pytest
+
+import lifecycle_manager
+from lifecycle_manager import PluginMetadataSnapshot
+
+
+def _manager(plugins_base_dir):
+    return lifecycle_manager.ChatWithYourDocumentsLifecycleManager(plugins_base_dir)
+
+
+def test_snapshot_is_shared_across_managers(plugins_base_dir, tmp_path):
+    first = _manager(plugins_base_dir)
+    second = _manager(str(tmp_path / 'other-plugins'))
+    assert first is not second
+
+    snapshot = first.metadata_snapshot
+    assert isinstance(snapshot, PluginMetadataSnapshot)
+    assert second.metadata_snapshot is snapshot
+    assert (snapshot.plugin_slug, snapshot.version) == (first.plugin_data['plugin_slug'], first.version)
+    assert [template['name'] for template in snapshot.module_templates] == [
+        module['name'] for module in first.module_data
+    ]
+    assert json.loads(snapshot.plugin_template['permissions']) == first.plugin_data['permissions']
+
+
+def test_snapshot_and_templates_are_immutable(plugins_base_dir):
+    snapshot = _manager(plugins_base_dir).metadata_snapshot
+
+    with pytest.raises(AttributeError):
+        snapshot.version = '9.9.9'
+    with pytest.raises(TypeError):
+        snapshot.plugin_template['name'] = 'Renamed'
+    with pytest.raises(TypeError):
+        snapshot.module_templates[0]['props'] = '{}'
+    with pytest.raises(TypeError):
+        snapshot.thin_module_templates[0]['props'] = '{}'
+    with pytest.raises(TypeError):
+        snapshot.service_templates[0]['status'] = 'running'
+    with pytest.raises(TypeError):
+        snapshot.module_templates[0] = {}
+
+
+def test_row_builders_copy_templates(plugins_base_dir):
+    manager = _manager(plugins_base_dir)
+    row = manager._build_plugin_row('user-a', '2026-01-01T00:00:00')
+    row['name'] = 'Changed'
+
+    assert manager.metadata_snapshot.plugin_template['name'] == manager.plugin_data['name']
+    assert manager._build_plugin_row('user-b', '2026-01-01T00:00:00')['id'] == f"user-b_{manager.plugin_data['plugin_slug']}"
+
+
+def test_invalidation_builds_a_fresh_snapshot(plugins_base_dir):
+    manager = _manager(plugins_base_dir)
+    snapshot = manager.metadata_snapshot
+
+    manager.plugin_data['description'] = 'Edited definition'
+    assert manager.metadata_snapshot is snapshot
+
+    lifecycle_manager.invalidate_metadata_snapshots()
+    fresh = manager.metadata_snapshot
+    assert fresh is not snapshot
+    assert fresh.plugin_template['description'] == 'Edited definition'
+    assert snapshot.plugin_template['description'] != 'Edited definition'
+
+
+def test_invalidation_by_slug_keeps_other_plugins(plugins_base_dir):
+    manager = _manager(plugins_base_dir)
+    other = _manager(plugins_base_dir)
+    other.plugin_data = dict(other.plugin_data, plugin_slug='OtherPlugin')
+    snapshot, other_snapshot = manager.metadata_snapshot, other.metadata_snapshot
+    assert other_snapshot is not snapshot
+
+    lifecycle_manager.invalidate_metadata_snapshots('OtherPlugin')
+    assert manager.metadata_snapshot is snapshot
+    assert other.metadata_snapshot is not other_snapshot
@@ -0,0 +1,35 @@
+"""Public module surface of lifecycle_manager"""
+
+import os
+import subprocess
+import sys
+
+import lifecycle_manager
+
+
+def test_star_import_exposes_lazily_built_classes():
+    namespace = {}
+    exec('from lifecycle_manager import *', namespace)
+    assert namespace['ChatWithYourDocumentsLifecycleManager'] is lifecycle_manager.ChatWithYourDocumentsLifecycleManager
+    assert issubclass(namespace['ChatWithYourDocumentsLifecycleManager'], namespace['BaseLifecycleManager'])
+    assert set(lifecycle_manager.__all__) <= set(namespace)
+
+
+def test_lazy_names_resolve_without_binding_globals():
+    manager_class = lifecycle_manager.ChatWithYourDocumentsLifecycleManager
+    assert manager_class is lifecycle_manager.ChatWithYourDocumentsLifecycleManager
+    assert manager_class.__module__ == 'lifecycle_manager'
+    assert 'ChatWithYourDocumentsLifecycleManager' not in vars(lifecycle_manager)
+    assert lifecycle_manager.SERVICE_RUNTIME_TABLE.name == lifecycle_manager.SERVICE_RUNTIME_TABLE_NAME
+    assert {'ChatWithYourDocumentsLifecycleManager', 'ROLLOUT_CHECKPOINT_TABLE'} <= set(dir(lifecycle_manager))
+
+
+def test_star_import_does_not_load_sqlalchemy():
+    script = (
+        "import sys; from lifecycle_manager import *; "
+        "assert ChatWithYourDocumentsLifecycleManager.__name__ == 'ChatWithYourDocumentsLifecycleManager'; "
+        "print('sqlalchemy' in sys.modules)"
+    )
+    module_dir = os.path.dirname(os.path.abspath(lifecycle_manager.__file__))
+    completed = subprocess.run([sys.executable, '-c', script], cwd=module_dir, capture_output=True, text=True, check=True)
+    assert completed.stdout.strip().splitlines()[-1] == 'False'
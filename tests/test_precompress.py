@@ -0,0 +1,91 @@
+"""Precompressed .gz siblings for text assets, cached in the object store by content hash"""
+
+import asyncio
+import gzip
+import json
+import os
+
+import pytest
+
+import lifecycle_manager
+
+
+@pytest.fixture
+def manager(plugins_base_dir, plugin_source):
+    (plugin_source / 'dist' / 'styles.css').write_text('body { margin: 0; padding: 0; }\n' * 40)
+    # Incompressible text asset: compressing it does not pay off
+    (plugin_source / 'dist' / 'vendor.js').write_bytes(os.urandom(4096))
+    (plugin_source / 'public' / 'logo.png').write_bytes(b'\x89PNG' + b'\x00' * 4096)
+    (plugin_source / 'src').mkdir()
+    (plugin_source / 'src' / 'app.js').write_text('export const app = 1;\n' * 40)
+    manager = lifecycle_manager.ChatWithYourDocumentsLifecycleManager(plugins_base_dir)
+    manager.install_archive = None
+    manager.precompress_encodings = ['gzip']
+    return manager
+
+
+@pytest.fixture
+def gzip_calls(monkeypatch):
+    calls = []
+    compress = gzip.compress
+
+    def recording_compress(data, *args, **kwargs):
+        calls.append(data)
+        return compress(data, *args, **kwargs)
+
+    monkeypatch.setattr(gzip, 'compress', recording_compress)
+    return calls
+
+
+def _sync(manager, target_dir):
+    result = asyncio.run(manager._copy_plugin_files_impl('user-a', target_dir))
+    assert result['success'], result
+    return result
+
+
+def test_gzip_siblings_and_index_for_text_assets(manager, plugin_source, gzip_calls):
+    target_dir = manager.shared_path
+    _sync(manager, target_dir)
+
+    for relative_key in ('dist/main.js', 'dist/styles.css'):
+        variant = target_dir / (relative_key + '.gz')
+        assert gzip.decompress(variant.read_bytes()) == (plugin_source / relative_key).read_bytes()
+    # Binary, tiny, incompressible and outside dist/ and public/: no sibling
+    for relative_key in ('public/logo.png', 'dist/old.js', 'public/index.html', 'dist/vendor.js', 'src/app.js'):
+        assert not (target_dir / (relative_key + '.gz')).exists()
+
+    index = json.loads((target_dir / lifecycle_manager.PRECOMPRESSED_INDEX_FILENAME).read_text())
+    assert index['encodings'] == ['gzip']
+    assert sorted(index['files']) == ['dist/main.js', 'dist/styles.css']
+    entry = index['files']['dist/main.js']
+    assert entry['variants'] == {
+        'gzip': {'path': 'dist/main.js.gz', 'size': (target_dir / 'dist/main.js.gz').stat().st_size}
+    }
+    assert entry['size'] == (plugin_source / 'dist/main.js').stat().st_size
+
+
+def test_unchanged_content_is_not_recompressed(manager, plugin_source, gzip_calls):
+    _sync(manager, manager.shared_path)
+    assert len(gzip_calls) == 3
+
+    # A new version directory shares the object store: stored variants and skip markers are reused
+    gzip_calls.clear()
+    next_version_dir = manager.shared_path.parent / 'v9.9.9'
+    _sync(manager, next_version_dir)
+    assert gzip_calls == []
+    assert (next_version_dir / 'dist/main.js.gz').read_bytes() == (manager.shared_path / 'dist/main.js.gz').read_bytes()
+
+    # Only the changed asset is compressed again
+    (plugin_source / 'dist' / 'styles.css').write_text('p { color: red; }\n' * 40)
+    _sync(manager, next_version_dir)
+    assert gzip_calls == [(plugin_source / 'dist' / 'styles.css').read_bytes()]
+
+
+def test_precompression_can_be_disabled(manager, gzip_calls):
+    manager.precompress_encodings = []
+    _sync(manager, manager.shared_path)
+
+    assert gzip_calls == []
+    assert not list(manager.shared_path.rglob('*.gz'))
+    index = json.loads((manager.shared_path / lifecycle_manager.PRECOMPRESSED_INDEX_FILENAME).read_text())
+    assert index == {'encodings': [], 'files': {}}
@@ -0,0 +1,77 @@
+"""Staging the shared version directory and swapping it into place"""
+
+import asyncio
+import json
+import os
+
+import pytest
+
+import lifecycle_manager
+
+
+@pytest.fixture
+def manager(plugins_base_dir):
+    manager = lifecycle_manager.get_lifecycle_manager(plugins_base_dir)
+    assert asyncio.run(manager._copy_plugin_files_impl('user-a', manager.shared_path))['success']
+    return manager
+
+
+def _forget_manifest_entry(target_dir, relative_key):
+    """Drop one file from the installed manifest so the next sync rebuilds and republishes the tree"""
+    manifest_path = target_dir / lifecycle_manager.PLUGIN_MANIFEST_FILENAME
+    manifest = json.loads(manifest_path.read_text())
+    del manifest['files'][relative_key]
+    manifest_path.write_text(json.dumps(manifest))
+
+
+def _leftovers(target_dir):
+    return [name for name in os.listdir(target_dir.parent)
+            if name.startswith(f".{target_dir.name}.staging") or name.startswith(f".{target_dir.name}.retired")]
+
+
+@pytest.mark.parametrize('exchange_available', [True, False])
+def test_resync_swaps_in_a_complete_tree(manager, monkeypatch, exchange_available):
+    target_dir = manager.shared_path
+    if not exchange_available:
+        monkeypatch.setattr(lifecycle_manager, '_exchange_paths', lambda first, second: False)
+    previous_inode = os.stat(target_dir).st_ino
+    # Not in the manifest: only survives if the old directory were synced in place
+    (target_dir / 'stray.txt').write_text('left behind\n')
+    _forget_manifest_entry(target_dir, 'dist/main.js')
+
+    result = asyncio.run(manager._copy_plugin_files_impl('user-a', target_dir))
+    assert result['success'], result
+    assert result['copied_files'] == ['dist/main.js']
+    assert os.stat(target_dir).st_ino != previous_inode
+    assert not (target_dir / 'stray.txt').exists()
+    assert _leftovers(target_dir) == []
+    assert asyncio.run(manager.verify_installation(deep=True))['valid']
+
+
+def test_unchanged_resync_leaves_the_live_tree_alone(manager):
+    target_dir = manager.shared_path
+    previous_inode = os.stat(target_dir).st_ino
+
+    result = asyncio.run(manager._copy_plugin_files_impl('user-a', target_dir))
+    assert result['success'] and result['copied_files'] == []
+    assert os.stat(target_dir).st_ino == previous_inode
+
+
+def test_versions_share_blobs_through_hard_links(manager):
+    next_dir = manager.shared_path.parent / 'v9.9.9'
+    assert asyncio.run(manager._copy_plugin_files_impl('user-a', next_dir))['success']
+    for relative_key in ('package.json', 'dist/remoteEntry.js'):
+        assert os.path.samefile(manager.shared_path / relative_key, next_dir / relative_key)
+
+
+def test_exchange_paths_swaps_two_directories(tmp_path):
+    first, second = tmp_path / 'first', tmp_path / 'second'
+    first.mkdir()
+    second.mkdir()
+    (first / 'a.txt').write_text('a')
+    (second / 'b.txt').write_text('b')
+
+    if not lifecycle_manager._exchange_paths(first, second):
+        pytest.skip('renameat2(RENAME_EXCHANGE) is not available on this platform')
+    assert os.listdir(first) == ['b.txt']
+    assert os.listdir(second) == ['a.txt']
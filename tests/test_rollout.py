@@ -0,0 +1,165 @@
+"""Fleet rollouts with PluginRolloutScheduler and resuming them from the checkpoint"""
+
+import asyncio
+
+from sqlalchemy import text
+
+import lifecycle_manager
+from lifecycle_manager import PluginRolloutScheduler
+
+NEXT_VERSION = '9.9.9'
+
+
+def _managers(plugins_base_dir):
+    """The installed manager and one for the next version of the same plugin"""
+    old_manager = lifecycle_manager.get_lifecycle_manager(plugins_base_dir)
+    new_manager = lifecycle_manager.ChatWithYourDocumentsLifecycleManager(plugins_base_dir)
+    new_manager.version = NEXT_VERSION
+    new_manager.plugin_data = dict(new_manager.plugin_data, version=NEXT_VERSION)
+    new_manager.shared_path = old_manager.shared_path.parent / f"v{NEXT_VERSION}"
+    return old_manager, new_manager
+
+
+def _count_updates(manager, monkeypatch):
+    updated = []
+    real_update = manager.update_plugin
+
+    async def update_plugin(user_id, db, new_version_manager):
+        updated.append(user_id)
+        return await real_update(user_id, db, new_version_manager)
+
+    monkeypatch.setattr(manager, 'update_plugin', update_plugin)
+    return updated
+
+
+async def _versions(Session):
+    async with Session() as db:
+        result = await db.execute(text("SELECT version, COUNT(*) FROM plugin GROUP BY version ORDER BY version"))
+        return dict(result.fetchall())
+
+
+def test_interrupted_rollout_resumes_after_last_checkpoint(make_database, plugins_base_dir, monkeypatch):
+    async def scenario():
+        engine, Session = await make_database()
+        users = [f"user-{index:02d}" for index in range(25)]
+        async with Session() as db:
+            assert (await lifecycle_manager.install_plugin_for_users(users, db, plugins_base_dir))['success']
+        old_manager, new_manager = _managers(plugins_base_dir)
+        updated = _count_updates(old_manager, monkeypatch)
+
+        # Interrupt the rollout once the first batch has been checkpointed
+        progress = []
+        first_run = None
+
+        def stop_after_first_batch(update):
+            progress.append(update)
+            first_run.cancel()
+
+        scheduler = PluginRolloutScheduler(old_manager, new_manager, Session, concurrency=3, batch_size=10,
+                                           progress_callback=stop_after_first_batch)
+        first_run = asyncio.create_task(scheduler.run())
+        await asyncio.gather(first_run, return_exceptions=True)
+        assert first_run.cancelled()
+        assert progress[0]['last_user_id'] == 'user-09'
+        assert await _versions(Session) == {old_manager.version: 15, NEXT_VERSION: 10}
+
+        updated.clear()
+        resumed = await PluginRolloutScheduler(old_manager, new_manager, Session, batch_size=10).run()
+        assert resumed['success'], resumed
+        assert resumed['resumed']
+        assert resumed['users_updated'] == 25 and resumed['users_failed'] == 0
+        # Only the users after the checkpoint were touched again
+        assert sorted(updated) == users[10:]
+        assert await _versions(Session) == {NEXT_VERSION: 25}
+
+        async with Session() as db:
+            checkpoint = (await db.execute(text(
+                "SELECT status, last_user_id, users_updated FROM plugin_rollout_checkpoint"
+            ))).fetchall()
+        assert checkpoint == [('completed', 'user-24', 25)]
+
+    asyncio.run(scenario())
+
+
+def test_completed_rollout_is_not_rerun(make_database, plugins_base_dir, monkeypatch):
+    async def scenario():
+        engine, Session = await make_database()
+        async with Session() as db:
+            assert (await lifecycle_manager.install_plugin_for_users(['user-a', 'user-b'], db, plugins_base_dir))['success']
+        old_manager, new_manager = _managers(plugins_base_dir)
+        updated = _count_updates(old_manager, monkeypatch)
+
+        first = await PluginRolloutScheduler(old_manager, new_manager, Session).run()
+        assert first['success'] and not first['resumed'] and first['users_updated'] == 2
+        again = await PluginRolloutScheduler(old_manager, new_manager, Session).run()
+        assert again['success'] and again['resumed'] and again['users_updated'] == 2
+        assert sorted(updated) == ['user-a', 'user-b']
+
+        # restart=True discards the checkpoint; nobody is left on the old version
+        restarted = await PluginRolloutScheduler(old_manager, new_manager, Session).run(restart=True)
+        assert restarted['success'] and not restarted['resumed'] and restarted['users_updated'] == 0
+
+    asyncio.run(scenario())
+
+
+def test_failed_users_are_recorded_and_skipped(make_database, plugins_base_dir, monkeypatch):
+    async def scenario():
+        engine, Session = await make_database()
+        async with Session() as db:
+            assert (await lifecycle_manager.install_plugin_for_users(['user-a', 'user-b', 'user-c'], db,
+                                                                     plugins_base_dir))['success']
+        old_manager, new_manager = _managers(plugins_base_dir)
+        real_update = old_manager.update_plugin
+
+        async def update_plugin(user_id, db, new_version_manager):
+            if user_id == 'user-b':
+                raise RuntimeError('boom')
+            return await real_update(user_id, db, new_version_manager)
+
+        monkeypatch.setattr(old_manager, 'update_plugin', update_plugin)
+        result = await PluginRolloutScheduler(old_manager, new_manager, Session, batch_size=2).run()
+        assert result['success'], result
+        assert result['users_updated'] == 2 and result['users_failed'] == 1
+        assert result['failed_user_ids'] == ['user-b']
+        assert await _versions(Session) == {old_manager.version: 1, NEXT_VERSION: 2}
+
+    asyncio.run(scenario())
+
+
+def test_restart_replaces_the_stored_checkpoint(make_database, plugins_base_dir):
+    async def scenario():
+        engine, Session = await make_database()
+        async with Session() as db:
+            assert (await lifecycle_manager.install_plugin_for_users(['user-a'], db, plugins_base_dir))['success']
+        old_manager, new_manager = _managers(plugins_base_dir)
+
+        first = await PluginRolloutScheduler(old_manager, new_manager, Session, rollout_id='fleet').run()
+        assert first['success'], first
+        again = await PluginRolloutScheduler(old_manager, new_manager, Session, rollout_id='fleet').run()
+        # The early return for a completed rollout has the same keys as a full run
+        assert set(again) == set(first)
+        assert again['resumed'] and again['users_per_second'] == 0.0 and again['elapsed_seconds'] >= 0
+
+        async with Session() as db:
+            await db.execute(text("UPDATE plugin_rollout_checkpoint SET started_at = '2000-01-01 00:00:00'"))
+            await db.commit()
+
+        # The same rollout id reused for the next step: 9.9.9 -> 10.0.0
+        next_manager = lifecycle_manager.ChatWithYourDocumentsLifecycleManager(plugins_base_dir)
+        next_manager.version = '10.0.0'
+        next_manager.plugin_data = dict(next_manager.plugin_data, version='10.0.0')
+        next_manager.shared_path = new_manager.shared_path.parent / 'v10.0.0'
+        restarted = await PluginRolloutScheduler(new_manager, next_manager, Session,
+                                                 rollout_id='fleet').run(restart=True)
+        assert restarted['success'] and not restarted['resumed'] and restarted['users_updated'] == 1
+
+        async with Session() as db:
+            rows = (await db.execute(text(
+                "SELECT from_version, to_version, started_at, status, users_updated FROM plugin_rollout_checkpoint"
+            ))).fetchall()
+        assert len(rows) == 1
+        from_version, to_version, started_at, status, users_updated = rows[0]
+        assert (from_version, to_version, status, users_updated) == (NEXT_VERSION, '10.0.0', 'completed', 1)
+        assert started_at != '2000-01-01 00:00:00'
+
+    asyncio.run(scenario())
@@ -0,0 +1,55 @@
+"""_savepoint: optional steps roll back on their own, inside the caller's transaction"""
+
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+from lifecycle_manager import _savepoint
+
+
+async def _insert_setting(db, setting_id):
+    await db.execute(text("INSERT INTO settings_instances (id, name) VALUES (:id, :id)"), {'id': setting_id})
+
+
+async def _setting_ids(Session):
+    async with Session() as db:
+        return (await db.execute(text("SELECT id FROM settings_instances ORDER BY id"))).scalars().all()
+
+
+@pytest.mark.parametrize('prior_write', [False, True])
+def test_failed_optional_step_is_isolated(make_database, prior_write):
+    async def scenario():
+        engine, Session = await make_database()
+        async with Session() as db:
+            if prior_write:
+                await _insert_setting(db, 'before')
+            with pytest.raises(RuntimeError):
+                async with _savepoint(db):
+                    await _insert_setting(db, 'optional')
+                    raise RuntimeError('optional step failed')
+            await _insert_setting(db, 'after')
+            await db.commit()
+        assert await _setting_ids(Session) == (['after', 'before'] if prior_write else ['after'])
+
+    asyncio.run(scenario())
+
+
+def test_successful_step_stays_in_the_outer_transaction(make_database):
+    async def scenario():
+        engine, Session = await make_database()
+        async with Session() as db:
+            # First statement of the session: releasing the savepoint must not commit it
+            async with _savepoint(db):
+                await _insert_setting(db, 'optional')
+            assert await _setting_ids(Session) == []
+            await db.rollback()
+        assert await _setting_ids(Session) == []
+
+        async with Session() as db:
+            async with _savepoint(db):
+                await _insert_setting(db, 'optional')
+            await db.commit()
+        assert await _setting_ids(Session) == ['optional']
+
+    asyncio.run(scenario())
@@ -0,0 +1,99 @@
+"""Schema provisioning: service runtime table, recommended indexes and catalog tables"""
+
+import asyncio
+
+from sqlalchemy import text
+
+import lifecycle_manager
+
+
+def _capabilities_of(engine):
+    return lifecycle_manager._schema_capabilities.get(engine.sync_engine)
+
+
+def test_service_runtime_table_created_and_cached_on_commit(make_database, plugins_base_dir, count_rows):
+    async def scenario():
+        engine, Session = await make_database()
+        async with Session() as db:
+            result = await lifecycle_manager.install_plugin('user-a', db, plugins_base_dir)
+            assert result['success'], result
+            assert await count_rows(db, 'plugin_service_runtime', user_id='user-a') > 0
+        capabilities = _capabilities_of(engine)
+        assert capabilities is not None and capabilities.has_service_runtime_table
+        assert not capabilities.missing_indexes
+
+    asyncio.run(scenario())
+
+
+def test_rolled_back_provisioning_does_not_stay_cached(make_database, plugins_base_dir, count_rows):
+    async def scenario():
+        engine, Session = await make_database()
+        async with Session() as db:
+            # The settings insert fails after the service table and indexes were created in the same transaction
+            await db.execute(text("ALTER TABLE settings_instances RENAME TO settings_instances_moved"))
+            await db.commit()
+            result = await lifecycle_manager.install_plugin_for_users(['user-a'], db, plugins_base_dir)
+            assert not result['success']
+            assert _capabilities_of(engine) is None
+
+            await db.execute(text("ALTER TABLE settings_instances_moved RENAME TO settings_instances"))
+            await db.commit()
+            result = await lifecycle_manager.install_plugin('user-b', db, plugins_base_dir)
+            assert result['success'], result
+            assert await count_rows(db, 'plugin_service_runtime', user_id='user-b') > 0
+
+            result = await lifecycle_manager.delete_plugin('user-b', db, plugins_base_dir)
+            assert result['success'], result
+            assert await count_rows(db, 'plugin_service_runtime', user_id='user-b') == 0
+
+    asyncio.run(scenario())
+
+
+def test_rolled_back_catalog_is_detected_again(make_database, plugins_base_dir, monkeypatch, count_rows):
+    monkeypatch.setenv(lifecycle_manager.CATALOG_MODE_ENV_VAR, '1')
+
+    async def scenario():
+        engine, Session = await make_database()
+        async with Session() as db:
+            await db.execute(text("ALTER TABLE settings_instances RENAME TO settings_instances_moved"))
+            await db.commit()
+            assert not (await lifecycle_manager.install_plugin_for_users(['user-a'], db, plugins_base_dir))['success']
+            # SQLite may have committed the DDL on its own; the cache must agree with the database either way
+            catalog_exists = (await db.execute(text(
+                "SELECT COUNT(*) FROM sqlite_master WHERE name IN ('plugin_catalog', 'plugin_resolved')"
+            ))).scalar() == 2
+            assert (await lifecycle_manager.get_schema_capabilities(db)).has_catalog == catalog_exists
+
+            await db.execute(text("ALTER TABLE settings_instances_moved RENAME TO settings_instances"))
+            await db.commit()
+            result = await lifecycle_manager.install_plugin_for_users(['user-a'], db, plugins_base_dir)
+            assert result['success'], result
+            assert await count_rows(db, 'plugin_catalog') == 1
+            assert (await lifecycle_manager.get_schema_capabilities(db)).has_catalog
+
+    asyncio.run(scenario())
+
+
+def test_legacy_schema_installs_without_services_runtime_column(make_database, plugins_base_dir, count_rows):
+    async def scenario():
+        engine, Session = await make_database(legacy=True)
+        async with Session() as db:
+            result = await lifecycle_manager.install_plugin('user-a', db, plugins_base_dir)
+            assert result['success'], result
+            assert not _capabilities_of(engine).has_services_runtime_column
+            assert await count_rows(db, 'plugin', user_id='user-a') == 1
+
+    asyncio.run(scenario())
+
+
+def test_explain_reports_no_full_scans_after_indexes(make_database, plugins_base_dir):
+    async def scenario():
+        engine, Session = await make_database()
+        manager = lifecycle_manager.get_lifecycle_manager(plugins_base_dir)
+        async with Session() as db:
+            assert (await lifecycle_manager.install_plugin('user-a', db, plugins_base_dir))['success']
+            report = await manager.explain_lifecycle_queries(db)
+            assert report['success']
+            assert report['full_scans'] == []
+
+    asyncio.run(scenario())
@@ -0,0 +1,125 @@
+"""Materialization of the shared version directory and concurrent installs"""
+
+import asyncio
+
+import lifecycle_manager
+
+
+def _gated_materialize(manager, monkeypatch):
+    """Patch the manager so the first materialization blocks until released; returns (started, release, calls)"""
+    real_materialize = manager._materialize_shared_files
+    started, release = asyncio.Event(), asyncio.Event()
+    calls = []
+
+    async def materialize(user_id, force):
+        calls.append(user_id)
+        if len(calls) == 1:
+            started.set()
+            await release.wait()
+        return await real_materialize(user_id, force)
+
+    monkeypatch.setattr(manager, '_materialize_shared_files', materialize)
+    return started, release, calls
+
+
+def test_concurrent_callers_share_one_materialization(plugins_base_dir, monkeypatch):
+    manager = lifecycle_manager.get_lifecycle_manager(plugins_base_dir)
+
+    async def scenario():
+        started, release, calls = _gated_materialize(manager, monkeypatch)
+        tasks = [asyncio.create_task(manager._ensure_shared_files(f"user-{i}")) for i in range(5)]
+        await started.wait()
+        release.set()
+        results = await asyncio.gather(*tasks)
+        assert all(result['success'] for result in results)
+        assert calls == ['user-0']
+        assert (manager.shared_path / lifecycle_manager.MATERIALIZED_MARKER_FILENAME).is_file()
+        # Later calls return on the marker without materializing again
+        assert (await manager._ensure_shared_files('user-5')) == {'success': True, 'materialized': False}
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_leader_hands_over_to_waiting_follower(plugins_base_dir, monkeypatch):
+    manager = lifecycle_manager.get_lifecycle_manager(plugins_base_dir)
+
+    async def scenario():
+        started, release, calls = _gated_materialize(manager, monkeypatch)
+        leader = asyncio.create_task(manager._ensure_shared_files('leader'))
+        await started.wait()
+        follower = asyncio.create_task(manager._ensure_shared_files('follower'))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        result = await asyncio.wait_for(follower, timeout=10)
+        assert result['success'], result
+        assert calls == ['leader', 'follower']
+        assert leader.cancelled()
+        assert not lifecycle_manager._materialization_flights
+        assert (manager.shared_path / lifecycle_manager.MATERIALIZED_MARKER_FILENAME).is_file()
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_follower_does_not_disturb_leader(plugins_base_dir, monkeypatch):
+    manager = lifecycle_manager.get_lifecycle_manager(plugins_base_dir)
+
+    async def scenario():
+        started, release, calls = _gated_materialize(manager, monkeypatch)
+        leader = asyncio.create_task(manager._ensure_shared_files('leader'))
+        await started.wait()
+        follower = asyncio.create_task(manager._ensure_shared_files('follower'))
+        await asyncio.sleep(0)
+
+        follower.cancel()
+        release.set()
+        assert (await leader)['success']
+        assert follower.cancelled()
+        assert calls == ['leader']
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_installs_for_different_users(make_database, plugins_base_dir, count_rows):
+    async def scenario():
+        engine, Session = await make_database()
+
+        async def install(user_id):
+            async with Session() as db:
+                return await lifecycle_manager.install_plugin(user_id, db, plugins_base_dir)
+
+        results = await asyncio.gather(*(install(f"user-{i}") for i in range(4)))
+        assert all(result['success'] for result in results), results
+        async with Session() as db:
+            assert await count_rows(db, 'plugin') == 4
+
+    asyncio.run(scenario())
+
+
+def test_prune_waits_for_staging_to_link_its_blobs(plugins_base_dir, monkeypatch):
+    manager = lifecycle_manager.get_lifecycle_manager(plugins_base_dir)
+
+    async def scenario():
+        real_publish = manager._publish_manifest_tree
+        stored, release = asyncio.Event(), asyncio.Event()
+
+        # Blobs are in the store with a single link each, the version tree not built yet
+        async def publish(*args, **kwargs):
+            stored.set()
+            await release.wait()
+            return await real_publish(*args, **kwargs)
+
+        monkeypatch.setattr(manager, '_publish_manifest_tree', publish)
+        install = asyncio.create_task(manager._ensure_shared_files('user-a'))
+        await stored.wait()
+        prune = asyncio.create_task(manager.prune_shared_objects())
+        done, pending = await asyncio.wait({prune}, timeout=0.2)
+        assert prune in pending
+
+        release.set()
+        assert (await install)['success']
+        pruned = await prune
+        assert pruned['success'] and pruned['removed'] == 0
+        assert (await manager.verify_installation(deep=True))['valid']
+
+    asyncio.run(scenario())
@@ -0,0 +1,185 @@
+"""In-place updates between plugin versions and the reinstall fallback for a renamed plugin"""
+
+import asyncio
+import copy
+import json
+
+from sqlalchemy import text
+
+import lifecycle_manager
+
+NEXT_VERSION = '9.9.9'
+MAIN_MODULE = 'ChatWithYourDocumentsModule'
+
+
+def _manager(plugins_base_dir, version=None, plugin_slug=None):
+    manager = lifecycle_manager.ChatWithYourDocumentsLifecycleManager(plugins_base_dir)
+    manager.module_data = copy.deepcopy(manager.module_data)
+    manager.required_services_runtime = copy.deepcopy(manager.required_services_runtime)
+    if version or plugin_slug:
+        version = version or manager.version
+        plugin_slug = plugin_slug or manager.plugin_data['plugin_slug']
+        manager.version = version
+        manager.plugin_data = dict(manager.plugin_data, version=version, plugin_slug=plugin_slug)
+        manager.shared_path = manager.shared_path.parent.parent / plugin_slug / f"v{version}"
+    return manager
+
+
+def _module(manager, name, **changes):
+    module = dict(copy.deepcopy(manager.module_data[0]), name=name, display_name=name)
+    module.update(changes)
+    return module
+
+
+async def _customize_user_state(db, user_id, plugin_slug):
+    """What a user changes after installing: must survive an update"""
+    await db.execute(text("UPDATE plugin SET config_fields = :config, enabled = 0 WHERE user_id = :user_id"),
+                     {'config': json.dumps({'theme': 'dark'}), 'user_id': user_id})
+    await db.execute(text(
+        "UPDATE module SET config_fields = :config, enabled = 0, priority = 7 WHERE user_id = :user_id AND name = :name"
+    ), {'config': json.dumps({'chunk_size': 42}), 'user_id': user_id, 'name': MAIN_MODULE})
+    await db.execute(text("UPDATE settings_instances SET value = :value WHERE user_id = :user_id"),
+                     {'value': json.dumps({'LLM_PROVIDER': 'custom'}), 'user_id': user_id})
+    await db.commit()
+
+
+def test_in_place_update_migrates_definitions_and_keeps_user_state(make_database, plugins_base_dir):
+    async def scenario():
+        engine, Session = await make_database()
+        old_manager = _manager(plugins_base_dir)
+        old_manager.module_data.append(_module(old_manager, 'LegacyModule'))
+        new_manager = _manager(plugins_base_dir, NEXT_VERSION)
+        new_manager.module_data[0]['description'] = 'Reworded in the next version'
+        new_manager.module_data.append(_module(new_manager, 'NotesModule'))
+        new_manager.required_services_runtime[0]['start_command'] = 'python -m cwyd --next'
+
+        async with Session() as db:
+            assert (await old_manager.install_plugin('user-a', db))['success']
+            await _customize_user_state(db, 'user-a', old_manager.plugin_data['plugin_slug'])
+
+            result = await old_manager.update_plugin('user-a', db, new_manager)
+            assert result['success'], result
+            assert result['changes']['modules']['added'] == ['NotesModule']
+            assert result['changes']['modules']['removed'] == ['LegacyModule']
+            assert list(result['changes']['modules']['changed']) == [MAIN_MODULE]
+            assert list(result['changes']['services']['changed']) == ['cwyd_service']
+            assert 'user-a' in new_manager.active_users and 'user-a' not in old_manager.active_users
+
+        async with Session() as db:
+            plugin = (await db.execute(text(
+                "SELECT version, config_fields, enabled FROM plugin WHERE user_id = 'user-a'"
+            ))).one()
+            assert plugin.version == NEXT_VERSION
+            assert json.loads(plugin.config_fields) == {'theme': 'dark'}
+            assert not plugin.enabled
+
+            modules = {row.name: row for row in (await db.execute(text(
+                "SELECT name, description, config_fields, enabled, priority FROM module WHERE user_id = 'user-a'"
+            ))).fetchall()}
+            assert set(modules) == {MAIN_MODULE, 'NotesModule'}
+            main = modules[MAIN_MODULE]
+            assert main.description == 'Reworded in the next version'
+            assert json.loads(main.config_fields) == {'chunk_size': 42}
+            assert (bool(main.enabled), main.priority) == (False, 7)
+
+            service = (await db.execute(text(
+                "SELECT start_command FROM plugin_service_runtime WHERE user_id = 'user-a' AND name = 'cwyd_service'"
+            ))).one()
+            assert service.start_command == 'python -m cwyd --next'
+
+            settings = (await db.execute(text(
+                "SELECT value FROM settings_instances WHERE user_id = 'user-a'"
+            ))).scalars().all()
+            assert [json.loads(value) for value in settings] == [{'LLM_PROVIDER': 'custom'}]
+
+    asyncio.run(scenario())
+
+
+def test_update_without_definition_changes_touches_only_timestamps(make_database, plugins_base_dir):
+    async def scenario():
+        engine, Session = await make_database()
+        old_manager = _manager(plugins_base_dir)
+        new_manager = _manager(plugins_base_dir, NEXT_VERSION)
+        async with Session() as db:
+            assert (await old_manager.install_plugin('user-a', db))['success']
+            result = await old_manager.update_plugin('user-a', db, new_manager)
+            assert result['success'], result
+            assert result['changes']['plugin'] == ['version']
+            assert result['changes']['modules'] == {'added': [], 'removed': [], 'changed': {}}
+
+            missing = await old_manager.update_plugin('user-missing', db, new_manager)
+            assert missing == {'success': False, 'error': 'Plugin not found for user'}
+
+    asyncio.run(scenario())
+
+
+def test_renamed_plugin_falls_back_to_reinstall(make_database, plugins_base_dir, count_rows):
+    async def scenario():
+        engine, Session = await make_database()
+        old_manager = _manager(plugins_base_dir)
+        renamed = _manager(plugins_base_dir, NEXT_VERSION, plugin_slug='ChatWithYourDocumentsNext')
+        async with Session() as db:
+            assert (await old_manager.install_plugin('user-a', db))['success']
+            await _customize_user_state(db, 'user-a', old_manager.plugin_data['plugin_slug'])
+
+            result = await old_manager.update_plugin('user-a', db, renamed)
+            assert result['success'], result
+            assert result['plugin_id'] == 'user-a_ChatWithYourDocumentsNext'
+            assert 'changes' not in result
+
+        async with Session() as db:
+            assert await count_rows(db, 'plugin', plugin_slug='ChatWithYourDocuments') == 0
+            plugin = (await db.execute(text(
+                "SELECT id, version, config_fields, enabled FROM plugin WHERE user_id = 'user-a'"
+            ))).one()
+            assert (plugin.id, plugin.version) == ('user-a_ChatWithYourDocumentsNext', NEXT_VERSION)
+            assert json.loads(plugin.config_fields) == {'theme': 'dark'}
+            assert not plugin.enabled
+            module = (await db.execute(text(
+                "SELECT plugin_id, config_fields, priority FROM module WHERE user_id = 'user-a'"
+            ))).one()
+            assert module.plugin_id == 'user-a_ChatWithYourDocumentsNext'
+            assert json.loads(module.config_fields) == {'chunk_size': 42}
+            assert module.priority == 7
+
+    asyncio.run(scenario())
+
+
+def test_catalog_mode_update_keeps_module_config_fields_per_user(make_database, plugins_base_dir):
+    async def scenario():
+        engine, Session = await make_database()
+        old_manager = _manager(plugins_base_dir)
+        new_manager = _manager(plugins_base_dir, NEXT_VERSION)
+        old_manager.catalog_mode = new_manager.catalog_mode = True
+        old_defaults = old_manager.module_data[0]['config_fields']
+        new_manager.module_data[0]['props'] = {'title': 'Next'}
+        new_manager.module_data[0]['config_fields'] = {'title': {'type': 'text', 'default': 'Next'}}
+
+        async with Session() as db:
+            for user_id in ('user-a', 'user-b'):
+                assert (await old_manager.install_plugin(user_id, db))['success']
+            raw = (await db.execute(text(
+                "SELECT props, config_fields FROM module WHERE user_id = 'user-a'"
+            ))).one()
+            # Thin row: catalog columns NULL, config_fields kept in the row
+            assert raw.props is None
+            assert json.loads(raw.config_fields) == old_defaults
+            await db.execute(text("UPDATE module SET config_fields = :config WHERE user_id = 'user-a'"),
+                             {'config': json.dumps({'chunk_size': 42})})
+            await db.commit()
+
+            for user_id in ('user-a', 'user-b'):
+                assert (await old_manager.update_plugin(user_id, db, new_manager))['success']
+
+        async with Session() as db:
+            resolved = {row.user_id: row for row in (await db.execute(text(
+                "SELECT user_id, props, config_fields FROM module_resolved"
+            ))).fetchall()}
+        assert {user_id: json.loads(row.props) for user_id, row in resolved.items()} == {
+            'user-a': {'title': 'Next'}, 'user-b': {'title': 'Next'}
+        }
+        # The user's edit and the untouched defaults both stay per-user state
+        assert json.loads(resolved['user-a'].config_fields) == {'chunk_size': 42}
+        assert json.loads(resolved['user-b'].config_fields) == old_defaults
+
+    asyncio.run(scenario())